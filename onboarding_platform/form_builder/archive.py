@@ -0,0 +1,319 @@
+import gzip
+import io
+import json
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .field_values import TYPED_COLUMNS, typed_columns
+from .models import Form, FormField, FormSubmission, SubmissionData, FileAttachment, SubmissionArchive, \
+    ArchivedAttachment
+from .search import build_document, get_search_backend
+
+# Optional: archives are written with Zstandard when installed, gzip otherwise
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+FILE_EXTENSIONS = {'zstd': 'ndjson.zst', 'gzip': 'ndjson.gz'}
+
+# Columns of an attachment kept in the archive (the upload link is not: uploads expire)
+ATTACHMENT_COLUMNS = (
+    'field_name', 'file', 'filename', 'sha256', 'size', 'content_type', 'uploaded_at',
+    'detected_type', 'page_count', 'thumbnail', 'processed_at',
+)
+DATETIME_COLUMNS = ('uploaded_at', 'processed_at')
+
+
+class ArchiveConflict(Exception):
+    """A concurrent run archived some of the same submissions first."""
+
+
+class StillPastRetention(Exception):
+    """The archive's month is still past its form's retention window, so it would be archived again."""
+
+
+def archive_cutoff(form, now=None):
+    """
+    Start of the oldest month that is kept live for a form: only whole months that ended
+    more than the retention window ago are archived, so each archive covers one full month.
+    None when the form is never archived.
+    """
+    days = form.archive_after_days if form.archive_after_days is not None else settings.SUBMISSION_ARCHIVE_AFTER_DAYS
+    if days is None:
+        return None
+
+    cutoff = timezone.localtime(now) - timedelta(days=days)
+    return cutoff.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def serialize_attachment(attachment):
+    record = {column: getattr(attachment, column) for column in ATTACHMENT_COLUMNS}
+    record['file'] = attachment.file.name
+    record['thumbnail'] = attachment.thumbnail.name
+    for column in DATETIME_COLUMNS:
+        record[column] = record[column] and record[column].isoformat()
+    return record
+
+
+def serialize_submission(submission):
+    """One archive line: the submission with its EAV values and attachments."""
+    return {
+        'id': submission.id,
+        'client_identifier': submission.client_identifier,
+        # isoformat() keeps the microseconds that DjangoJSONEncoder would round away
+        'submission_date': submission.submission_date.isoformat(),
+        'is_notified': submission.is_notified,
+        'idempotency_key': submission.idempotency_key,
+        'idempotency_fingerprint': submission.idempotency_fingerprint,
+        'data': {entry.field_name: entry.value for entry in submission.data_entries.all()},
+        'data_snapshot': submission.data_snapshot,
+        'attachments': [serialize_attachment(attachment) for attachment in submission.attachments.all()],
+    }
+
+
+def write_archive_file(lines, name):
+    """
+    Compresses NDJSON lines into a temporary file and stores it. Returns
+    (storage name, compression, compressed size).
+    """
+    compression = 'zstd' if zstandard is not None else 'gzip'
+
+    with tempfile.TemporaryFile() as raw:
+        if compression == 'zstd':
+            writer = zstandard.ZstdCompressor(level=settings.SUBMISSION_ARCHIVE_ZSTD_LEVEL).stream_writer(raw, closefd=False)
+        else:
+            writer = gzip.GzipFile(fileobj=raw, mode='wb')
+
+        with writer:
+            for line in lines:
+                writer.write(json.dumps(line, cls=DjangoJSONEncoder).encode() + b'\n')
+
+        size = raw.tell()
+        raw.seek(0)
+        name = default_storage.save(f'{name}.{FILE_EXTENSIONS[compression]}', File(raw))
+
+    return name, compression, size
+
+
+def read_archive_file(archive):
+    """Yields the submission records of an archive, decompressing as it reads."""
+    with archive.file.open('rb') as stored:
+        if archive.compression == 'zstd':
+            if zstandard is None:
+                raise ImproperlyConfigured('Reading this archive needs the zstandard package.')
+            reader = zstandard.ZstdDecompressor().stream_reader(stored)
+        else:
+            reader = gzip.GzipFile(fileobj=stored, mode='rb')
+
+        with reader:
+            for line in io.TextIOWrapper(io.BufferedReader(reader), encoding='utf-8'):
+                if line.strip():
+                    yield json.loads(line)
+
+
+def archive_form_month(form, month):
+    """
+    Moves one form's submissions of one month into a new archive file: the file is written
+    first, then the archive row is recorded and the submissions are deleted in one
+    transaction. Returns the archive, or None when the month has no submissions or a
+    concurrent run (e.g. beat and the management command) archived them first.
+    """
+    submissions = FormSubmission.objects.filter(
+        form=form, submission_date__gte=month, submission_date__lt=next_month(month)
+    ).order_by('id').prefetch_related('data_entries', 'attachments')
+
+    submissionIds = []
+    attachmentHashes = []
+
+    def lines():
+        for submission in submissions.iterator(chunk_size=settings.SUBMISSION_ARCHIVE_BATCH_SIZE):
+            submissionIds.append(submission.id)
+            attachmentHashes.extend(attachment.sha256 for attachment in submission.attachments.all() if attachment.sha256)
+            yield serialize_submission(submission)
+
+    name, compression, size = write_archive_file(
+        lines(), f'{settings.SUBMISSION_ARCHIVE_PREFIX}{form.slug}/{month:%Y-%m}-{timezone.now():%Y%m%d%H%M%S}'
+    )
+
+    if not submissionIds:
+        default_storage.delete(name)
+        return None
+
+    try:
+        with transaction.atomic():
+            archive = SubmissionArchive.objects.create(
+                form=form, month=month.date(), file=name, compression=compression,
+                submission_count=len(submissionIds), size=size
+            )
+
+            # Archived attachments keep their blobs referenced
+            ArchivedAttachment.objects.bulk_create(
+                [ArchivedAttachment(archive=archive, sha256=sha256) for sha256 in attachmentHashes],
+                batch_size=settings.SUBMISSION_ARCHIVE_BATCH_SIZE
+            )
+
+            batchSize = settings.SUBMISSION_ARCHIVE_BATCH_SIZE
+            deleted = 0
+            for start in range(0, len(submissionIds), batchSize):
+                _, deletedCounts = FormSubmission.objects.filter(id__in=submissionIds[start:start + batchSize]).delete()
+                deleted += deletedCounts.get(FormSubmission._meta.label, 0)
+
+            # Rows another run deleted in the meantime are already in its archive: keep only that one
+            if deleted != len(submissionIds):
+                raise ArchiveConflict()
+    except ArchiveConflict:
+        default_storage.delete(name)
+        return None
+    except Exception:
+        default_storage.delete(name)
+        raise
+
+    return archive
+
+
+def archive_submissions(form=None, now=None, dryRun=False):
+    """
+    Archives every whole month of submissions older than each form's retention window
+    (optionally for one form only). Returns [(form, month, submissions)] of what was (or,
+    with dryRun, would be) archived.
+    """
+    forms = Form.objects.order_by('id') if form is None else [form]
+    archived = []
+
+    for form in forms:
+        cutoff = archive_cutoff(form, now)
+        if cutoff is None:
+            continue
+
+        old = FormSubmission.objects.filter(form=form, submission_date__lt=cutoff)
+        for month in old.datetimes('submission_date', 'month'):
+            if dryRun:
+                count = old.filter(submission_date__gte=month, submission_date__lt=next_month(month)).count()
+                archived.append((form, month.date(), count))
+                continue
+
+            archive = archive_form_month(form, month)
+            if archive is not None:
+                archived.append((form, archive.month, archive.submission_count))
+
+    return archived
+
+
+def rehydrate_archive(archive):
+    """
+    Moves an archive's submissions back into the live tables with their original IDs and
+    dates, then deletes the archive and its file. Returns the number of submissions restored.
+
+    Raises StillPastRetention while the form's retention window still covers the month: the
+    next archiveSubmissions run would archive the submissions again, so the window has to be
+    extended (Form.archive_after_days) first.
+    """
+    cutoff = archive_cutoff(archive.form)
+    if cutoff is not None and archive.month < cutoff.date():
+        raise StillPastRetention()
+
+    fieldTypes = dict(
+        FormField.objects.filter(form_id=archive.form_id, field_type__in=TYPED_COLUMNS).values_list('field_name', 'field_type')
+    )
+    batchSize = settings.SUBMISSION_ARCHIVE_BATCH_SIZE
+    restored = 0
+    searchDocuments = {}
+
+    with transaction.atomic():
+        # Lock the archive so two rehydrations cannot restore it twice
+        archive = SubmissionArchive.objects.select_for_update().get(pk=archive.pk)
+
+        batch = []
+        for record in read_archive_file(archive):
+            batch.append(record)
+            if len(batch) == batchSize:
+                restored += restore_records(archive.form_id, batch, fieldTypes, searchDocuments)
+                batch = []
+        if batch:
+            restored += restore_records(archive.form_id, batch, fieldTypes, searchDocuments)
+
+        # The restored attachments now reference the blobs, so the counts stay unchanged
+        name = archive.file.name
+        archive.delete()
+
+        transaction.on_commit(lambda: default_storage.delete(name), robust=True)
+        transaction.on_commit(lambda: get_search_backend().index_documents(searchDocuments), robust=True)
+
+    return restored
+
+
+def restore_records(formId, records, fieldTypes, searchDocuments):
+    """
+    Re-inserts archived submission records (one batched INSERT per table). A record whose
+    Idempotency-Key a live submission of the form took over after it was archived is restored
+    without its key, since retries of that old request are long over.
+    """
+    keys = [record['idempotency_key'] for record in records if record['idempotency_key']]
+    takenKeys = set(
+        FormSubmission.objects.filter(form_id=formId, idempotency_key__in=keys).values_list('idempotency_key', flat=True)
+    ) if keys else set()
+
+    submissions = FormSubmission.objects.bulk_create([
+        FormSubmission(
+            id=record['id'],
+            form_id=formId,
+            client_identifier=record['client_identifier'],
+            is_notified=record['is_notified'],
+            idempotency_key=None if record['idempotency_key'] in takenKeys else record['idempotency_key'],
+            idempotency_fingerprint='' if record['idempotency_key'] in takenKeys else record.get('idempotency_fingerprint', ''),
+            data_snapshot=record['data_snapshot'],
+        )
+        for record in records
+    ])
+
+    # auto_now_add stamps inserted rows with the current time: put the original dates back
+    for submission, record in zip(submissions, records):
+        submission.submission_date = parse_datetime(record['submission_date'])
+    FormSubmission.objects.bulk_update(submissions, ['submission_date'])
+
+    SubmissionData.objects.bulk_create([
+        SubmissionData(
+            submission_id=record['id'], field_name=fieldName, value=value,
+            **typed_columns(fieldTypes.get(fieldName), value)
+        )
+        for record in records
+        for fieldName, value in record['data'].items()
+    ])
+
+    attachments = FileAttachment.objects.bulk_create([
+        FileAttachment(
+            submission_id=record['id'],
+            **{column: value for column, value in attachment.items() if column not in DATETIME_COLUMNS}
+        )
+        for record in records
+        for attachment in record['attachments']
+    ])
+    restoredDates = [
+        {column: attachment[column] and parse_datetime(attachment[column]) for column in DATETIME_COLUMNS}
+        for record in records
+        for attachment in record['attachments']
+    ]
+    for attachment, dates in zip(attachments, restoredDates):
+        for column, value in dates.items():
+            setattr(attachment, column, value)
+    FileAttachment.objects.bulk_update(attachments, list(DATETIME_COLUMNS))
+
+    for record in records:
+        searchDocuments[record['id']] = build_document(record['client_identifier'], record['data'].values())
+
+    return len(records)
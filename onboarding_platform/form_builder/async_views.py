@@ -0,0 +1,104 @@
+"""
+Async (ASGI) variants of the public client endpoints, served under /api/client/async/.
+
+Under ASGI the request body is received by the event loop before the view runs, so a slow
+mobile upload holds no worker thread while it trickles in. Schema reads use the async cache
+and ORM end to end; a submission only borrows a thread for parsing the body (multipart
+parsing is blocking), validation and its short write transaction (Django has no async
+transactions). The DRF views in views.py remain the synchronous fallback and behave the same.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER, IdempotencyKeyReused, InvalidIdempotencyKey, \
+    find_replay, get_idempotency_key, save_submission
+from .schema_cache import aget_client_form_list, aget_client_form_schema
+from .serializers import DynamicSubmissionSerializer
+from .uploads import UploadAlreadyAttached, attached_upload_fields
+from .views import etag_matches
+
+
+def conditional_json_response(request, etag, data):
+    """JSON counterpart of views.conditional_response (304 when If-None-Match matches)."""
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = JsonResponse(data, safe=False)
+
+    response['ETag'] = etag
+    return response
+
+
+class AsyncClientFormListView(View):
+    """Async variant of ClientFormListView."""
+
+    async def get(self, request):
+        etag, data = await aget_client_form_list()
+        return conditional_json_response(request, etag, data)
+
+
+class AsyncClientFormDetailView(View):
+    """Async variant of ClientFormDetailView."""
+
+    async def get(self, request, slug):
+        schema = await aget_client_form_schema(slug)
+        if schema is None:
+            raise Http404()
+
+        etag, data = schema
+        return conditional_json_response(request, etag, data)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncClientSubmissionView(View):
+    """
+    Async variant of ClientSubmissionAPIView: accepts the same multipart or JSON body and
+    answers with the same 201/400 payloads.
+    """
+
+    async def post(self, request):
+        try:
+            idempotencyKey = get_idempotency_key(request)
+        except InvalidIdempotencyKey as error:
+            return JsonResponse({IDEMPOTENCY_HEADER: str(error)}, status=400)
+
+        status, payload, wasReplayed = await sync_to_async(self.save)(request, idempotencyKey)
+        return JsonResponse(payload, status=status, headers={REPLAYED_HEADER: 'true'} if wasReplayed else None)
+
+    def save(self, request, idempotencyKey):
+        """Parses, validates and writes the submission (runs in a worker thread)."""
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return 400, {'detail': 'Malformed JSON body.'}, False
+        else:
+            data = request.POST
+
+        serializer = DynamicSubmissionSerializer(
+            data=data, context={'request': request, 'idempotency_key': idempotencyKey}
+        )
+
+        try:
+            # Retries are fingerprinted from the request files, so the replay check runs here too
+            replayed = find_replay(serializer, idempotencyKey) if idempotencyKey else None
+            if replayed is not None:
+                return 201, replayed, True
+
+            if not serializer.is_valid():
+                return 400, serializer.errors, False
+
+            payload, wasReplayed = save_submission(serializer, idempotencyKey)
+        except IdempotencyKeyReused as error:
+            return 422, {IDEMPOTENCY_HEADER: str(error)}, False
+        except UploadAlreadyAttached:
+            uploads = serializer.validated_data['uploads']
+            return 400, {
+                fieldName: ['Must be the ID of a completed upload'] for fieldName in attached_upload_fields(uploads) or uploads
+            }, False
+        return 201, payload, wasReplayed
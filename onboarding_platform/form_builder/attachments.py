@@ -0,0 +1,126 @@
+import io
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Optional: thumbnails (and frame counts of multi-page images) need Pillow,
+# PDF page counts use pypdf when installed and a structural scan otherwise
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+
+# Bytes read from storage at a time
+READ_BLOCK_SIZE = 64 * 1024
+
+# (offset, magic bytes, MIME type), checked in order against the start of the file
+MAGIC_NUMBERS = (
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'II*\x00', 'image/tiff'),
+    (0, b'MM\x00*', 'image/tiff'),
+    (8, b'WEBP', 'image/webp'),
+    (4, b'ftypheic', 'image/heic'),
+    (0, b'PK\x03\x04', 'application/zip'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'), # Legacy .doc/.xls
+)
+
+# A page object in a PDF ("/Type /Page", not "/Type /Pages")
+PDF_PAGE_PATTERN = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+def sniff_mime_type(head):
+    """MIME type from the first bytes of a file, or 'application/octet-stream' if unknown."""
+    for offset, magic, mimeType in MAGIC_NUMBERS:
+        if head[offset:offset + len(magic)] == magic:
+            return mimeType
+
+    if head and b'\x00' not in head[:1024]:
+        try:
+            head[:1024].decode('utf-8')
+            return 'text/plain'
+        except UnicodeDecodeError:
+            pass
+
+    return 'application/octet-stream'
+
+
+def count_pdf_pages(file_object):
+    """Page count of a PDF, read in blocks (pypdf when available, otherwise counting page objects)."""
+    if pypdf is not None:
+        try:
+            return len(pypdf.PdfReader(file_object).pages)
+        except Exception:
+            file_object.seek(0)
+
+    pages = 0
+    tail = b''
+    while True:
+        block = file_object.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+
+        # Keep a short overlap so a marker split across two blocks is still found once
+        data = tail + block
+        matches = list(PDF_PAGE_PATTERN.finditer(data))
+        pages += sum(1 for match in matches if match.end() > len(tail))
+        tail = data[-32:]
+
+    return pages or None
+
+
+def make_thumbnail(file_object, key):
+    """
+    Stores a PNG thumbnail of an image, named after `key` (the content hash, so identical
+    content shares one thumbnail) and returns (storage name, frame count).
+    Returns (None, None) without Pillow or for content Pillow cannot read.
+    """
+    if Image is None:
+        return None, None
+
+    try:
+        with Image.open(file_object) as image:
+            frames = getattr(image, 'n_frames', 1)
+            image.thumbnail(settings.ATTACHMENT_THUMBNAIL_SIZE)
+
+            name = f'{settings.ATTACHMENT_THUMBNAIL_PREFIX}{key}.png'
+            if not default_storage.exists(name):
+                output = io.BytesIO()
+                image.convert('RGBA' if image.mode in ('P', 'LA', 'RGBA') else 'RGB').save(output, format='PNG')
+                name = default_storage.save(name, ContentFile(output.getvalue()))
+    except Exception:
+        return None, None
+
+    return name, frames
+
+
+def analyze_file(file_object, key):
+    """
+    Post-processing results for one stored file:
+    {'detected_type': ..., 'page_count': ..., 'thumbnail': ...}. `key` names derived files.
+    """
+    head = file_object.read(READ_BLOCK_SIZE)
+    file_object.seek(0)
+    detectedType = sniff_mime_type(head)
+
+    results = {'detected_type': detectedType, 'page_count': None, 'thumbnail': None}
+
+    if detectedType == 'application/pdf':
+        results['page_count'] = count_pdf_pages(file_object)
+    elif detectedType.startswith('image/'):
+        results['thumbnail'], results['page_count'] = make_thumbnail(file_object, key)
+        if results['page_count'] is None:
+            results['page_count'] = 1
+
+    return results
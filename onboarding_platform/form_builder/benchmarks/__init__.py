@@ -0,0 +1,8 @@
+"""
+Local benchmark suite for the submission and admin APIs.
+
+    python manage.py run_benchmarks --scale small
+    python manage.py run_benchmarks --scale small --write-baseline
+
+See runner.py for what is measured and how results are compared to baseline.json.
+"""
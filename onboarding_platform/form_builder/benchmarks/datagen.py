@@ -0,0 +1,110 @@
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from form_builder.models import Form, FormField, FormSubmission, SubmissionData
+from form_builder.search import build_document, get_search_backend
+
+
+FIELD_TYPES = ['text', 'number', 'date', 'dropdown', 'checkbox']
+
+# Deterministic data: the same seed always produces the same forms and submissions
+DEFAULT_SEED = 1234
+
+
+def create_form(slug, fieldCount, seed=DEFAULT_SEED):
+    """
+    Creates an active form with `fieldCount` fields cycling through the non-file field types.
+    Forms use digest notifications so that generated and benchmarked submissions never need
+    a running broker.
+    """
+    rng = random.Random(seed)
+    form = Form.objects.create(
+        name=f'Benchmark {slug}',
+        slug=slug,
+        description=f'Synthetic form with {fieldCount} fields',
+        notification_mode='digest',
+    )
+
+    fields = []
+    for i in range(fieldCount):
+        fieldType = FIELD_TYPES[i % len(FIELD_TYPES)]
+        configuration = {}
+        if fieldType == 'dropdown':
+            configuration['options'] = [f'option{n}' for n in range(rng.randint(2, 6))]
+
+        fields.append(FormField(
+            form=form,
+            field_name=f'field{i}',
+            field_type=fieldType,
+            label=f'Field {i}',
+            is_required=i % 3 == 0,
+            order=i,
+            configuration=configuration,
+        ))
+
+    FormField.objects.bulk_create(fields)
+    return form
+
+
+def generate_value(field, rng):
+    if field.field_type == 'number':
+        return str(rng.randint(1, 1_000_000))
+    if field.field_type == 'date':
+        return (timezone.now().date() - timedelta(days=rng.randint(0, 3650))).isoformat()
+    if field.field_type == 'dropdown':
+        return rng.choice(field.configuration.get('options') or ['option0'])
+    if field.field_type == 'checkbox':
+        return rng.choice(['true', 'false'])
+    return f'{field.label} value {rng.randint(0, 10_000_000)}'
+
+
+def generate_submission_data(fields, rng):
+    return {field.field_name: generate_value(field, rng) for field in fields}
+
+
+def create_submissions(form, count, batchSize=1000, seed=DEFAULT_SEED):
+    """
+    Bulk-inserts `count` submissions (with snapshots and EAV rows) for the form, in batches
+    so memory stays bounded even for millions of rows. Returns the number created.
+    """
+    rng = random.Random(seed)
+    fields = list(form.fields.all())
+    now = timezone.now()
+    created = 0
+
+    while created < count:
+        size = min(batchSize, count - created)
+        values = [generate_submission_data(fields, rng) for _ in range(size)]
+
+        submissions = FormSubmission.objects.bulk_create([
+            FormSubmission(
+                form=form,
+                client_identifier=f'BENCH-{created + i}',
+                data_snapshot=values[i],
+            )
+            for i in range(size)
+        ])
+
+        # Spread submission dates over the past year so date sorting/pagination is realistic
+        for i, submission in enumerate(submissions):
+            submission.submission_date = now - timedelta(minutes=rng.randint(0, 525_600))
+        FormSubmission.objects.bulk_update(submissions, ['submission_date'], batch_size=batchSize)
+
+        SubmissionData.objects.bulk_create(
+            [
+                SubmissionData(submission=submission, field_name=fieldName, value=value)
+                for submission, data in zip(submissions, values)
+                for fieldName, value in data.items()
+            ],
+            batch_size=batchSize,
+        )
+
+        get_search_backend().index_documents({
+            submission.id: build_document(submission.client_identifier, data.values())
+            for submission, data in zip(submissions, values)
+        })
+        created += size
+
+    return created
@@ -0,0 +1,145 @@
+import json
+import math
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .datagen import create_form, create_submissions
+from .scenarios import SCALES, build_scenarios
+
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def generate_dataset(scale):
+    """Creates the forms and submissions for a scale and returns ({slug: Form}, submission count)."""
+    preset = SCALES[scale]
+    forms = {slug: create_form(slug, fieldCount) for slug, fieldCount in preset['forms'].items()}
+    create_submissions(next(iter(forms.values())), preset['submissions'])
+    return forms, preset['submissions']
+
+
+def measure(scenario, client, iterations, warmup=2):
+    """
+    Runs a scenario and returns its latency percentiles (ms), queries per request and the
+    peak Python memory (KiB) of one traced request. tracemalloc is only enabled for that
+    extra request so it does not distort the latency numbers.
+    """
+    for _ in range(warmup):
+        if scenario.setup:
+            scenario.setup()
+        scenario.request(client)
+
+    latencies = []
+    queries = []
+    for _ in range(iterations):
+        if scenario.setup:
+            scenario.setup()
+
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = scenario.request(client)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        if response.status_code != scenario.expectedStatus:
+            raise AssertionError(f'{scenario.name}: expected {scenario.expectedStatus}, got {response.status_code}')
+        queries.append(len(captured))
+
+    if scenario.setup:
+        scenario.setup()
+    tracemalloc.start()
+    try:
+        scenario.request(client)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(max(latencies), 3),
+        'queries': max(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_suite(scale='small', iterations=50, only=None, stdout=None):
+    """
+    Generates the data set for `scale` in the current database and measures every scenario.
+    Returns {'scale': ..., 'iterations': ..., 'results': {scenario: metrics}}.
+    """
+    cache.clear()
+    forms, submissionCount = generate_dataset(scale)
+
+    admin = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+    client = APIClient()
+    client.force_authenticate(user=admin)
+
+    results = {}
+    for scenario in build_scenarios(forms, submissionCount):
+        if only and scenario.name not in only:
+            continue
+
+        results[scenario.name] = measure(scenario, client, iterations)
+        if stdout:
+            stdout.write(f'{scenario.name:<45} {format_metrics(results[scenario.name])}')
+
+    return {'scale': scale, 'iterations': iterations, 'results': results}
+
+
+def format_metrics(metrics):
+    return (
+        f"p50 {metrics['p50_ms']:>8.2f}ms  p95 {metrics['p95_ms']:>8.2f}ms  p99 {metrics['p99_ms']:>8.2f}ms  "
+        f"queries {metrics['queries']:>3}  peak {metrics['peak_kib']:>8.1f}KiB"
+    )
+
+
+def load_baseline(path=BASELINE_PATH):
+    path = Path(path)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def write_baseline(report, path=BASELINE_PATH):
+    """Stores a report as the baseline for its scale, keeping other scales' baselines."""
+    path = Path(path)
+    baseline = load_baseline(path)
+    baseline[report['scale']] = report['results']
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+
+
+def compare_to_baseline(report, baseline, latencyTolerance=0.5, memoryTolerance=0.5):
+    """
+    Returns a list of regression messages. Query counts must not exceed the baseline at all;
+    p95 latency and peak memory may exceed it by the given fractions (timing on shared CI
+    machines is noisy, query counts are not).
+    """
+    expected = baseline.get(report['scale'], {})
+    regressions = []
+
+    for name, metrics in report['results'].items():
+        reference = expected.get(name)
+        if reference is None:
+            continue
+
+        if metrics['queries'] > reference['queries']:
+            regressions.append(f"{name}: {metrics['queries']} queries per request (baseline {reference['queries']})")
+        if metrics['p95_ms'] > reference['p95_ms'] * (1 + latencyTolerance):
+            regressions.append(f"{name}: p95 {metrics['p95_ms']}ms (baseline {reference['p95_ms']}ms)")
+        if metrics['peak_kib'] > reference['peak_kib'] * (1 + memoryTolerance):
+            regressions.append(f"{name}: peak memory {metrics['peak_kib']}KiB (baseline {reference['peak_kib']}KiB)")
+
+    return regressions
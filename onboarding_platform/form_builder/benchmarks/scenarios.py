@@ -0,0 +1,94 @@
+import json
+import random
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from form_builder.models import FormSubmission
+
+from .datagen import generate_submission_data
+
+
+# Data set sizes. Every scale builds one form per entry in `forms` ({slug: field count}) and
+# gives the first form `submissions` submissions; the other forms are only read/submitted.
+SCALES = {
+    'tiny': {'forms': {'bench-10': 10, 'bench-50': 50}, 'submissions': 200},
+    'small': {'forms': {'bench-10': 10, 'bench-100': 100, 'bench-500': 500}, 'submissions': 20_000},
+    'medium': {'forms': {'bench-10': 10, 'bench-100': 100, 'bench-500': 500}, 'submissions': 250_000},
+    'large': {'forms': {'bench-10': 10, 'bench-100': 100, 'bench-500': 500}, 'submissions': 2_000_000},
+}
+
+
+class Scenario:
+    """One repeatable request. `request(client)` performs it and returns the response."""
+
+    def __init__(self, name, request, expectedStatus=200, setup=None):
+        self.name = name
+        self.request = request
+        self.expectedStatus = expectedStatus
+        self.setup = setup # Called before every iteration, outside the measurement
+
+
+def build_scenarios(forms, submissionCount, seed=1234):
+    """Returns the scenario list for the generated data (forms is {slug: Form})."""
+    rng = random.Random(seed)
+    largestSlug = max(forms, key=lambda slug: forms[slug].fields.count())
+    mainSlug = next(iter(forms))
+    listUrl = reverse('submission-admin-list')
+    deepPage = max(1, submissionCount // 100 - 1)
+    sampleSubmission = FormSubmission.objects.filter(form=forms[mainSlug]).order_by('id').values_list('id', flat=True).first()
+    sampleIdentifier = f'BENCH-{submissionCount // 2}'
+
+    def submit(slug):
+        fields = list(forms[slug].fields.all())
+
+        def request(client):
+            data = generate_submission_data(fields, rng)
+            data['clientIdentifier'] = f'BENCH-NEW-{rng.randint(0, 10**9)}'
+            return client.post(reverse('client-submission'), {'formSlug': slug, 'submissionData': json.dumps(data)})
+        return request
+
+    def submitBatch(slug, size):
+        fields = list(forms[slug].fields.all())
+
+        def request(client):
+            items = []
+            for _ in range(size):
+                data = generate_submission_data(fields, rng)
+                data['clientIdentifier'] = f'BENCH-NEW-{rng.randint(0, 10**9)}'
+                items.append({'formSlug': slug, 'submissionData': data})
+            return client.post(reverse('client-submission-batch'), items, format='json')
+        return request
+
+    def keysetDeepPage(client):
+        # Walk to the deep page's cursor once, outside the measurement (cached on the function)
+        if not hasattr(keysetDeepPage, 'cursor'):
+            response = client.get(listUrl, {'paginationMode': 'keyset', 'pageSize': 100})
+            for _ in range(min(deepPage, 20)):
+                if not response.data['nextCursor']:
+                    break
+                response = client.get(listUrl, {'cursor': response.data['nextCursor'], 'pageSize': 100})
+            keysetDeepPage.cursor = response.data['nextCursor'] or ''
+        return client.get(listUrl, {'cursor': keysetDeepPage.cursor, 'pageSize': 100})
+
+    scenarios = [
+        Scenario('client_form_list', lambda client: client.get(reverse('client-form-list'))),
+        Scenario('client_form_detail', lambda client: client.get(reverse('client-form-detail', kwargs={'slug': largestSlug}))),
+        Scenario('client_form_detail_cold', lambda client: client.get(reverse('client-form-detail', kwargs={'slug': largestSlug})), setup=cache.clear),
+        Scenario('admin_submission_list', lambda client: client.get(listUrl, {'pageSize': 100})),
+        Scenario('admin_submission_list_deep_page', lambda client: client.get(listUrl, {'pageSize': 100, 'page': deepPage})),
+        Scenario('admin_submission_list_keyset', lambda client: client.get(listUrl, {'pageSize': 100, 'paginationMode': 'keyset'})),
+        Scenario('admin_submission_list_keyset_deep_page', keysetDeepPage),
+        Scenario('admin_submission_list_sorted', lambda client: client.get(listUrl, {'pageSize': 100, 'ordering': 'client_identifier'})),
+        Scenario('admin_submission_search', lambda client: client.get(listUrl, {'search': sampleIdentifier})),
+        Scenario('admin_submission_fulltext_search', lambda client: client.get(listUrl, {'q': sampleIdentifier})),
+        Scenario('admin_submission_detail', lambda client: client.get(reverse('submission-admin-detail', kwargs={'pk': sampleSubmission}))),
+    ]
+
+    for slug in forms:
+        scenarios.append(Scenario(f'client_submission_{slug}', submit(slug), expectedStatus=201))
+
+    # 100 submissions in one request, to compare with 100 calls of the single-submission scenario
+    scenarios.append(Scenario('client_submission_batch_100', submitBatch(mainSlug, 100)))
+
+    return scenarios
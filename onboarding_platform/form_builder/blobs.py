@@ -0,0 +1,110 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedAttachment, FileAttachment, FileUpload, StoredBlob
+
+
+def blob_name(sha256):
+    """Storage path of a blob: fanned out by hash prefix so no directory grows too large."""
+    return f'{settings.BLOB_STORAGE_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def store_blob(file_object, sha256, size):
+    """
+    Stores a file under its content hash and returns the storage name (always blob_name()).
+
+    The blob row is touched (created, or its last_seen_at refreshed) before storage is checked,
+    which keeps the garbage collector away from it while it is being attached; a collection that
+    is already deleting it holds the row until the file is gone, so the check below then sees it
+    missing. New content is saved through the storage API under the content-addressed name; when
+    a concurrent writer of the same content got there first and storage picked another name, that
+    copy is deleted again, so there is always exactly one file, under the expected name.
+
+    Call outside the transaction that attaches the blob, so a rolled-back submission leaves
+    an unreferenced blob for collect_blobs instead of a file without a row.
+    """
+    name = blob_name(sha256)
+
+    StoredBlob.objects.bulk_create(
+        [StoredBlob(sha256=sha256, file=name, size=size, last_seen_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=['sha256'],
+        update_fields=['last_seen_at'],
+    )
+
+    if not default_storage.exists(name):
+        file_object.seek(0)
+        savedName = default_storage.save(name, file_object)
+        if savedName != name:
+            default_storage.delete(savedName)
+
+    return name
+
+
+def add_references(hashes):
+    """Counts new attachments of the given blobs (one UPDATE per distinct multiplicity)."""
+    byCount = {}
+    for sha256, count in Counter(hashes).items():
+        byCount.setdefault(count, []).append(sha256)
+
+    for count, blobHashes in byCount.items():
+        StoredBlob.objects.filter(sha256__in=blobHashes).update(ref_count=F('ref_count') + count)
+
+
+def release_reference(sha256):
+    """Counts one attachment of the blob as gone; collect_blobs removes it once unreferenced."""
+    StoredBlob.objects.filter(sha256=sha256, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+def reconcile_reference_counts():
+    """
+    Recomputes every blob's ref_count from its FileAttachment rows, and the attachments of
+    archived submissions, in one UPDATE. Needed because cascading deletes (of a submission
+    or form) remove attachments without calling FileAttachment.delete().
+    """
+    attachmentCount = FileAttachment.objects.filter(sha256=OuterRef('sha256')) \
+        .order_by().values('sha256').annotate(total=Count('id')).values('total')
+    archivedCount = ArchivedAttachment.objects.filter(sha256=OuterRef('sha256')) \
+        .order_by().values('sha256').annotate(total=Count('id')).values('total')
+
+    return StoredBlob.objects.update(
+        ref_count=Coalesce(Subquery(attachmentCount), Value(0)) + Coalesce(Subquery(archivedCount), Value(0))
+    )
+
+
+def collect_garbage(graceHours=None, dryRun=False):
+    """
+    Deletes blobs that no attachment or unfinished upload references and that were not
+    stored or re-uploaded within the grace period. Returns (blobs deleted, bytes freed).
+    """
+    graceHours = settings.BLOB_GC_GRACE_HOURS if graceHours is None else graceHours
+    cutoff = timezone.now() - timedelta(hours=graceHours)
+
+    reconcile_reference_counts()
+
+    orphans = StoredBlob.objects.filter(ref_count=0, last_seen_at__lt=cutoff) \
+        .exclude(sha256__in=FileUpload.objects.filter(attachment__isnull=True).exclude(sha256='').values('sha256'))
+
+    deleted = 0
+    freed = 0
+    for blob in orphans.iterator():
+        if not dryRun:
+            # Re-check in the DELETE itself: the blob may have been attached or re-uploaded meanwhile.
+            # The deleted row stays locked until the file is gone, so store_blob waits for it.
+            with transaction.atomic():
+                removed, _ = StoredBlob.objects.filter(pk=blob.pk, ref_count=0, last_seen_at__lt=cutoff).delete()
+                if not removed:
+                    continue
+                default_storage.delete(blob.file.name)
+
+        deleted += 1
+        freed += blob.size
+
+    return deleted, freed
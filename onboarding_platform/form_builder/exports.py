@@ -0,0 +1,115 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import FormSubmission, SubmissionData, FileAttachment
+
+
+# Rows fetched per round trip from each server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+SUBMISSION_COLUMNS = ['submission_id', 'client_identifier', 'submission_date', 'is_notified']
+
+# Leading characters that make spreadsheet applications read a CSV cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object whose write() just hands the value back (lets csv.writer feed a generator)."""
+
+    def write(self, value):
+        return value
+
+
+def export_columns(form):
+    """Submission metadata columns followed by one column per FormField, in display order."""
+    return SUBMISSION_COLUMNS + [field.field_name for field in form.fields.all()]
+
+
+def iter_submission_records(form, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields one flat dict per submission of the form, pivoting its SubmissionData and
+    FileAttachment rows into columns.
+
+    Submissions, data rows and attachments are read through three cursors that are all
+    ordered by submission id and merged as they stream, so memory use stays constant no
+    matter how many submissions the form has. Submissions with a data_snapshot take their
+    values from it, so EAV rows are only read for older submissions without one.
+    """
+    submissions = (
+        FormSubmission.objects.filter(form=form)
+        .order_by('id')
+        .values_list('id', 'client_identifier', 'submission_date', 'is_notified', 'data_snapshot')
+        .iterator(chunk_size=chunk_size)
+    )
+    dataRows = (
+        SubmissionData.objects.filter(submission__form=form, submission__data_snapshot__isnull=True)
+        .order_by('submission_id')
+        .values_list('submission_id', 'field_name', 'value')
+        .iterator(chunk_size=chunk_size)
+    )
+    fileRows = (
+        FileAttachment.objects.filter(submission__form=form)
+        .order_by('submission_id', 'id')
+        .values_list('submission_id', 'field_name', 'file')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    nextData = next(dataRows, None)
+    nextFile = next(fileRows, None)
+
+    for submissionId, clientIdentifier, submissionDate, isNotified, snapshot in submissions:
+        record = {
+            'submission_id': submissionId,
+            'client_identifier': clientIdentifier,
+            'submission_date': submissionDate,
+            'is_notified': isNotified,
+        }
+        if snapshot:
+            for fieldName, value in snapshot.items():
+                record.setdefault(fieldName, value)
+
+        # Skip rows of submissions that no longer exist, then consume this submission's rows
+        while nextData is not None and nextData[0] <= submissionId:
+            if nextData[0] == submissionId:
+                record.setdefault(nextData[1], nextData[2])
+            nextData = next(dataRows, None)
+
+        while nextFile is not None and nextFile[0] <= submissionId:
+            if nextFile[0] == submissionId:
+                record.setdefault(nextFile[1], nextFile[2])
+            nextFile = next(fileRows, None)
+
+        yield record
+
+
+def escape_formula(value):
+    """Prefixes client-supplied text that a spreadsheet would evaluate as a formula with a single quote."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(form):
+    columns = export_columns(form)
+    writer = csv.DictWriter(Echo(), fieldnames=columns, extrasaction='ignore')
+
+    yield writer.writerow({column: escape_formula(column) for column in columns})
+
+    for record in iter_submission_records(form):
+        yield writer.writerow({column: escape_formula(value) for column, value in record.items()})
+
+
+def stream_ndjson(form):
+    columns = export_columns(form)
+
+    for record in iter_submission_records(form):
+        yield json.dumps({column: record.get(column) for column in columns}, cls=DjangoJSONEncoder) + '\n'
+
+
+# exportFormat query value -> (content type, generator producing the body)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', stream_csv),
+    'ndjson': ('application/x-ndjson', stream_ndjson),
+}
@@ -0,0 +1,136 @@
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from .models import FormField, SubmissionData
+
+
+# SubmissionData column holding the typed copy of each field type's values
+TYPED_COLUMNS = {
+    'number': 'value_num',
+    'date': 'value_date',
+    'checkbox': 'value_bool',
+}
+
+# Rows per UPDATE when re-parsing stored values after a field's type changed
+RETYPE_BATCH_SIZE = 1000
+
+TRUE_VALUES = ('true', '1', 'on', 'yes')
+FALSE_VALUES = ('false', '0', 'off', 'no')
+
+
+def parse_typed_value(field_type, value):
+    """The submitted text of a number, date or checkbox field as a Python value, or None if it does not parse."""
+    value = str(value).strip()
+
+    if field_type == 'number':
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        return number if math.isfinite(number) else None
+
+    if field_type == 'date':
+        try:
+            parsed = parse_date(value) or parse_datetime(value)
+        except ValueError:
+            return None
+        return parsed.date() if hasattr(parsed, 'date') else parsed
+
+    if field_type == 'checkbox':
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+
+    return None
+
+
+def typed_columns(field_type, value):
+    """Keyword arguments setting the typed shadow column of a SubmissionData row ({} for untyped fields)."""
+    column = TYPED_COLUMNS.get(field_type)
+    if column is None:
+        return {}
+    return {column: parse_typed_value(field_type, value)}
+
+
+def retype_field_values(formId, fieldName, fieldType):
+    """
+    Brings the typed columns of a form field's stored values in line with its new type: one
+    UPDATE clears the columns of the old type, then the text values are parsed into the new
+    type's column in primary-key batches.
+    """
+    rows = SubmissionData.objects.filter(submission__form_id=formId, field_name=fieldName)
+    rows.update(**{column: None for column in TYPED_COLUMNS.values()})
+
+    column = TYPED_COLUMNS.get(fieldType)
+    if column is None:
+        return
+
+    lastId = 0
+    while True:
+        batch = list(rows.filter(id__gt=lastId).order_by('id').only('id', 'value')[:RETYPE_BATCH_SIZE])
+        if not batch:
+            break
+
+        for row in batch:
+            setattr(row, column, parse_typed_value(fieldType, row.value))
+
+        SubmissionData.objects.bulk_update(batch, [column])
+        lastId = batch[-1].id
+
+
+class SubmissionFieldValueFilter(BaseFilterBackend):
+    """
+    Filters submissions by a submitted value: ?field.<field_name>=<value> for equality, or
+    ?field.<field_name>__gt= (gte, lt, lte) for ranges, e.g. ?field.loanAmount__gt=100000.
+
+    Number, date and checkbox fields are compared on their typed columns, so each filter is
+    an index range scan on (field_name, value_num/value_date/value_bool); other fields only
+    support equality on the text value. Several filters must all match.
+    """
+    param_prefix = 'field.'
+    lookups = ('exact', 'gt', 'gte', 'lt', 'lte')
+
+    def filter_queryset(self, request, queryset, view):
+        for param, rawValue in request.query_params.items():
+            if not param.startswith(self.param_prefix):
+                continue
+
+            fieldName, _, lookup = param[len(self.param_prefix):].partition('__')
+            condition = self.build_condition(param, fieldName, lookup or 'exact', rawValue)
+
+            queryset = queryset.filter(
+                id__in=SubmissionData.objects.filter(condition, field_name=fieldName).values('submission_id')
+            )
+
+        return queryset
+
+    def build_condition(self, param, fieldName, lookup, rawValue):
+        """Q matching the value in every column the field is stored in (a field name can be reused across forms)."""
+        if lookup not in self.lookups:
+            raise serializers.ValidationError({param: f"Unsupported lookup. Choose one of: {', '.join(self.lookups)}"})
+
+        fieldTypes = set(FormField.objects.filter(field_name=fieldName).values_list('field_type', flat=True))
+        if not fieldTypes:
+            raise serializers.ValidationError({param: 'No form has a field with this name.'})
+
+        conditions = []
+        for fieldType in sorted(fieldTypes):
+            column = TYPED_COLUMNS.get(fieldType)
+            if column is not None:
+                value = parse_typed_value(fieldType, rawValue)
+                if value is not None:
+                    conditions.append(Q(**{f'{column}__{lookup}': value}))
+            elif lookup == 'exact':
+                conditions.append(Q(value=rawValue))
+
+        if not conditions:
+            raise serializers.ValidationError({param: f"'{rawValue}' cannot be compared with this field."})
+
+        return reduce(or_, conditions)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from rest_framework import serializers
+
+from .models import FormSubmission
+from .schema_cache import get_validation_plan
+from .uploads import hash_file
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed' # Set to 'true' on responses answered from a previous request
+IDEMPOTENCY_CACHE_KEY = 'form_builder:idempotency:{formId}:{key}'
+
+# Longest accepted key (FormSubmission.idempotency_key)
+MAX_KEY_LENGTH = 255
+
+
+class InvalidIdempotencyKey(Exception):
+    """The Idempotency-Key header is empty or too long."""
+
+
+class IdempotencyKeyReused(Exception):
+    """The key already created a submission of this form from a different payload."""
+
+
+def get_idempotency_key(request):
+    """The request's Idempotency-Key header, or None when it was not sent."""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise InvalidIdempotencyKey(f'{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters.')
+    return key
+
+
+def payload_fingerprint(submissionData, files):
+    """SHA-256 of a submission's parsed values and the content of its files."""
+    digest = hashlib.sha256(json.dumps(submissionData, sort_keys=True, default=str).encode())
+    for fieldName in sorted(files):
+        digest.update(f'\0{fieldName}\0{hash_file(files[fieldName])}'.encode())
+    return digest.hexdigest()
+
+
+def created_response_data(submissionId):
+    """Body of the 201 response for a new (or replayed) submission."""
+    return {
+        'submissionId': submissionId,
+        'status': 'Submission successful. Notification Processing'
+    }
+
+
+def remember_response(formId, key, fingerprint, data):
+    cache.set(
+        IDEMPOTENCY_CACHE_KEY.format(formId=formId, key=key),
+        {'fingerprint': fingerprint, 'data': data},
+        settings.IDEMPOTENCY_KEY_CACHE_TIMEOUT
+    )
+
+
+def find_response(formId, key):
+    """
+    (fingerprint, 201 body) of the submission a key already created for a form, or None.
+    Checks the cache first and falls back to the unique (form, idempotency_key) columns.
+    """
+    stored = cache.get(IDEMPOTENCY_CACHE_KEY.format(formId=formId, key=key))
+    if stored is not None:
+        return stored['fingerprint'], stored['data']
+
+    row = FormSubmission.objects.filter(form_id=formId, idempotency_key=key) \
+        .values_list('id', 'idempotency_fingerprint').first()
+    if row is None:
+        return None
+
+    submissionId, fingerprint = row
+    data = created_response_data(submissionId)
+    remember_response(formId, key, fingerprint, data)
+    return fingerprint, data
+
+
+def check_replay(stored, fingerprint):
+    """The stored 201 body when the payload matches; IdempotencyKeyReused when it does not."""
+    storedFingerprint, data = stored
+    # Submissions stored before fingerprints existed have none
+    if storedFingerprint and storedFingerprint != fingerprint:
+        raise IdempotencyKeyReused(f'This {IDEMPOTENCY_HEADER} was already used for a different submission.')
+    return data
+
+
+def find_replay(serializer, key):
+    """
+    Before validation: the 201 body of the earlier request with this key when it sent the same
+    payload, None when the key is new (or the form unknown, which validation reports).
+    Raises IdempotencyKeyReused for a different payload.
+
+    The payload is fingerprinted after field parsing but before the form's rules run, so a
+    retry is still replayed when the first attempt consumed something validation checks
+    (e.g. it attached a chunked upload). The fingerprint is left in the serializer's context
+    for save_submission to store.
+    """
+    initialData = serializer.initial_data
+    plan = get_validation_plan(initialData.get('formSlug') or '')
+    if plan is None:
+        return None
+
+    try:
+        submissionData = serializer.fields['submissionData'].run_validation(initialData.get('submissionData'))
+    except serializers.ValidationError:
+        return None
+
+    fingerprint = payload_fingerprint(submissionData, serializer.files)
+    serializer.context['idempotency_fingerprint'] = fingerprint
+
+    stored = find_response(plan.form_id, key)
+    return check_replay(stored, fingerprint) if stored is not None else None
+
+
+def save_submission(serializer, key):
+    """
+    Saves a validated DynamicSubmissionSerializer (built with context['idempotency_key'] = key,
+    and checked with find_replay() first) and returns (201 body, replayed). When a concurrent
+    request with the same key committed first, the unique constraint rejects this one and that
+    request's response is returned (or IdempotencyKeyReused raised for a different payload).
+    """
+    formId = serializer.validationPlan.form_id
+    fingerprint = serializer.context.get('idempotency_fingerprint', '')
+
+    try:
+        submission = serializer.save()
+    except IntegrityError:
+        stored = find_response(formId, key) if key else None
+        if stored is None:
+            raise
+        return check_replay(stored, fingerprint), True
+
+    data = created_response_data(submission.id)
+    if key:
+        remember_response(formId, key, fingerprint, data)
+    return data, False
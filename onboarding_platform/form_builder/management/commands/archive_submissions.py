@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from form_builder.archive import archive_submissions
+from form_builder.models import Form
+
+
+class Command(BaseCommand):
+    help = 'Moves submissions older than their form\'s retention window into compressed per-month archives.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', help='Only archive submissions of the form with this slug')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be archived without archiving it')
+
+    def handle(self, *args, **options):
+        form = None
+        if options['form']:
+            form = Form.objects.filter(slug=options['form']).first()
+            if form is None:
+                raise CommandError(f"No form with slug '{options['form']}'")
+
+        archived = archive_submissions(form=form, dryRun=options['dry_run'])
+
+        for archivedForm, month, count in archived:
+            self.stdout.write(f'{archivedForm.slug} {month:%Y-%m}: {count} submissions')
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {sum(count for _, _, count in archived)} submissions'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from form_builder.blobs import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Recounts attachment references and deletes stored blobs that nothing references anymore.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, help='Keep blobs stored within this many hours (default: BLOB_GC_GRACE_HOURS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        deleted, freed = collect_garbage(options['grace_hours'], options['dry_run'])
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} unreferenced blobs ({freed} bytes)'))
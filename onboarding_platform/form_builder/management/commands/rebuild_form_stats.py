@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from form_builder.stats import refresh_form_stats
+
+
+class Command(BaseCommand):
+    help = 'Recounts the per-form stats rollups from scratch (e.g. after submissions were deleted).'
+
+    def handle(self, *args, **options):
+        counted = refresh_form_stats(rebuild=True)
+        self.stdout.write(self.style.SUCCESS(f'Counted {counted} submissions'))
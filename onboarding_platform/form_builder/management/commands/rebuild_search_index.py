@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from form_builder.models import FormSubmission
+from form_builder.search import index_submissions
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search documents of all (or one form\'s) submissions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', help='Only reindex submissions of the form with this slug')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        submissions = FormSubmission.objects.order_by('id')
+        if options['form']:
+            submissions = submissions.filter(form__slug=options['form'])
+
+        batchSize = options['batch_size']
+        lastId = 0
+        total = 0
+
+        # Walk the table by primary key so each batch is an index range scan
+        while True:
+            ids = list(submissions.filter(id__gt=lastId).values_list('id', flat=True)[:batchSize])
+            if not ids:
+                break
+
+            index_submissions(ids)
+            total += len(ids)
+            lastId = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} submissions'))
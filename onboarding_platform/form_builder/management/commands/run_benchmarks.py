@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from form_builder.benchmarks.runner import (
+    BASELINE_PATH, compare_to_baseline, load_baseline, run_suite, write_baseline,
+)
+from form_builder.benchmarks.scenarios import SCALES
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the API benchmark scenarios against a throwaway copy of the configured database '
+        '(SQLite or Postgres) and compares the results with the stored baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Only run this scenario (repeatable)')
+        parser.add_argument('--baseline', default=str(BASELINE_PATH))
+        parser.add_argument('--write-baseline', action='store_true', help='Store the results as the new baseline for this scale')
+        parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed p95 latency / peak memory increase (0.5 = 50%%)')
+        parser.add_argument('--json', dest='jsonOutput', help='Also write the full report to this file')
+
+    def handle(self, *args, **options):
+        # The data set is generated in a test database (test_<NAME>) that is dropped afterwards
+        testDatabase = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        self.stdout.write(f'Benchmarking scale "{options["scale"]}" on {connection.vendor} ({testDatabase})')
+
+        try:
+            # DEBUG stays off so query logging is only enabled where the runner captures it
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['*']):
+                report = run_suite(options['scale'], options['iterations'], options['scenarios'], self.stdout)
+        finally:
+            connection.creation.destroy_test_db(testDatabase, verbosity=0)
+
+        if options['jsonOutput']:
+            with open(options['jsonOutput'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        if options['write_baseline']:
+            write_baseline(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+            return
+
+        baseline = load_baseline(options['baseline'])
+        if options['scale'] not in baseline:
+            self.stdout.write(self.style.WARNING(f'No baseline for scale "{options["scale"]}"; nothing to compare'))
+            return
+
+        regressions = compare_to_baseline(report, baseline, options['tolerance'], options['tolerance'])
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(regression)
+            raise CommandError(f'{len(regressions)} benchmark regression(s)')
+
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_builder', '0005_submission_indexes_and_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='notification_mode',
+            field=models.CharField(choices=[('immediate', 'One email per submission'), ('digest', 'Periodic digest email')], default='immediate', max_length=20),
+        ),
+    ]
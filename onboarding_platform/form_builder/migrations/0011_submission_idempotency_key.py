@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_builder', '0010_attachment_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formsubmission',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='formsubmission',
+            constraint=models.UniqueConstraint(fields=('idempotency_key',), name='submission_idempotency_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_builder', '0011_submission_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormStats',
+            fields=[
+                ('form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='form_builder.form')),
+                ('total_submissions', models.PositiveIntegerField(default=0)),
+                ('pending_notifications', models.PositiveIntegerField(default=0)),
+                ('last_submission_id', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FormDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('submissions', models.PositiveIntegerField(default=0)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='form_builder.form')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('form', 'day'), name='daily_stats_form_day_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FormValueStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=100)),
+                ('value', models.CharField(max_length=255)),
+                ('submissions', models.PositiveIntegerField(default=0)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='value_stats', to='form_builder.form')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('form', 'field_name', 'value'), name='value_stats_form_value_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:44
+
+import math
+
+from django.db import migrations, models
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+BATCH_SIZE = 1000
+
+# Copied from form_builder.field_values as of this migration, so later changes there
+# cannot change what this migration does
+TYPED_COLUMNS = {
+    'number': 'value_num',
+    'date': 'value_date',
+    'checkbox': 'value_bool',
+}
+
+TRUE_VALUES = ('true', '1', 'on', 'yes')
+FALSE_VALUES = ('false', '0', 'off', 'no')
+
+
+def parse_typed_value(field_type, value):
+    value = str(value).strip()
+
+    if field_type == 'number':
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        return number if math.isfinite(number) else None
+
+    if field_type == 'date':
+        try:
+            parsed = parse_date(value) or parse_datetime(value)
+        except ValueError:
+            return None
+        return parsed.date() if hasattr(parsed, 'date') else parsed
+
+    if field_type == 'checkbox':
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+
+    return None
+
+
+def backfill_typed_values(apps, schema_editor):
+    """Fills the typed columns of existing rows, per typed field and in primary-key batches."""
+    FormField = apps.get_model('form_builder', 'FormField')
+    SubmissionData = apps.get_model('form_builder', 'SubmissionData')
+
+    for formId, fieldName, fieldType in FormField.objects.filter(field_type__in=TYPED_COLUMNS) \
+            .values_list('form_id', 'field_name', 'field_type'):
+        rows = SubmissionData.objects.filter(submission__form_id=formId, field_name=fieldName).order_by('id')
+        lastId = 0
+
+        while True:
+            batch = list(rows.filter(id__gt=lastId).only('id', 'value')[:BATCH_SIZE])
+            if not batch:
+                break
+
+            for row in batch:
+                setattr(row, TYPED_COLUMNS[fieldType], parse_typed_value(fieldType, row.value))
+
+            SubmissionData.objects.bulk_update(batch, [TYPED_COLUMNS[fieldType]])
+            lastId = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_builder', '0012_form_stats_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submissiondata',
+            name='value_bool',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submissiondata',
+            name='value_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submissiondata',
+            name='value_num',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='submissiondata',
+            index=models.Index(fields=['field_name', 'value_num'], name='submissiondata_num_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submissiondata',
+            index=models.Index(fields=['field_name', 'value_date'], name='submissiondata_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submissiondata',
+            index=models.Index(fields=['field_name', 'value_bool'], name='submissiondata_bool_idx'),
+        ),
+        migrations.RunPython(backfill_typed_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_builder', '0013_typed_submission_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='archive_after_days',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SubmissionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('file', models.FileField(max_length=255, upload_to='')),
+                ('compression', models.CharField(choices=[('zstd', 'Zstandard'), ('gzip', 'gzip')], max_length=10)),
+                ('submission_count', models.PositiveIntegerField()),
+                ('size', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archives', to='form_builder.form')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='form_builder.submissionarchive')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='submissionarchive',
+            index=models.Index(fields=['form', 'month'], name='archive_form_month_idx'),
+        ),
+    ]
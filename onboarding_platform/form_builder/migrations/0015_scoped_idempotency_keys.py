@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_builder', '0014_submission_archives'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='formsubmission',
+            name='submission_idempotency_key_uniq',
+        ),
+        migrations.AddField(
+            model_name='formsubmission',
+            name='idempotency_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='formsubmission',
+            constraint=models.UniqueConstraint(fields=('form', 'idempotency_key'), name='submission_form_idempotency_key_uniq'),
+        ),
+    ]
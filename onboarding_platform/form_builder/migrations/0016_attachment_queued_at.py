@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_builder', '0015_scoped_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileattachment',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
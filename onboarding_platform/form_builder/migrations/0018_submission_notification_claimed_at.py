@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_builder', '0017_outbox_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formsubmission',
+            name='notification_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
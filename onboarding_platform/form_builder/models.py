@@ -1,17 +1,73 @@
+import uuid
+
 from django.db import models
-from django.db.models import JSONField
+from django.db.models import F, JSONField
+
+
+def _invalidate_cached_schemas():
+    # Imported lazily: schema_cache itself depends on these models
+    from .schema_cache import invalidate_form_schemas
+    invalidate_form_schemas()
+
+
+def _release_blob(sha256):
+    # Imported lazily: blobs depends on these models
+    from .blobs import release_reference
+    release_reference(sha256)
 
 
 class Form(models.Model):
     """Defines a customizable form template (e.g., 'KYC Form')."""
+    NOTIFICATION_MODES = (
+        ('immediate', 'One email per submission'),
+        ('digest', 'Periodic digest email'), # Batched by tasks.sendNotificationDigests
+    )
+
     name = models.CharField(max_length=255, unique=True)
     slug = models.SlugField(max_length=255, unique=True)
     description = models.TextField(blank=True, null=True, default='')
     is_active = models.BooleanField(default=True)
+    notification_mode = models.CharField(max_length=20, choices=NOTIFICATION_MODES, default='immediate')
+
+    # Submissions older than this many days are moved to compressed archives (see archive.py);
+    # null falls back to settings.SUBMISSION_ARCHIVE_AFTER_DAYS
+    archive_after_days = models.PositiveIntegerField(blank=True, null=True)
+
+    # Incremented whenever the form or any of its fields changes. Cached client schemas
+    # and their ETags are derived from it.
+    schema_version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        bumpVersion = not self._state.adding
+
+        if bumpVersion:
+            # Increment in SQL so concurrent edits never end up sharing a version
+            self.schema_version = F('schema_version') + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'schema_version'}
+
+        super().save(*args, **kwargs)
+
+        if bumpVersion:
+            self.refresh_from_db(fields=['schema_version'])
+
+        _invalidate_cached_schemas()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        _invalidate_cached_schemas()
+        return result
+
+    @classmethod
+    def bump_schema_version(cls, form_id):
+        """Marks a form's schema as changed without loading it (used when fields change)."""
+        cls.objects.filter(pk=form_id).update(schema_version=F('schema_version') + 1)
+        _invalidate_cached_schemas()
+
 
 class FormField(models.Model):
     """Defines the fields that belong to a specific Form."""
@@ -42,6 +98,16 @@ class FormField(models.Model):
     def __str__(self):
         return f'{self.form.name} - {self.label}'
 
+    # Any field change is a change to the parent form's schema
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Form.bump_schema_version(self.form_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Form.bump_schema_version(self.form_id)
+        return result
+
 
 class FormSubmission(models.Model):
     """Tracks an instance of a client submitting a form."""
@@ -50,9 +116,42 @@ class FormSubmission(models.Model):
     submission_date = models.DateTimeField(auto_now_add=True)
     is_notified = models.BooleanField(default=False)
 
+    # Copy of the submitted (non-file) values as {field_name: value}, written in the same
+    # transaction as the SubmissionData rows so readers can load one row instead of N.
+    # Null for submissions stored before snapshots existed (or with snapshots disabled).
+    data_snapshot = models.JSONField(blank=True, null=True)
+
+    # Client-chosen Idempotency-Key header of the request that created it, so retries of
+    # that request are answered with this submission instead of creating another one. Keys are
+    # scoped to the form; the fingerprint (SHA-256 of the payload) tells a retry from a reuse.
+    idempotency_key = models.CharField(max_length=255, blank=True, null=True)
+    idempotency_fingerprint = models.CharField(max_length=64, blank=True, default='')
+
+    # Set while a sendNotificationDigests run is emailing it; expires after NOTIFICATION_DIGEST_CLAIM_TIMEOUT_SECONDS
+    notification_claimed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'idempotency_key'], name='submission_form_idempotency_key_uniq'),
+        ]
+        # Match the admin list's sort/filter fields; keyset pagination walks (sort value, id)
+        indexes = [
+            models.Index(fields=['submission_date', 'id'], name='submission_date_id_idx'),
+            models.Index(fields=['client_identifier', 'id'], name='submission_client_id_idx'),
+            models.Index(fields=['form', 'submission_date'], name='submission_form_date_idx'),
+            models.Index(fields=['is_notified', 'submission_date'], name='submission_notified_date_idx'),
+        ]
+
     def __str__(self):
         return f'Submission #{self.id} for {self.form.name}'
 
+    def get_submission_data(self):
+        """Submitted values as {field_name: value}, from the snapshot when there is one."""
+        if self.data_snapshot is not None:
+            return dict(self.data_snapshot)
+
+        return {entry.field_name: entry.value for entry in self.data_entries.all()}
+
 
 class SubmissionData(models.Model):
     """Stores the submitted client data in a flexible key-value format."""
@@ -67,8 +166,139 @@ class SubmissionData(models.Model):
     # This design is key for future-proofing; schema changes don't affect old data [cite: 20]
     value = models.TextField() # Use TextField for simple data storage (since files go to FileAttachment)
 
+    # Typed copies of `value` for number, date and checkbox fields (see field_values.py), set
+    # when the row is written so value filters are index range scans instead of casts.
+    # Null for other field types and for values that do not parse.
+    value_num = models.FloatField(blank=True, null=True)
+    value_date = models.DateField(blank=True, null=True)
+    value_bool = models.BooleanField(blank=True, null=True)
+
     class Meta:
         unique_together = ('submission', 'field_name')
+        indexes = [
+            models.Index(fields=['field_name', 'value_num'], name='submissiondata_num_idx'),
+            models.Index(fields=['field_name', 'value_date'], name='submissiondata_date_idx'),
+            models.Index(fields=['field_name', 'value_bool'], name='submissiondata_bool_idx'),
+        ]
+
+class SubmissionArchive(models.Model):
+    """
+    Compressed NDJSON file holding the archived submissions of one form for one calendar
+    month (see archive.py). Rehydrating it moves the submissions back into the live tables.
+    """
+    COMPRESSIONS = (
+        ('zstd', 'Zstandard'),
+        ('gzip', 'gzip'),
+    )
+
+    form = models.ForeignKey(Form, related_name='archives', on_delete=models.CASCADE)
+    month = models.DateField() # First day of the month the submissions were made in
+    file = models.FileField(max_length=255)
+    compression = models.CharField(max_length=10, choices=COMPRESSIONS)
+    submission_count = models.PositiveIntegerField()
+    size = models.BigIntegerField() # Compressed bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['form', 'month'], name='archive_form_month_idx'),
+        ]
+
+
+class ArchivedAttachment(models.Model):
+    """
+    The blob of an attachment whose submission is archived. Counted as a reference by
+    blobs.reconcile_reference_counts, so archived files are never garbage collected.
+    """
+    archive = models.ForeignKey(SubmissionArchive, related_name='attachments', on_delete=models.CASCADE)
+    sha256 = models.CharField(max_length=64, db_index=True)
+
+
+class FormStats(models.Model):
+    """
+    Per-form rollup behind /api/admin/forms/{slug}/stats/, maintained incrementally by
+    tasks.refreshFormStats (see stats.py) so dashboards never aggregate the EAV table.
+    """
+    form = models.OneToOneField(Form, related_name='stats', on_delete=models.CASCADE, primary_key=True)
+    total_submissions = models.PositiveIntegerField(default=0)
+    pending_notifications = models.PositiveIntegerField(default=0) # Submissions not notified yet
+
+    # Submissions up to this ID are counted in the rollups
+    last_submission_id = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+
+
+class FormDailyStats(models.Model):
+    """Submissions of a form per day (in TIME_ZONE)."""
+    form = models.ForeignKey(Form, related_name='daily_stats', on_delete=models.CASCADE)
+    day = models.DateField()
+    submissions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'day'], name='daily_stats_form_day_uniq'),
+        ]
+
+
+class FormValueStats(models.Model):
+    """How often each option of a dropdown field was submitted."""
+    form = models.ForeignKey(Form, related_name='value_stats', on_delete=models.CASCADE)
+    field_name = models.CharField(max_length=100)
+    value = models.CharField(max_length=255)
+    submissions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'field_name', 'value'], name='value_stats_form_value_uniq'),
+        ]
+
+
+class StoredBlob(models.Model):
+    """
+    One stored file, addressed by the SHA-256 of its content (see blobs.py). Attachments with
+    the same content share the blob; ref_count counts them, and collect_blobs deletes blobs
+    nothing references anymore.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Last time this content was stored (or stored again); collection waits a grace period after it
+    last_seen_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'last_seen_at'], name='blob_unreferenced_idx'),
+        ]
+
+
+class FileUpload(models.Model):
+    """
+    A resumable, chunked upload of one file for a form's file_upload field. Chunks are appended
+    to a staging file (see uploads.py); once all `size` bytes arrived the file is streamed into
+    storage, hashed on the way, and a submission can reference it by ID instead of sending it.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    form = models.ForeignKey(Form, related_name='uploads', on_delete=models.CASCADE)
+    field_name = models.CharField(max_length=100)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, blank=True)
+    size = models.BigIntegerField() # Declared when the upload starts, checked against max_size
+    received_bytes = models.BigIntegerField(default=0)
+
+    # Set once the last chunk arrived
+    file = models.FileField(upload_to='form_uploads/', blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
+
 
 class FileAttachment(models.Model):
     """Handles document uploads separately."""
@@ -76,3 +306,69 @@ class FileAttachment(models.Model):
     field_name = models.CharField(max_length=100) # Links the file to the correct form field
     file = models.FileField(upload_to='form_uploads/') # Stores the file itself [cite: 12, 22]
     uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    # The client's name for the file (`file` itself is named after its content hash)
+    filename = models.CharField(max_length=255, blank=True)
+
+    # Computed while the file is written; blank for attachments stored before they existed
+    sha256 = models.CharField(max_length=64, blank=True)
+    size = models.BigIntegerField(blank=True, null=True)
+    content_type = models.CharField(max_length=255, blank=True)
+
+    # The chunked upload this attachment was created from (each upload can be attached once)
+    upload = models.OneToOneField(FileUpload, related_name='attachment', blank=True, null=True, on_delete=models.SET_NULL)
+
+    # Filled in after the submission by tasks.processAttachments (see attachments.py);
+    # processed_at stays null until then
+    detected_type = models.CharField(max_length=255, blank=True) # Sniffed from the content, not the client's claim
+    page_count = models.PositiveIntegerField(blank=True, null=True)
+    thumbnail = models.FileField(max_length=255, blank=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    # When processing was last queued; the sweeper re-queues only after ATTACHMENT_REQUEUE_AFTER_MINUTES
+    queued_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sha256'], name='attachment_sha256_idx'),
+            models.Index(fields=['processed_at', 'id'], name='attachment_processed_idx'),
+        ]
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        if self.sha256:
+            _release_blob(self.sha256)
+        return result
+
+
+class SubmissionSearchDocument(models.Model):
+    """
+    Denormalized text of a submission (client identifier + submitted values) used for
+    full-text search. The database-specific index over `document` (an SQLite FTS5 table
+    or a PostgreSQL tsvector GIN index) is created by migration; see search.py.
+    """
+    submission = models.OneToOneField(
+        FormSubmission,
+        related_name='search_document',
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    document = models.TextField()
+
+
+class NotificationOutbox(models.Model):
+    """
+    Transactional outbox for admin notifications. A row is written in the same transaction
+    as its submission and relayed to Celery after commit (tasks.relayNotificationOutbox),
+    so a notification is only published for committed submissions (a publish retried after a
+    killed relay is delivered again, and sendAdminNotification ignores the duplicate).
+    """
+    submission = models.OneToOneField(FormSubmission, related_name='notification_outbox', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(blank=True, null=True) # Null until published to the broker
+    claimed_at = models.DateTimeField(blank=True, null=True) # Set while a relay is publishing the row
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dispatched_at', 'id'], name='outbox_dispatched_idx'),
+        ]
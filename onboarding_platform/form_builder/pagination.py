@@ -1,4 +1,15 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
 
 
@@ -22,4 +33,165 @@ class CustomPageNumberPagination(PageNumberPagination):
             'totalRows': self.page.paginator.count,
             'totalPages': self.page.paginator.num_pages,
             'rows': data
-        })
\ No newline at end of file
+        })
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for large submission tables.
+
+    Pages are addressed by an opaque cursor holding the last row's (sort value, id) instead
+    of an OFFSET, so every page costs the same index range scan as page 1. The sort column
+    is the first term of the queryset's ordering (as applied by OrderingFilter) and `id`
+    breaks ties in the same direction.
+
+    Responds in the same pageIndex/pageSize/rows shape as CustomPageNumberPagination, plus
+    nextCursor/previousCursor. totalRows is a cached (or, on PostgreSQL, estimated) count;
+    pass includeTotal=false to skip it entirely.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'pageSize'
+    include_total_query_param = 'includeTotal'
+    max_page_size = 100
+    page_size = 12
+    default_ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.pageSize = self.get_page_size(request)
+
+        ordering = queryset.query.order_by or (self.default_ordering,)
+        term = ordering[0]
+        self.descending = term.startswith('-')
+        self.sortField = term.lstrip('-')
+
+        queryset = self.annotate_sort_value(queryset)
+        outputField = queryset.query.annotations['keyset_value'].output_field
+
+        position = self.decode_cursor(request, outputField)
+        self.pageIndex = position['page'] if position else 1
+        backwards = bool(position) and position['backwards']
+
+        # Walking backwards means reading the ordering in reverse and flipping the page afterwards
+        descending = self.descending != backwards
+        queryset = queryset.order_by(self.sort_expression(descending), '-id' if descending else 'id')
+
+        if position:
+            queryset = queryset.filter(self.after_position(position, descending))
+
+        # One extra row tells us whether there is another page in this direction
+        rows = list(queryset[:self.pageSize + 1])
+        hasMore = len(rows) > self.pageSize
+        rows = rows[:self.pageSize]
+
+        if backwards:
+            rows.reverse()
+            self.hasNext, self.hasPrevious = True, hasMore
+        else:
+            self.hasNext, self.hasPrevious = hasMore, position is not None
+
+        self.rows = rows
+        self.totalRows = self.get_total_rows(request)
+        return rows
+
+    def annotate_sort_value(self, queryset):
+        """Exposes the raw sort column as `keyset_value`, which the cursor is built from."""
+        # Kept (filtered/searched, but not positioned) for the total count
+        self.filteredQueryset = queryset
+        if self.sortField in queryset.query.annotations:
+            self.nullable = True
+        else:
+            self.nullable = queryset.model._meta.get_field(self.sortField).null
+
+        return queryset.annotate(keyset_value=F(self.sortField))
+
+    def sort_expression(self, descending):
+        """The raw sort column, with NULLs sorting as its smallest value in either direction."""
+        column = F(self.sortField)
+        if not self.nullable:
+            return column.desc() if descending else column.asc()
+        return column.desc(nulls_last=True) if descending else column.asc(nulls_first=True)
+
+    def after_position(self, position, descending):
+        """
+        Rows after the cursor in the walking direction: a greater (or, descending, smaller)
+        sort value, or the same value and a later id. An index on (column, id) answers both
+        branches of the OR with range scans.
+        """
+        value, lastId = position['value'], position['id']
+        isNull = f'{self.sortField}__isnull'
+
+        if value is None:
+            # The cursor is among the NULLs: the rest of them, then (forwards) every other value
+            if descending:
+                return Q(**{isNull: True, 'id__lt': lastId})
+            return Q(**{isNull: True, 'id__gt': lastId}) | Q(**{isNull: False})
+
+        if not descending:
+            return Q(**{f'{self.sortField}__gt': value}) | Q(**{self.sortField: value, 'id__gt': lastId})
+
+        condition = Q(**{f'{self.sortField}__lt': value}) | Q(**{self.sortField: value, 'id__lt': lastId})
+        return condition | Q(**{isNull: True}) if self.nullable else condition
+
+    def get_page_size(self, request):
+        try:
+            pageSize = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return max(1, min(pageSize, self.max_page_size))
+
+    def encode_cursor(self, row, backwards):
+        page = self.pageIndex - 1 if backwards else self.pageIndex + 1
+        payload = {'v': row.keyset_value, 'id': row.id, 'p': page, 'b': backwards}
+        # isoformat() keeps full microsecond precision (DjangoJSONEncoder truncates to milliseconds)
+        return urlsafe_b64encode(json.dumps(payload, default=lambda value: value.isoformat()).encode()).decode()
+
+    def decode_cursor(self, request, outputField):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()))
+            return {
+                'value': outputField.to_python(payload['v']),
+                'id': int(payload['id']),
+                'page': max(1, int(payload['p'])),
+                'backwards': bool(payload['b']),
+            }
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound('Invalid cursor')
+
+    def get_total_rows(self, request):
+        if request.query_params.get(self.include_total_query_param, 'true').lower() == 'false':
+            return None
+
+        queryset = self.filteredQueryset.order_by()
+        connection = connections[queryset.db]
+
+        # An unfiltered table on PostgreSQL: the planner's row estimate is close enough and free
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+
+        # Otherwise cache the exact count per distinct filter (search term etc.)
+        countKey = 'form_builder:keyset-count:' + hashlib.sha256(str(queryset.query).encode()).hexdigest()
+        return cache.get_or_set(countKey, queryset.count, settings.SUBMISSION_COUNT_CACHE_TIMEOUT)
+
+    def get_paginated_response(self, data):
+        totalPages = None
+        if self.totalRows is not None:
+            totalPages = max(1, math.ceil(self.totalRows / self.pageSize))
+
+        return Response({
+            'pageIndex': self.pageIndex,
+            'pageSize': self.pageSize,
+            'totalRows': self.totalRows,
+            'totalPages': totalPages,
+            'nextCursor': self.encode_cursor(self.rows[-1], False) if self.hasNext and self.rows else None,
+            'previousCursor': self.encode_cursor(self.rows[0], True) if self.hasPrevious and self.rows else None,
+            'rows': data
+        })
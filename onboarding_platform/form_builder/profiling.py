@@ -0,0 +1,191 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from rest_framework import serializers
+
+
+# Histogram bucket upper bounds: seconds for durations, statement counts for queries
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 500)
+
+# (metric name, help text, RequestProfile attribute, buckets)
+METRICS = (
+    ('form_builder_request_duration_seconds', 'Wall time spent handling the request.', 'total', DURATION_BUCKETS),
+    ('form_builder_request_sql_duration_seconds', 'Time spent executing SQL statements.', 'sqlTime', DURATION_BUCKETS),
+    ('form_builder_request_serializer_duration_seconds', 'Time spent building serializer output.', 'serializerTime', DURATION_BUCKETS),
+    ('form_builder_request_queries', 'SQL statements executed per request.', 'queries', QUERY_BUCKETS),
+)
+
+# The profile of the request being handled in this thread/task, if profiling is enabled
+_currentProfile = contextvars.ContextVar('form_builder_request_profile', default=None)
+
+
+class RequestProfile:
+    """Timings collected for one request (durations in seconds)."""
+    __slots__ = ('view', 'queries', 'sqlTime', 'serializerTime', 'serializerDepth', 'total')
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.sqlTime = 0.0
+        self.serializerTime = 0.0
+        self.serializerDepth = 0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper: counts and times every statement on the connection."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sqlTime += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        """Value for the Server-Timing response header (durations in milliseconds)."""
+        return (
+            f'db;desc="{self.queries} queries";dur={self.sqlTime * 1000:.2f}, '
+            f'serializer;dur={self.serializerTime * 1000:.2f}, '
+            f'total;dur={self.total * 1000:.2f}'
+        )
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram per view label."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {} # view: [bucket counts..., +Inf count, sum]
+
+    def observe(self, view, value):
+        series = self.series.get(view)
+        if series is None:
+            series = self.series[view] = [0] * (len(self.buckets) + 1) + [0.0]
+
+        # Counts are stored per bucket and made cumulative when rendered
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+
+class MetricsRegistry:
+    """In-process aggregate of request profiles. Each worker process exposes its own."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.histograms = {name: Histogram(buckets) for name, _, _, buckets in METRICS}
+
+    def record(self, profile):
+        with self.lock:
+            for name, _, attribute, _ in METRICS:
+                self.histograms[name].observe(profile.view, getattr(profile, attribute))
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, helpText, _, buckets in METRICS:
+                lines.append(f'# HELP {name} {helpText}')
+                lines.append(f'# TYPE {name} histogram')
+
+                for view, series in sorted(self.histograms[name].series.items()):
+                    label = view.replace('\\', '\\\\').replace('"', '\\"')
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), series):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{view="{label}"}} {series[-1]:.6f}')
+                    lines.append(f'{name}_count{{view="{label}"}} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def view_label(view_func, method):
+    """
+    Names a resolved view for metrics: 'AdminSubmissionViewSet.list' for viewset actions,
+    'ClientSubmissionAPIView' for API views, the function name for anything else.
+    """
+    viewClass = getattr(view_func, 'cls', None)
+    if viewClass is None:
+        return getattr(view_func, '__name__', 'unknown')
+
+    # Viewset routes map each HTTP method to an action
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return f'{viewClass.__name__}.{actions.get(method.lower(), method.lower())}'
+    return viewClass.__name__
+
+
+def _install_serializer_timer():
+    """
+    Times BaseSerializer.data, which every DRF view calls once on its top-level serializer
+    to build the response (nested serializers go through to_representation instead).
+    Only requests with an active RequestProfile pay for the timing.
+    """
+    originalData = serializers.BaseSerializer.data
+    if getattr(originalData.fget, 'profiled', False):
+        return
+
+    def data(serializer):
+        profile = _currentProfile.get()
+        if profile is None:
+            return originalData.fget(serializer)
+
+        # Serializer.data calls BaseSerializer.data via super(); only the outermost call counts
+        profile.serializerDepth += 1
+        started = time.perf_counter()
+        try:
+            return originalData.fget(serializer)
+        finally:
+            profile.serializerDepth -= 1
+            if profile.serializerDepth == 0:
+                profile.serializerTime += time.perf_counter() - started
+
+    data.profiled = True
+    serializers.BaseSerializer.data = property(data)
+
+
+class RequestProfilingMiddleware:
+    """
+    Opt-in profiler: records query count, SQL time, serializer time and wall time of each
+    request, sends them back as a Server-Timing header and aggregates them per view into
+    the histograms served by MetricsView. Enable it with settings.REQUEST_PROFILING.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_serializer_timer()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _currentProfile.set(profile)
+        started = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _currentProfile.reset(token)
+
+        profile.total = time.perf_counter() - started
+        response['Server-Timing'] = profile.server_timing()
+
+        # Unresolved URLs (404s) are not recorded so scanners cannot add arbitrary labels
+        if profile.view is not None:
+            registry.record(profile)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _currentProfile.get().view = view_label(view_func, request.method)
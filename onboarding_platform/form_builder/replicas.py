@@ -0,0 +1,96 @@
+import contextvars
+import random
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Cookie set after a write: while present, the client's reads go to the primary
+PIN_COOKIE = 'db_primary_pin'
+
+# Replica alias the reads of the request being handled go to (None: the primary)
+_replicaAlias = contextvars.ContextVar('form_builder_replica_alias', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def reading_from_replica():
+    """True while a request's reads are routed to a read replica."""
+    return _replicaAlias.get() is not None
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of views marked `use_read_replica = True` to the replica the middleware
+    picked for the request (one of settings.DATABASE_REPLICAS); everything else, and every
+    write, uses 'default'. Routing has no side effects: switching a request back to the
+    primary after it writes is done by the middleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replicaAlias.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive their schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def pin_primary_on_write(execute, sql, params, many, context):
+    """Database execute wrapper: a write to the primary sends the request's later reads there too."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        _replicaAlias.set(None)
+    return execute(sql, params, many, context)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enables replica reads for safe requests to views marked `use_read_replica = True`, unless
+    the client recently wrote something: a successful unsafe request (POST, PATCH, ...) sets
+    PIN_COOKIE for DATABASE_REPLICA_PIN_SECONDS, during which the client reads from the
+    primary (read-your-writes while the replicas catch up). The replica is picked once per
+    request, so all of its reads see the same point in replication. A statement other than a
+    SELECT sent to the primary during such a request switches its remaining reads back to the
+    primary, so the request reads what it wrote.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _replicaAlias.set(None)
+        # Only safe requests read from a replica, so only they need to watch for writes
+        watchWrites = connections[DEFAULT_DB_ALIAS].execute_wrapper(pin_primary_on_write) \
+            if request.method in SAFE_METHODS else nullcontext()
+        try:
+            with watchWrites:
+                response = self.get_response(request)
+        finally:
+            _replicaAlias.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        viewClass = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+
+        if (
+            request.method in SAFE_METHODS
+            and getattr(viewClass, 'use_read_replica', False)
+            and PIN_COOKIE not in request.COOKIES
+            and settings.DATABASE_REPLICAS
+        ):
+            _replicaAlias.set(random.choice(settings.DATABASE_REPLICAS))
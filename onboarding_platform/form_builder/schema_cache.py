@@ -0,0 +1,222 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Form
+from .replicas import reading_from_replica
+from .validation import compile_validation_plan
+
+
+# Opaque token identifying the current version of every form schema. All cached schema
+# artifacts include it in their key, so bumping it invalidates them in every process.
+SCHEMA_GENERATION_KEY = 'form_builder:schema-generation'
+# Plans are pickled: bump the version whenever ValidationPlan gains or loses attributes
+VALIDATION_PLAN_KEY = 'form_builder:validation-plan:v2:{generation}:{slug}'
+
+# Client schemas: a per-generation pointer from slug to the form's current version,
+# and the serialized schema itself, stored once per (form, schema_version).
+CLIENT_FORM_VERSION_KEY = 'form_builder:client-form-version:{generation}:{slug}'
+CLIENT_FORM_SCHEMA_KEY = 'form_builder:client-form-schema:{form_id}:v{version}'
+CLIENT_FORM_LIST_KEY = 'form_builder:client-form-list:{generation}'
+
+# Cached in place of a version pointer when no active form has the slug
+MISSING_FORM = 0
+
+# Per-process copy of the plans, keyed by slug: {slug: (generation, plan)}
+_localValidationPlans = {}
+
+
+def get_schema_generation():
+    """Returns the current schema generation token, creating one if the cache lost it."""
+    generation = cache.get(SCHEMA_GENERATION_KEY)
+
+    if generation is None:
+        # add() keeps the first token if several processes race to create one
+        cache.add(SCHEMA_GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(SCHEMA_GENERATION_KEY)
+
+    return generation
+
+
+async def aget_schema_generation():
+    """Async variant of get_schema_generation()."""
+    generation = await cache.aget(SCHEMA_GENERATION_KEY)
+
+    if generation is None:
+        await cache.aadd(SCHEMA_GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = await cache.aget(SCHEMA_GENERATION_KEY)
+
+    return generation
+
+
+def fill_timeout():
+    """
+    Timeout of a generation-keyed entry just built from the database. Entries read from a
+    replica may predate the last schema change (replication lag), so they expire soon.
+    Entries keyed by schema_version are immutable and always kept for the full timeout.
+    """
+    if reading_from_replica():
+        return min(settings.FORM_SCHEMA_CACHE_TIMEOUT, settings.DATABASE_REPLICA_CACHE_TIMEOUT)
+    return settings.FORM_SCHEMA_CACHE_TIMEOUT
+
+
+def bump_schema_generation():
+    cache.set(SCHEMA_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_form_schemas():
+    """
+    Invalidates every cached form schema.
+
+    The generation is bumped immediately and again once the surrounding transaction
+    commits, so a reader that cached the pre-commit rows in between is discarded too.
+    """
+    bump_schema_generation()
+    transaction.on_commit(bump_schema_generation)
+
+
+def get_validation_plan(slug):
+    """
+    Returns the compiled ValidationPlan for an active form, or None if there is no
+    active form with that slug. Served from process memory, then Django's cache,
+    and only compiled from the database when both miss.
+    """
+    generation = get_schema_generation()
+
+    localEntry = _localValidationPlans.get(slug)
+    if localEntry is not None and localEntry[0] == generation:
+        return localEntry[1]
+
+    cacheKey = VALIDATION_PLAN_KEY.format(generation=generation, slug=slug)
+    plan = cache.get(cacheKey)
+
+    if plan is None:
+        form = Form.objects.filter(slug=slug, is_active=True).prefetch_related('fields').first()
+        if form is None:
+            return None
+
+        plan = compile_validation_plan(form)
+        cache.set(cacheKey, plan, settings.FORM_SCHEMA_CACHE_TIMEOUT)
+
+    _localValidationPlans[slug] = (generation, plan)
+    return plan
+
+
+def get_client_form_schema(slug):
+    """
+    Returns (etag, data) for the public schema of an active form, or None if there is no
+    active form with that slug. The strong ETag is derived from the form's schema_version,
+    which changes whenever the form or one of its fields changes.
+    """
+    # Imported lazily: serializers depends on this module for validation plans
+    from .serializers import ClientFormDetailSerializer
+
+    generation = get_schema_generation()
+    versionKey = CLIENT_FORM_VERSION_KEY.format(generation=generation, slug=slug)
+    pointer = cache.get(versionKey)
+
+    if pointer is None:
+        row = Form.objects.filter(slug=slug, is_active=True).values_list('id', 'schema_version').first()
+        pointer = row or MISSING_FORM
+        cache.set(versionKey, pointer, fill_timeout())
+
+    if pointer == MISSING_FORM:
+        return None
+
+    formId, version = pointer
+    schemaKey = CLIENT_FORM_SCHEMA_KEY.format(form_id=formId, version=version)
+    schema = cache.get(schemaKey)
+
+    if schema is None:
+        form = Form.objects.filter(id=formId, is_active=True).prefetch_related('fields').first()
+        if form is None:
+            return None
+
+        # Label the payload with the version it was actually built from
+        schema = (f'"form-{form.id}-v{form.schema_version}"', dict(ClientFormDetailSerializer(form).data))
+        cache.set(
+            CLIENT_FORM_SCHEMA_KEY.format(form_id=form.id, version=form.schema_version),
+            schema,
+            settings.FORM_SCHEMA_CACHE_TIMEOUT,
+        )
+
+    return schema
+
+
+async def aget_client_form_schema(slug):
+    """Async variant of get_client_form_schema(), reading the same cache entries."""
+    from .serializers import ClientFormDetailSerializer
+
+    generation = await aget_schema_generation()
+    versionKey = CLIENT_FORM_VERSION_KEY.format(generation=generation, slug=slug)
+    pointer = await cache.aget(versionKey)
+
+    if pointer is None:
+        row = await Form.objects.filter(slug=slug, is_active=True).values_list('id', 'schema_version').afirst()
+        pointer = row or MISSING_FORM
+        await cache.aset(versionKey, pointer, settings.FORM_SCHEMA_CACHE_TIMEOUT)
+
+    if pointer == MISSING_FORM:
+        return None
+
+    formId, version = pointer
+    schema = await cache.aget(CLIENT_FORM_SCHEMA_KEY.format(form_id=formId, version=version))
+
+    if schema is None:
+        form = await Form.objects.filter(id=formId, is_active=True).prefetch_related('fields').afirst()
+        if form is None:
+            return None
+
+        # The fields are prefetched, so serializing does not touch the database
+        schema = (f'"form-{form.id}-v{form.schema_version}"', dict(ClientFormDetailSerializer(form).data))
+        await cache.aset(
+            CLIENT_FORM_SCHEMA_KEY.format(form_id=form.id, version=form.schema_version),
+            schema,
+            settings.FORM_SCHEMA_CACHE_TIMEOUT,
+        )
+
+    return schema
+
+
+def get_client_form_list():
+    """Returns (etag, data) for the public list of active forms."""
+    from .serializers import ClientFormSummarySerializer
+
+    generation = get_schema_generation()
+    listKey = CLIENT_FORM_LIST_KEY.format(generation=generation)
+    formList = cache.get(listKey)
+
+    if formList is None:
+        forms = list(Form.objects.filter(is_active=True).order_by('name'))
+
+        # Any version change on a listed form, or a form joining/leaving the list, changes the ETag
+        fingerprint = ','.join(f'{form.id}:{form.schema_version}' for form in forms)
+        etag = '"forms-%s"' % hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+        formList = (etag, [dict(item) for item in ClientFormSummarySerializer(forms, many=True).data])
+        cache.set(listKey, formList, fill_timeout())
+
+    return formList
+
+
+async def aget_client_form_list():
+    """Async variant of get_client_form_list()."""
+    from .serializers import ClientFormSummarySerializer
+
+    generation = await aget_schema_generation()
+    listKey = CLIENT_FORM_LIST_KEY.format(generation=generation)
+    formList = await cache.aget(listKey)
+
+    if formList is None:
+        forms = [form async for form in Form.objects.filter(is_active=True).order_by('name')]
+
+        fingerprint = ','.join(f'{form.id}:{form.schema_version}' for form in forms)
+        etag = '"forms-%s"' % hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+        formList = (etag, [dict(item) for item in ClientFormSummarySerializer(forms, many=True).data])
+        await cache.aset(listKey, formList, settings.FORM_SCHEMA_CACHE_TIMEOUT)
+
+    return formList
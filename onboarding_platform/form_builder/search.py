@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend
+
+from .models import FormSubmission, SubmissionSearchDocument
+
+
+FTS_TABLE = 'form_builder_submissionsearch_fts'
+DOCUMENT_TABLE = SubmissionSearchDocument._meta.db_table
+
+
+def build_document(clientIdentifier, values):
+    """Text indexed for a submission: its client identifier followed by every submitted value."""
+    parts = [clientIdentifier or '']
+    parts.extend(str(value) for value in values if value is not None and value != '')
+    return '\n'.join(parts)
+
+
+class SearchBackend:
+    """
+    Base full-text search backend. Documents are stored the same way everywhere; backends
+    only differ in how they match a query against the database-specific index.
+    """
+
+    def index_documents(self, documents):
+        """Inserts or replaces search documents given as {submission_id: text}."""
+        SubmissionSearchDocument.objects.bulk_create(
+            [SubmissionSearchDocument(submission_id=submissionId, document=text) for submissionId, text in documents.items()],
+            update_conflicts=True,
+            unique_fields=['submission'],
+            update_fields=['document'],
+        )
+
+    def matching_ids(self, query):
+        """Returns a subquery (usable with id__in) of submission ids matching the query."""
+        raise NotImplementedError
+
+    def filter(self, queryset, query):
+        return queryset.filter(id__in=self.matching_ids(query))
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Matches against the FTS5 table created by migration 0004."""
+
+    def matching_ids(self, query):
+        # Quote every term so user input is never parsed as FTS5 syntax; "a@b.com" becomes a phrase
+        terms = ['"%s"' % term.replace('"', '""') for term in query.split()]
+        return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [' '.join(terms)])
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Matches against the GIN index on to_tsvector('simple', document) created by migration 0004."""
+
+    def matching_ids(self, query):
+        return RawSQL(
+            f"SELECT submission_id FROM {DOCUMENT_TABLE} "
+            f"WHERE to_tsvector('simple', document) @@ plainto_tsquery('simple', %s)",
+            [query]
+        )
+
+
+class ContainsSearchBackend(SearchBackend):
+    """Unindexed fallback for other databases."""
+
+    def matching_ids(self, query):
+        return SubmissionSearchDocument.objects.filter(document__icontains=query).values('submission_id')
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    """SUBMISSION_SEARCH_BACKEND (a dotted path) if set, otherwise the backend for the database vendor."""
+    backendPath = getattr(settings, 'SUBMISSION_SEARCH_BACKEND', None)
+    if backendPath:
+        return import_string(backendPath)()
+
+    return VENDOR_BACKENDS.get(connection.vendor, ContainsSearchBackend)()
+
+
+def index_submissions(submissionIds):
+    """(Re)builds the search documents of the given submissions from their stored data."""
+    documents = {}
+    submissions = (
+        FormSubmission.objects.filter(id__in=submissionIds)
+        .only('id', 'client_identifier')
+        .prefetch_related('data_entries')
+    )
+
+    for submission in submissions:
+        documents[submission.id] = build_document(
+            submission.client_identifier,
+            [entry.value for entry in submission.data_entries.all()]
+        )
+
+    if documents:
+        get_search_backend().index_documents(documents)
+
+
+class SubmissionFullTextFilter(BaseFilterBackend):
+    """
+    Filters submissions by an indexed full-text match on their submitted values (?q=...),
+    e.g. a national ID number or an email address.
+    """
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        return get_search_backend().filter(queryset, query)
@@ -1,7 +1,21 @@
-from django.db import transaction
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Form, FormField, FormSubmission, SubmissionData, FileAttachment
-from .tasks import sendAdminNotification
+from .models import Form, FormField, FormSubmission, SubmissionData, FileAttachment, FileUpload, NotificationOutbox, \
+    SubmissionArchive
+from .schema_cache import get_validation_plan
+from .search import build_document, get_search_backend
+from .tasks import dispatchPendingNotifications, queueAttachmentProcessing
+from .blobs import add_references, store_blob
+from .field_values import retype_field_values, typed_columns
+from .uploads import UploadAlreadyAttached, attached_upload_fields, hash_file
+
+# Rows per INSERT statement when writing submission EAV rows and attachments.
+# Keeps large forms well under SQLite's bound-parameter limit.
+BULK_CREATE_BATCH_SIZE = 500
 
 
 # Serializer for FormField (used nested within Form for admin setup)
@@ -25,15 +39,26 @@ class FormSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Form
-        fields = ['id', 'name', 'slug', 'description', 'is_active', 'fields']
+        fields = ['id', 'name', 'slug', 'description', 'is_active', 'notification_mode', 'archive_after_days', 'fields']
+
+    # Columns an admin can edit on a FormField through the nested payload
+    EDITABLE_FIELD_COLUMNS = ('field_name', 'field_type', 'label', 'is_required', 'order', 'configuration')
 
     # Override create/update to handle nested FormField creation/update
     def create(self, validated_data):
 
         fields_data = validated_data.pop('fields', [])
         form = Form.objects.create(**validated_data)
-        for field_data in fields_data:
-            FormField.objects.create(form=form, **field_data)
+
+        # One batched INSERT for every field, then one schema version bump for all of them
+        if fields_data:
+            for field_data in fields_data:
+                field_data.pop('id', None)
+            FormField.objects.bulk_create(
+                [FormField(form=form, **field_data) for field_data in fields_data],
+                batch_size=BULK_CREATE_BATCH_SIZE
+            )
+            Form.bump_schema_version(form.id)
 
         return form
 
@@ -41,53 +66,59 @@ class FormSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         fields_data = validated_data.pop('fields', [])
 
-        # 1. Update Form instance fields
-        instance.name = validated_data.get('name', instance.name)
-        instance.slug = validated_data.get('slug', instance.slug)
-        instance.is_active = validated_data.get('is_active', instance.is_active)
-        instance.description = validated_data.get('description', instance.description)
-        instance.save()
-
-        # 2. Handle nested FormField updates
-        existing_field_ids = set(instance.fields.values_list('id', flat=True))
+        # 1. Diff the submitted fields against the stored ones in memory (one SELECT)
+        existing_fields = {field.id: field for field in FormField.objects.filter(form=instance)}
+        previous_types = {field.field_name: field.field_type for field in existing_fields.values()}
+        fields_to_update = []
+        fields_to_create = []
         fields_to_keep = set()
 
         for field_data in fields_data:
 
-            field_id = field_data.get('id', None)
+            field_id = field_data.pop('id', None)
+            field = existing_fields.get(field_id) if isinstance(field_id, int) else None
 
-            if isinstance(field_id, int) and field_id in existing_field_ids:
+            if field is None:
+                # New field (a missing ID, or a temporary frontend ID that is not an integer)
+                fields_to_create.append(FormField(form=instance, **field_data))
+                continue
 
-                # UPDATE existing field
-                field = FormField.objects.get(id = field_id, form = instance)
+            fields_to_keep.add(field.id)
 
-                # UPDATE existing field
-                field.field_name = field_data.get('field_name', field.field_name)
-                field.field_type = field_data.get('field_type', field.field_type)
-                field.label = field_data.get('label', field.label)
-                field.is_required = field_data.get('is_required', field.is_required)
-                field.order = field_data.get('order', field.order)
-                field.configuration = field_data.get('configuration', field.configuration)
+            changed = False
+            for column in self.EDITABLE_FIELD_COLUMNS:
+                value = field_data.get(column, getattr(field, column))
+                if value != getattr(field, column):
+                    setattr(field, column, value)
+                    changed = True
 
-                field.save()
+            if changed:
+                fields_to_update.append(field)
 
-                fields_to_keep.add(field.id)
-            else:
-
-                # Remove the temporary frontend ID (which is not an integer)
-                field_data.pop('id', None)
-
-                # CREATE new field
-                new_field = FormField.objects.create(form=instance, **field_data)
-                fields_to_keep.add(new_field.id)
+        # 2. Apply it with one DELETE, batched UPDATEs and batched INSERTs. Deleting first frees
+        # the names of removed fields for renamed and new ones (field names are unique per form).
+        fields_to_delete = existing_fields.keys() - fields_to_keep
+        if fields_to_delete:
+            FormField.objects.filter(form=instance, id__in=fields_to_delete).delete()
 
+        FormField.objects.bulk_update(fields_to_update, self.EDITABLE_FIELD_COLUMNS, batch_size=BULK_CREATE_BATCH_SIZE)
+        FormField.objects.bulk_create(fields_to_create, batch_size=BULK_CREATE_BATCH_SIZE)
 
-        # 3. DELETE fields removed by the admin
+        # 3. Stored values of a field name whose type changed get their typed columns redone,
+        # so value filters do not compare against the old type's parse
+        for field in fields_to_update + fields_to_create:
+            if previous_types.get(field.field_name, field.field_type) != field.field_type:
+                retype_field_values(instance.id, field.field_name, field.field_type)
 
-        # Find all field IDs that exist in the DB but were NOT submitted by the frontend
-        fields_to_delete = existing_field_ids - fields_to_keep
-
-        FormField.objects.filter(form=instance, id__in=fields_to_delete).delete()
+        # 4. Update the Form instance last: its save() bumps schema_version once for the form
+        # and all its field changes, and invalidates the cached schemas
+        instance.name = validated_data.get('name', instance.name)
+        instance.slug = validated_data.get('slug', instance.slug)
+        instance.is_active = validated_data.get('is_active', instance.is_active)
+        instance.description = validated_data.get('description', instance.description)
+        instance.notification_mode = validated_data.get('notification_mode', instance.notification_mode)
+        instance.archive_after_days = validated_data.get('archive_after_days', instance.archive_after_days)
+        instance.save()
 
         return instance
 
@@ -110,8 +141,8 @@ class DynamicSubmissionSerializer(serializers.Serializer):
         flattenedData.update(nestedData)
 
         # Merge uploaded files from the request
-        fileData = self.context['request'].FILES
-        flattenedData.update(fileData)
+        fileData = self.files
+        flattenedData.update(fileData.items()) # One file per field (updating from a MultiValueDict would copy its value lists)
 
         # Store the necessary keys for the create method.
         # Note: We can remove data['submissionData'] here, as nested_data holds the value
@@ -121,10 +152,10 @@ class DynamicSubmissionSerializer(serializers.Serializer):
 
         # --- 3. Pre-Validation Checks (Form Exists & Client Identifier) ---
 
+        # The compiled plan is cached per form version, so this is normally query-free
         form_slug = data['formSlug']
-        try:
-            self.formInstance = Form.objects.get(slug=form_slug, is_active=True)
-        except Form.DoesNotExist:
+        self.validationPlan = get_validation_plan(form_slug)
+        if self.validationPlan is None:
             raise serializers.ValidationError({"formSlug": "Form not found or is inactive"})
 
         # The key field for the FormSubmission model must be present
@@ -136,102 +167,305 @@ class DynamicSubmissionSerializer(serializers.Serializer):
 
         # --- 4. Dynamic Validation Against FormField rules (Uses Flattened Data) ---
 
-        formFields = self.formInstance.fields.all()
+        self.validationPlan.validate(flattenedData)
 
-        for field in formFields:
-            # Look up value from the flattened data
-            value = flattenedData.get(field.field_name)
+        # --- 5. Resolve chunked uploads referenced by ID (sent as the file field's value) ---
 
-            # Check 1: Required Fields
-            if field.is_required and not value and field.field_type != 'file_upload':
-                raise serializers.ValidationError({field.field_name: f"{field.label} is required"})
+        data['uploads'] = self.resolve_uploads(nestedData)
 
+        return data
 
-            # Check 2: Conditional Validation (Dependency Check)
-            dependency = field.configuration.get('dependency')
-
-            if dependency and dependency.get('target_field') and dependency.get('action') == 'is_required':
+    def resolve_uploads(self, nestedData):
+        """
+        Returns {field_name: FileUpload} for the file fields whose value is an upload ID.
+        Each upload must be complete, belong to this form and field, and not be attached yet.
+        Other values of file fields are kept as plain submitted values, as before.
+        """
+        uploadIds = {}
+        for field_name, value in nestedData.items():
+            if field_name not in self.validationPlan.file_rules or not isinstance(value, str):
+                continue
+            try:
+                uploadIds[field_name] = uuid.UUID(value)
+            except ValueError:
+                pass
+
+        if not uploadIds:
+            return {}
+
+        uploads = FileUpload.objects.filter(
+            id__in=uploadIds.values(), form_id=self.validationPlan.form_id, attachment__isnull=True
+        ).in_bulk()
+
+        resolved = {}
+        for field_name, uploadId in uploadIds.items():
+            upload = uploads.get(uploadId)
+            if upload is None or upload.field_name != field_name or not upload.is_complete:
+                raise serializers.ValidationError({field_name: "Must be the ID of a completed upload"})
+            resolved[field_name] = upload
+
+        return resolved
+
+
+    @property
+    def files(self):
+        """Files sent with the submission: context['files'] when given (batches), else request.FILES."""
+        if 'files' in self.context:
+            return self.context['files']
+        return self.context['request'].FILES
 
-                target_field_name = dependency['target_field']
-                condition = dependency['condition']
-                required_value = dependency['value']
+    def create(self, validated_data):
+        return save_submissions([self.prepare_entry(validated_data)])[0]
 
-                # Get the value of the target field from the submitted data
-                target_value = data['flattened_data'].get(target_field_name)
+    def prepare_entry(self, validated_data):
+        """
+        Turns validated data into the entry save_submissions() writes. Request files are put in
+        content-addressed storage here, before the transaction: content that is already stored
+        is not written again, and a rolled-back submission leaves only an unreferenced blob
+        for collect_blobs.
+        """
+        uploads = validated_data.get('uploads', {})
 
-                condition_met = False
+        storedFiles = {}
+        for field_name, file_object in self.files.items():
+            sha256 = hash_file(file_object)
+            storedFiles[field_name] = (store_blob(file_object, sha256, file_object.size), sha256, file_object)
 
-                # Try to compare as numbers (covers the 'loan amount > X' case)
-                try:
-                    target_num = float(target_value) if target_value is not None and target_value != '' else 0.0
-                    required_num = float(required_value)
+        dataToStore = {
+            field_name: str(value)
+            for field_name, value in validated_data['nested_data'].items()
+            if field_name != 'clientIdentifier' and field_name not in uploads and value is not None and value != ''
+        }
 
-                    if condition == '>' and target_num > required_num:
-                        condition_met = True
-                    elif condition == '<' and target_num < required_num:
-                        condition_met = True
-                    # You can add more numeric conditions here (==, >=, <=)
+        return SubmissionEntry(
+            self.validationPlan, validated_data['clientIdentifier'], dataToStore, storedFiles, uploads,
+            idempotency_key=self.context.get('idempotency_key'),
+            idempotency_fingerprint=self.context.get('idempotency_fingerprint', ''),
+        )
 
-                except (TypeError, ValueError):
-                    # Fallback or skip if not numeric (e.g., condition is 'has_value')
-                    pass
 
-                # Enforce the requirement if the condition is met
-                if condition_met:
-                    # Check if the dependent field (current field) has a value
-                    if not value:
-                        raise serializers.ValidationError({field.field_name: f"{field.label} is required because '{target_field_name}' condition was met."})
+class SubmissionEntry:
+    """One validated submission, ready to be written by save_submissions()."""
+    __slots__ = ('plan', 'client_identifier', 'data', 'stored_files', 'uploads', 'idempotency_key', 'idempotency_fingerprint')
 
+    def __init__(self, plan, client_identifier, data, stored_files, uploads, idempotency_key=None, idempotency_fingerprint=''):
+        self.plan = plan
+        self.client_identifier = client_identifier
+        self.data = data                  # {field_name: value} of the non-file fields
+        self.stored_files = stored_files  # {field_name: (storage name, sha256, uploaded file)}
+        self.uploads = uploads            # {field_name: completed FileUpload}
+        self.idempotency_key = idempotency_key
+        self.idempotency_fingerprint = idempotency_fingerprint
 
-            # Check 3: Basic Type Validation
-            if field.field_type == 'number' and value and not str(value).isdigit():
-                raise serializers.ValidationError({field.field_name: "Must be a valid number"})
 
-        return data
+def save_submissions(entries):
+    """
+    Writes any number of validated submissions in one transaction with one batched INSERT
+    per table, and returns the FormSubmission instances in entry order. Used for single
+    submissions and batches alike, so both follow exactly the same write path.
+    """
+    if not entries:
+        return []
+
+    with transaction.atomic():
+
+        # 1. Create the main submission records (with their snapshots, in the same INSERT)
+        submissions = FormSubmission.objects.bulk_create(
+            [
+                FormSubmission(
+                    form_id=entry.plan.form_id,
+                    client_identifier=entry.client_identifier,
+                    idempotency_key=entry.idempotency_key,
+                    idempotency_fingerprint=entry.idempotency_fingerprint,
+                    data_snapshot=entry.data if settings.SUBMISSION_DATA_SNAPSHOT else None
+                )
+                for entry in entries
+            ],
+            batch_size=BULK_CREATE_BATCH_SIZE
+        )
+
+        # 2. Storing non-file data (batched INSERTs instead of one per key)
+        dataEntries = [
+            SubmissionData(
+                submission=submission, field_name=field_name, value=value,
+                **typed_columns(entry.plan.field_types.get(field_name), value)
+            )
+            for submission, entry in zip(submissions, entries)
+            for field_name, value in entry.data.items()
+        ]
+        SubmissionData.objects.bulk_create(dataEntries, batch_size=BULK_CREATE_BATCH_SIZE)
+
+        # 3. Link the stored files (request files and completed chunked uploads) and count
+        # the new references to their blobs. They are queued for processing on commit.
+        queuedAt = timezone.now()
+        attachments = []
+        for submission, entry in zip(submissions, entries):
+            attachments += [
+                FileAttachment(
+                    submission=submission,
+                    field_name=field_name,
+                    file=name,
+                    filename=file_object.name,
+                    sha256=sha256,
+                    size=file_object.size,
+                    content_type=file_object.content_type or '',
+                    queued_at=queuedAt,
+                )
+                for field_name, (name, sha256, file_object) in entry.stored_files.items()
+            ]
+            attachments += [
+                FileAttachment(
+                    submission=submission,
+                    field_name=field_name,
+                    file=upload.file.name,
+                    filename=upload.filename,
+                    sha256=upload.sha256,
+                    size=upload.size,
+                    content_type=upload.content_type,
+                    upload=upload,
+                    queued_at=queuedAt,
+                )
+                for field_name, upload in entry.uploads.items()
+            ]
+        if any(entry.uploads for entry in entries):
+            # Only the one-attachment-per-upload constraint can fail here: a concurrent
+            # submission attached one of these uploads after they were validated
+            try:
+                with transaction.atomic():
+                    FileAttachment.objects.bulk_create(attachments, batch_size=BULK_CREATE_BATCH_SIZE)
+            except IntegrityError:
+                raise UploadAlreadyAttached()
+        else:
+            FileAttachment.objects.bulk_create(attachments, batch_size=BULK_CREATE_BATCH_SIZE)
+        add_references([attachment.sha256 for attachment in attachments])
+
+        # Thumbnails, page counts and MIME sniffing run in Celery after commit
+        if attachments:
+            attachmentIds = [attachment.id for attachment in attachments]
+            transaction.on_commit(lambda: queueAttachmentProcessing(attachmentIds), robust=True)
+
+        # 4. Index the submitted values for full-text search once the rows are committed
+        searchDocuments = {
+            submission.id: build_document(entry.client_identifier, entry.data.values())
+            for submission, entry in zip(submissions, entries)
+        }
+        transaction.on_commit(lambda: get_search_backend().index_documents(searchDocuments), robust=True)
+
+        # 5. Queue the notifications in the outbox; they are published to Celery only after commit
+        # (digest forms are picked up by sendNotificationDigests instead)
+        outboxRows = NotificationOutbox.objects.bulk_create([
+            NotificationOutbox(submission=submission)
+            for submission, entry in zip(submissions, entries)
+            if entry.plan.notification_mode == 'immediate'
+        ])
+        if outboxRows:
+            outboxIds = [outbox.id for outbox in outboxRows]
+            transaction.on_commit(lambda: dispatchPendingNotifications(outboxIds), robust=True)
+
+    return submissions
+
+
+def save_submission_batch(items, request):
+    """
+    Validates each item ({formSlug, submissionData}) with DynamicSubmissionSerializer, which
+    shares the cached compiled schema of each form, and writes all valid items with
+    save_submissions(). Returns one result per item, in order:
+    {'index', 'status': 201, 'submissionId'} or {'index', 'status': 400, 'errors'}.
+    """
+    results = []
+    entries = []
+    createdResults = []
+    claimedUploads = set()
+
+    for index, item in enumerate(items):
+        if isinstance(item, BatchItemError):
+            results.append({'index': index, 'status': 400, 'errors': {'non_field_errors': [item.message]}})
+            continue
+        if not isinstance(item, dict):
+            results.append({'index': index, 'status': 400, 'errors': {'non_field_errors': ['Each item must be a JSON object.']}})
+            continue
+
+        serializer = DynamicSubmissionSerializer(data=item, context={'request': request, 'files': {}})
+        if not serializer.is_valid():
+            results.append({'index': index, 'status': 400, 'errors': serializer.errors})
+            continue
+
+        # An upload can only be attached once, also within one batch
+        uploads = serializer.validated_data['uploads']
+        reused = [field_name for field_name, upload in uploads.items() if upload.id in claimedUploads]
+        if reused:
+            results.append({'index': index, 'status': 400, 'errors': {reused[0]: ['Must be the ID of a completed upload']}})
+            continue
+        claimedUploads.update(upload.id for upload in uploads.values())
+
+        entries.append(serializer.prepare_entry(serializer.validated_data))
+        result = {'index': index, 'status': 201, 'submissionId': None}
+        results.append(result)
+        createdResults.append(result)
+
+    try:
+        submissions = save_submissions(entries)
+    except UploadAlreadyAttached:
+        # A concurrent request attached some of the uploads first: those items fail, the rest are saved
+        keptEntries = []
+        keptResults = []
+        for result, entry in zip(createdResults, entries):
+            attached = attached_upload_fields(entry.uploads)
+            if attached:
+                result.update(status=400, errors={attached[0]: ['Must be the ID of a completed upload']})
+                del result['submissionId']
+            else:
+                keptEntries.append(entry)
+                keptResults.append(result)
+        createdResults = keptResults
+        submissions = save_submissions(keptEntries)
 
+    for result, submission in zip(createdResults, submissions):
+        result['submissionId'] = submission.id
 
-    def create(self, validated_data):
+    return results
 
-        formInstance = self.formInstance
 
-        # Retrieve the data required for saving
-        submissionDataToSave = validated_data['nested_data']
-        clientIdentifier = validated_data['clientIdentifier']
-        fileData = self.context['request'].FILES
+class BatchItemError:
+    """Placeholder for a batch item that could not be parsed (e.g. an invalid NDJSON line)."""
+    __slots__ = ('message',)
 
-        with transaction.atomic():
+    def __init__(self, message):
+        self.message = message
 
-            # 1. Create the main submission record
-            submission = FormSubmission.objects.create(
-                form=formInstance,
-                client_identifier=clientIdentifier
-            )
 
-            # 2. Storing non-file data
-            for field_name, value in submissionDataToSave.items():
+class FileUploadSerializer(serializers.ModelSerializer):
+    """
+    Starts a chunked upload for a form's file_upload field. The declared size and type are
+    checked against the field's max_size/allowed_types before any bytes are accepted.
+    """
+    uploadId = serializers.UUIDField(source='id', read_only=True)
+    formSlug = serializers.SlugField(write_only=True)
+    fieldName = serializers.CharField(source='field_name', max_length=100)
+    contentType = serializers.CharField(source='content_type', max_length=255, required=False, allow_blank=True)
+    size = serializers.IntegerField(min_value=1)
+    offset = serializers.IntegerField(source='received_bytes', read_only=True)
+    complete = serializers.BooleanField(source='is_complete', read_only=True)
+    sha256 = serializers.CharField(read_only=True)
 
-                if field_name == 'clientIdentifier':
-                    continue
+    class Meta:
+        model = FileUpload
+        fields = ('uploadId', 'formSlug', 'fieldName', 'filename', 'contentType', 'size', 'offset', 'complete', 'sha256')
 
-                if value is not None and value != '':
-                    SubmissionData.objects.create(
-                        submission=submission,
-                        field_name=field_name,
-                        value=str(value)
-                    )
+    def validate(self, data):
+        plan = get_validation_plan(data.pop('formSlug'))
+        if plan is None:
+            raise serializers.ValidationError({"formSlug": "Form not found or is inactive"})
 
-            # 3. Handle File Uploads (save files here)
-            for field_name, file_object in fileData.items():
-                 FileAttachment.objects.create(
-                                submission=submission,
-                                field_name=field_name,
-                                file=file_object
-                            )
+        fieldName = data['field_name']
+        if fieldName not in plan.file_rules:
+            raise serializers.ValidationError({"fieldName": "Not a file upload field of this form"})
 
-            # 4. Trigger the asynchronous notification task
-            sendAdminNotification.delay(submission.id)
+        # Errors are keyed by the form field's name, as they are for submissions
+        plan.check_file(fieldName, data['filename'], data.get('content_type', ''), data['size'])
 
-            return submission
+        data['form_id'] = plan.form_id
+        return data
 
 
 # --- Serializer for the Public Form List ---
@@ -251,10 +485,14 @@ class AdminFileAttachmentSerializer(serializers.ModelSerializer):
     # This generates the full URL to the file for downloading
     file_url = serializers.FileField(source='file', read_only=True)
 
+    # Filled in by tasks.processAttachments; null until the attachment has been processed
+    thumbnail_url = serializers.FileField(source='thumbnail', read_only=True)
+
     class Meta:
         model = FileAttachment
         # Use uploaded_at as per your models.py
-        fields = ('field_name', 'file_url', 'uploaded_at')
+        fields = ('field_name', 'file_url', 'filename', 'uploaded_at', 'size', 'content_type', 'sha256',
+                  'detected_type', 'page_count', 'thumbnail_url', 'processed_at')
         read_only_fields = fields
 
 class AdminSubmissionDetailSerializer(serializers.ModelSerializer):
@@ -275,14 +513,11 @@ class AdminSubmissionDetailSerializer(serializers.ModelSerializer):
 
     def get_submission_data(self, instance: FormSubmission) -> dict:
         """
-        Converts the EAV model (SubmissionData instances) into a flat key-value dictionary.
-        Uses the ForeignKey related_name 'data_entries' from SubmissionData.
+        Returns the submitted values as a flat key-value dictionary: read from the
+        submission's data_snapshot when present, otherwise rebuilt from its EAV
+        SubmissionData rows (related_name 'data_entries').
         """
-        data_dict = {}
-        # Iterate over all SubmissionData entries related to this submission
-        for entry in instance.data_entries.all():
-            data_dict[entry.field_name] = entry.value
-        return data_dict
+        return instance.get_submission_data()
 
 
 class AdminSubmissionListSerializer(serializers.ModelSerializer):
@@ -296,6 +531,16 @@ class AdminSubmissionListSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class AdminSubmissionArchiveSerializer(serializers.ModelSerializer):
+    """A compressed archive of one form's submissions for one month."""
+    form_slug = serializers.CharField(source='form.slug', read_only=True)
+
+    class Meta:
+        model = SubmissionArchive
+        fields = ('id', 'form_slug', 'month', 'compression', 'submission_count', 'size', 'created_at')
+        read_only_fields = fields
+
+
 class ClientFormDetailSerializer(serializers.ModelSerializer):
     """
     Serializer for the public client to retrieve a form definition.
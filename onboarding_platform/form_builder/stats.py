@@ -0,0 +1,164 @@
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Form, FormField, FormSubmission, SubmissionData, FormStats, FormDailyStats, FormValueStats
+
+# Longest dropdown value counted separately (FormValueStats.value)
+MAX_VALUE_LENGTH = 255
+
+
+def _add_counts(model, keyFields, counts):
+    """
+    Adds `counts` ({(form_id, key...): n}) to the rows of a rollup table: one SELECT for the
+    affected rows, then one bulk UPDATE and one bulk INSERT.
+    """
+    if not counts:
+        return
+
+    countField = 'submissions'
+    existing = {}
+    formIds = {key[0] for key in counts}
+    for row in model.objects.filter(form_id__in=formIds, **{f'{keyFields[1]}__in': {key[1] for key in counts}}):
+        existing[tuple(getattr(row, field) for field in keyFields)] = row
+
+    changed = []
+    created = []
+    for key, count in counts.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(model(**dict(zip(keyFields, key)), **{countField: count}))
+        else:
+            setattr(row, countField, getattr(row, countField) + count)
+            changed.append(row)
+
+    model.objects.bulk_update(changed, [countField], batch_size=500)
+    model.objects.bulk_create(created, batch_size=500)
+
+
+def refresh_form_stats(rebuild=False):
+    """
+    Brings the rollup tables up to date: counts the submissions added since the last run
+    (above each form's last_submission_id) into FormStats, FormDailyStats and FormValueStats
+    with grouped queries, and recomputes the notification backlog. With rebuild=True the
+    rollups are recounted from scratch, which also drops deleted submissions.
+
+    Runs in one transaction holding the FormStats rows, so concurrent refreshes never count
+    the same submissions twice. Returns the number of submissions counted.
+    """
+    with transaction.atomic():
+
+        # 1. Lock (and create missing) per-form rows; their watermarks tell what is counted
+        FormStats.objects.bulk_create(
+            [FormStats(form_id=formId) for formId in Form.objects.filter(stats__isnull=True).values_list('id', flat=True)],
+            ignore_conflicts=True
+        )
+        summaries = {summary.form_id: summary for summary in FormStats.objects.select_for_update()}
+
+        if rebuild:
+            FormDailyStats.objects.all().delete()
+            FormValueStats.objects.all().delete()
+            for summary in summaries.values():
+                summary.total_submissions = 0
+                summary.last_submission_id = 0
+
+        # Submissions of the last few seconds are left for the next run: a transaction that is
+        # still open may commit a lower ID than ones already visible, and would be skipped
+        settled = timezone.now() - timedelta(seconds=settings.FORM_STATS_SETTLE_SECONDS)
+        maxId = FormSubmission.objects.filter(submission_date__lt=settled).aggregate(maxId=Max('id'))['maxId'] or 0
+
+        # 2. Submissions not counted yet: one range condition per distinct watermark (normally one)
+        byWatermark = {}
+        for summary in summaries.values():
+            if summary.last_submission_id < maxId:
+                byWatermark.setdefault(summary.last_submission_id, []).append(summary.form_id)
+
+        counted = 0
+        if byWatermark:
+            newSubmissions = reduce(or_, (
+                Q(form_id__in=formIds, id__gt=watermark, id__lte=maxId)
+                for watermark, formIds in byWatermark.items()
+            ))
+
+            dailyCounts = {}
+            for formId, day, total in FormSubmission.objects.filter(newSubmissions) \
+                    .annotate(day=TruncDate('submission_date')).order_by() \
+                    .values('form_id', 'day').annotate(total=Count('id')).values_list('form_id', 'day', 'total'):
+                dailyCounts[(formId, day)] = total
+                summaries[formId].total_submissions += total
+                counted += total
+            _add_counts(FormDailyStats, ('form_id', 'day'), dailyCounts)
+
+            # 3. Option counts of dropdown fields, over the same submissions
+            dropdowns = {}
+            for formId, fieldName in FormField.objects.filter(field_type='dropdown', form_id__in=summaries) \
+                    .values_list('form_id', 'field_name'):
+                dropdowns.setdefault(formId, []).append(fieldName)
+
+            valueConditions = [
+                Q(submission__form_id=formId, submission_id__gt=watermark, submission_id__lte=maxId,
+                  field_name__in=dropdowns[formId])
+                for watermark, formIds in byWatermark.items()
+                for formId in formIds
+                if formId in dropdowns
+            ]
+            if valueConditions:
+                valueCounts = {}
+                for formId, fieldName, value, total in SubmissionData.objects.filter(reduce(or_, valueConditions)) \
+                        .order_by().values('submission__form_id', 'field_name', 'value') \
+                        .annotate(total=Count('id')).values_list('submission__form_id', 'field_name', 'value', 'total'):
+                    key = (formId, fieldName, value[:MAX_VALUE_LENGTH])
+                    valueCounts[key] = valueCounts.get(key, 0) + total
+                _add_counts(FormValueStats, ('form_id', 'field_name', 'value'), valueCounts)
+
+        # 4. The backlog changes as notifications go out, so it is recounted (un-notified rows only)
+        pending = dict(
+            FormSubmission.objects.filter(is_notified=False).order_by()
+            .values('form_id').annotate(total=Count('id')).values_list('form_id', 'total')
+        )
+
+        now = timezone.now()
+        for summary in summaries.values():
+            summary.last_submission_id = max(summary.last_submission_id, maxId)
+            summary.pending_notifications = pending.get(summary.form_id, 0)
+            summary.refreshed_at = now
+
+        FormStats.objects.bulk_update(
+            summaries.values(),
+            ['total_submissions', 'pending_notifications', 'last_submission_id', 'refreshed_at'],
+            batch_size=500
+        )
+
+    return counted
+
+
+def get_form_stats(form, days):
+    """
+    The stats payload of one form: read from the rollups only (three indexed queries),
+    with the daily counts of the last `days` days.
+    """
+    summary = FormStats.objects.filter(form=form).first() or FormStats(form=form)
+    since = timezone.localdate() - timedelta(days=days - 1)
+
+    distributions = {}
+    for fieldName, value, submissions in form.value_stats.order_by('field_name', '-submissions', 'value') \
+            .values_list('field_name', 'value', 'submissions'):
+        distributions.setdefault(fieldName, {})[value] = submissions
+
+    return {
+        'form': form.slug,
+        'total_submissions': summary.total_submissions,
+        'pending_notifications': summary.pending_notifications,
+        'refreshed_at': summary.refreshed_at,
+        'daily_submissions': [
+            {'day': day, 'submissions': submissions}
+            for day, submissions in form.daily_stats.filter(day__gte=since).order_by('day').values_list('day', 'submissions')
+        ],
+        'value_distributions': distributions,
+    }
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Min
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+
+
+def prune_task_results(now=None):
+    """
+    Deletes stored task results older than TASK_RESULT_RETENTION_HOURS, oldest first, in
+    batches of TASK_RESULT_PRUNE_BATCH_SIZE rows (an indexed range on date_done each), and
+    at most TASK_RESULT_PRUNE_MAX_BATCHES batches per run so one run never holds the table
+    for long; a larger backlog is worked off by the following runs. Returns the rows deleted.
+    """
+    cutoff = (now or timezone.now()) - timedelta(hours=settings.TASK_RESULT_RETENTION_HOURS)
+    expired = TaskResult.objects.filter(date_done__lt=cutoff).order_by('date_done')
+
+    deleted = 0
+    for _ in range(settings.TASK_RESULT_PRUNE_MAX_BATCHES):
+        ids = list(expired.values_list('id', flat=True)[:settings.TASK_RESULT_PRUNE_BATCH_SIZE])
+        if not ids:
+            break
+
+        deleted += TaskResult.objects.filter(id__in=ids).delete()[0]
+
+    return deleted
+
+
+def render_task_result_metrics(now=None):
+    """Gauges of the result table in the Prometheus text exposition format: rows per status and the oldest row's age."""
+    counts = dict(TaskResult.objects.order_by().values('status').annotate(total=Count('id')).values_list('status', 'total'))
+    oldest = TaskResult.objects.aggregate(oldest=Min('date_done'))['oldest']
+    age = ((now or timezone.now()) - oldest).total_seconds() if oldest else 0
+
+    lines = [
+        '# HELP form_builder_task_results Stored Celery task results (django_celery_results rows).',
+        '# TYPE form_builder_task_results gauge',
+    ]
+    lines.extend(f'form_builder_task_results{{status="{status}"}} {total}' for status, total in sorted(counts.items()))
+    lines.append('# HELP form_builder_task_results_oldest_age_seconds Age of the oldest stored task result.')
+    lines.append('# TYPE form_builder_task_results_oldest_age_seconds gauge')
+    lines.append(f'form_builder_task_results_oldest_age_seconds {age:.0f}')
+
+    return '\n'.join(lines) + '\n'
@@ -1,32 +1,31 @@
+from datetime import timedelta
+
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
 from django.conf import settings
-from django.core.mail import send_mail
-from .models import FormSubmission, SubmissionData, FileAttachment
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Form, FormSubmission, SubmissionData, FileAttachment, FileUpload, NotificationOutbox
+from .archive import archive_submissions
+from .attachments import analyze_file
+from .stats import refresh_form_stats
+from .task_results import prune_task_results
+from .uploads import discard_upload
 
-@shared_task
-def sendAdminNotification(submissionId):
-    """
-    Asynchronously fetches submission data and sends a notification email to the admin
-    """
-    try:
-        # Grabbing the submission and related data in one swoop
-        submission = FormSubmission.objects.prefetch_related('data_entries', 'attachments', 'form').get(id = submissionId)
-    except FormSubmission.DoesNotExist:
-        print(f"Error: Submission ID {submissionId} not found for notification")
-        return
 
-    # 1. Prep ze email bowdy
-    formName = submission.form.name
-    submissionId = submission.id
+def formatSubmissionDetails(submission):
+    """Plain-text block describing one submission's identifier, values and attachments."""
     clientIdentifier = submission.client_identifier or 'N/A'
 
     submissionDetails = f"Client Identifier: {clientIdentifier}\n"
 
-    for dataItem in submission.data_entries.all():
-        submissionDetails += f" - {dataItem.field_name}: {dataItem.value}\n"
+    for fieldName, value in submission.get_submission_data().items():
+        submissionDetails += f" - {fieldName}: {value}\n"
 
     # Add file attachments details
-    if submission.attachments.exists():
+    if submission.attachments.all():
         fileDetails = "\nAttached Files: \n"
 
         for file in submission.attachments.all():
@@ -34,6 +33,30 @@ def sendAdminNotification(submissionId):
 
         submissionDetails += fileDetails
 
+    return submissionDetails
+
+
+@shared_task(ignore_result=True)
+def sendAdminNotification(submissionId):
+    """
+    Asynchronously fetches submission data and sends a notification email to the admin
+    """
+    try:
+        # Grabbing the submission, its form and attachments in one swoop (values come from the snapshot)
+        submission = FormSubmission.objects.select_related('form').prefetch_related('attachments').get(id = submissionId)
+    except FormSubmission.DoesNotExist:
+        print(f"Error: Submission ID {submissionId} not found for notification")
+        return
+
+    # A redelivered message must not email the admin twice
+    if submission.is_notified:
+        return
+
+    # 1. Prep ze email bowdy
+    formName = submission.form.name
+    submissionId = submission.id
+    submissionDetails = formatSubmissionDetails(submission)
+
     # 2 Construct and send ze mail
     subject = f"New Form Submission: {formName} (ID: {submissionId})"
     message = f"A new submission has been received for the {formName} form.\n\nDetails:\n{submissionDetails}"
@@ -43,10 +66,287 @@ def sendAdminNotification(submissionId):
     try:
         send_mail(subject, message, fromEmail, recipientList, fail_silently = False)
         submission.is_notified = True
-        submission.save()
+        submission.save(update_fields=['is_notified'])
         print(f"Successfully sent notification for Submission ID: {submissionId}")
     except Exception as e:
         print(f"Failed to send email for Submission ID {submissionId}: {e}")
 
 
+@shared_task
+def sendNotificationDigests():
+    """
+    Periodic task (see CELERY_BEAT_SCHEDULE) that sends one digest email per digest-mode form
+    covering its pending, un-notified submissions.
+
+    Each form's submissions are claimed first (SELECT ... FOR UPDATE SKIP LOCKED where supported,
+    then notification_claimed_at is set in the same short transaction), so an overlapping run
+    skips them. A submission is only marked notified once its digest went out; the claim of a
+    digest that failed (or of a run that was killed) expires after
+    NOTIFICATION_DIGEST_CLAIM_TIMEOUT_SECONDS and the next run sends it. All digests go out over
+    a single SMTP connection. Each email covers at most NOTIFICATION_DIGEST_MAX_SUBMISSIONS
+    submissions and at most NOTIFICATION_DIGEST_MAX_EMAILS emails are sent per run; anything
+    left over is picked up by the next run.
+    """
+    maxSubmissions = settings.NOTIFICATION_DIGEST_MAX_SUBMISSIONS
+    maxEmails = settings.NOTIFICATION_DIGEST_MAX_EMAILS
+    now = timezone.now()
+    claimExpiry = now - timedelta(seconds=settings.NOTIFICATION_DIGEST_CLAIM_TIMEOUT_SECONDS)
+
+    # 1. Claim each form's pending submissions and build one message per form
+    batches = []
+    for form in Form.objects.filter(notification_mode='digest').order_by('id'):
+        if len(batches) >= maxEmails:
+            break
+
+        with transaction.atomic():
+            claimedIds = list(
+                FormSubmission.objects.select_for_update(skip_locked=True)
+                .filter(form=form, is_notified=False)
+                .filter(Q(notification_claimed_at__isnull=True) | Q(notification_claimed_at__lt=claimExpiry))
+                .order_by('submission_date', 'id').values_list('id', flat=True)[:maxSubmissions]
+            )
+            FormSubmission.objects.filter(id__in=claimedIds).update(notification_claimed_at=now)
+
+        if not claimedIds:
+            continue
+
+        # Submissions without a snapshot read their values from data_entries
+        pending = list(
+            FormSubmission.objects.filter(id__in=claimedIds)
+            .order_by('submission_date', 'id')
+            .prefetch_related('attachments', 'data_entries')
+        )
+
+        submissionBlocks = '\n'.join(
+            f"Submission ID: {submission.id} ({submission.submission_date:%Y-%m-%d %H:%M})\n{formatSubmissionDetails(submission)}"
+            for submission in pending
+        )
+        message = EmailMessage(
+            subject=f"{len(pending)} New Form Submissions: {form.name}",
+            body=f"{len(pending)} new submissions have been received for the {form.name} form.\n\n{submissionBlocks}",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[settings.ADMIN_EMAIL_FOR_NOTIFICATIONS],
+        )
+        batches.append((message, claimedIds))
+
+    if not batches:
+        return 0
+
+    # 2. Send everything over one reused connection, marking each digest's submissions as it goes out
+    sentEmails = 0
+    notifiedIds = []
+    with get_connection(fail_silently=False) as connection:
+        for message, submissionIds in batches:
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                print(f"Failed to send digest '{message.subject}': {e}")
+                # Released for the next run
+                FormSubmission.objects.filter(id__in=submissionIds).update(notification_claimed_at=None)
+                continue
+
+            FormSubmission.objects.filter(id__in=submissionIds).update(is_notified=True, notification_claimed_at=None)
+            sentEmails += 1
+            notifiedIds.extend(submissionIds)
+
+    print(f"Sent {sentEmails} digest emails covering {len(notifiedIds)} submissions")
+
+    return len(notifiedIds)
+
+
+def dispatchPendingNotifications(outboxIds=None):
+    """
+    Publishes up to NOTIFICATION_OUTBOX_BATCH_SIZE pending outbox rows (optionally only the
+    given ones) to Celery over one producer connection, then marks them dispatched.
+
+    Rows are claimed in a short transaction (SELECT ... FOR UPDATE SKIP LOCKED where supported,
+    then claimed_at is set) and published after it commits, so no row locks are held while
+    talking to the broker. Publishing does not retry (this runs on the request path after
+    commit): rows that fail to publish are released for the next sweep, and a claim left
+    behind by a killed process expires after NOTIFICATION_OUTBOX_CLAIM_TIMEOUT_SECONDS.
+    Returns the number published.
+    """
+    now = timezone.now()
+    claimExpiry = now - timedelta(seconds=settings.NOTIFICATION_OUTBOX_CLAIM_TIMEOUT_SECONDS)
+    pending = NotificationOutbox.objects.filter(dispatched_at__isnull=True) \
+        .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=claimExpiry))
+    if outboxIds is not None:
+        pending = pending.filter(id__in=outboxIds)
+
+    # 1. Claim a batch
+    with transaction.atomic():
+        claimed = list(
+            pending.select_for_update(skip_locked=True)
+            .order_by('id').values_list('id', 'submission_id')[:settings.NOTIFICATION_OUTBOX_BATCH_SIZE]
+        )
+        if not claimed:
+            return 0
+
+        NotificationOutbox.objects.filter(id__in=[outboxId for outboxId, _ in claimed]).update(claimed_at=now)
+
+    # 2. Publish outside the transaction
+    published = []
+    try:
+        with sendAdminNotification.app.producer_or_acquire() as producer:
+            for outboxId, submissionId in claimed:
+                sendAdminNotification.apply_async((submissionId,), producer=producer, retry=False)
+                published.append(outboxId)
+    finally:
+        # 3. Mark what went out and release the rest
+        NotificationOutbox.objects.filter(id__in=published).update(dispatched_at=timezone.now())
+        if len(published) < len(claimed):
+            NotificationOutbox.objects.filter(id__in=[outboxId for outboxId, _ in claimed[len(published):]]).update(claimed_at=None)
+
+    return len(published)
+
+
+@shared_task(ignore_result=True)
+def relayNotificationOutbox():
+    """
+    Periodic sweeper for the notification outbox: publishes anything the on-commit fast path
+    missed (broker down, process killed after commit) and prunes old dispatched rows.
+    """
+    published = 0
+    while True:
+        batch = dispatchPendingNotifications()
+        published += batch
+        if batch < settings.NOTIFICATION_OUTBOX_BATCH_SIZE:
+            break
+
+    cutoff = timezone.now() - timedelta(days=settings.NOTIFICATION_OUTBOX_RETENTION_DAYS)
+    NotificationOutbox.objects.filter(dispatched_at__lt=cutoff).delete()
+
+    return published
+
+
+@shared_task(ignore_result=True)
+def refreshFormStats(rebuild=False):
+    """Periodic task: counts new submissions into the per-form stats rollups (see stats.py)."""
+    return refresh_form_stats(rebuild=rebuild)
+
+
+@shared_task
+def archiveSubmissions():
+    """Periodic task: moves submissions past their form's retention window into archives (see archive.py)."""
+    return sum(count for _, _, count in archive_submissions())
+
+
+@shared_task
+def pruneTaskResults():
+    """Periodic task: deletes expired rows of the task result table, a bounded amount per run (see task_results.py)."""
+    return prune_task_results()
+
+
+@shared_task
+def purgeExpiredUploads():
+    """
+    Deletes chunked uploads older than UPLOAD_EXPIRY_HOURS that were never finished or never
+    attached to a submission, with their staged and stored bytes.
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.UPLOAD_EXPIRY_HOURS)
+    expired = FileUpload.objects.filter(created_at__lt=cutoff, attachment__isnull=True)
+
+    purged = 0
+    for upload in expired.iterator():
+        discard_upload(upload)
+        purged += 1
+
+    return purged
+
+
+@shared_task(ignore_result=True)
+def processAttachments(attachmentIds):
+    """
+    Sniffs the MIME type, counts pages and renders a thumbnail for the given attachments,
+    storing the results on them. Idempotent: already processed attachments are skipped, and
+    content that was analyzed before (same sha256) is copied instead of read again.
+
+    When the soft time limit hits, the attachments finished so far are still saved; the rest
+    are picked up by processPendingAttachments.
+    """
+    pending = list(FileAttachment.objects.filter(id__in=attachmentIds, processed_at__isnull=True).order_by('id'))
+    if not pending:
+        return 0
+
+    try:
+        processed = analyzeAttachments(pending)
+    except SoftTimeLimitExceeded:
+        processed = [attachment for attachment in pending if attachment.processed_at is not None]
+
+    FileAttachment.objects.bulk_update(processed, ['detected_type', 'page_count', 'thumbnail', 'processed_at'])
+    return len(processed)
+
+
+def analyzeAttachments(pending):
+    """Fills in the processing results of each attachment (in memory). Returns the attachments."""
+    # Results of identical content processed earlier (content is deduplicated by hash)
+    hashes = {attachment.sha256 for attachment in pending if attachment.sha256}
+    known = {}
+    for sha256, detectedType, pageCount, thumbnail in FileAttachment.objects \
+            .filter(sha256__in=hashes, processed_at__isnull=False) \
+            .values_list('sha256', 'detected_type', 'page_count', 'thumbnail'):
+        known.setdefault(sha256, {'detected_type': detectedType, 'page_count': pageCount, 'thumbnail': thumbnail or None})
+
+    for attachment in pending:
+        results = known.get(attachment.sha256) if attachment.sha256 else None
+
+        if results is None:
+            try:
+                with attachment.file.open('rb') as stored:
+                    results = analyze_file(stored, attachment.sha256 or f'attachment-{attachment.id}')
+            except (OSError, ValueError):
+                # Missing or unreadable file: record it as processed with nothing detected
+                results = {'detected_type': '', 'page_count': None, 'thumbnail': None}
+
+            if attachment.sha256:
+                known[attachment.sha256] = results
+
+        attachment.detected_type = results['detected_type']
+        attachment.page_count = results['page_count']
+        attachment.thumbnail = results['thumbnail'] or ''
+        attachment.processed_at = timezone.now()
+
+    return pending
+
+
+def queueAttachmentProcessing(attachmentIds):
+    """
+    Publishes processAttachments tasks of ATTACHMENT_PROCESSING_BATCH_SIZE attachments each,
+    so one heavy submission is spread over several workers. A failed publish is not retried
+    here; processPendingAttachments picks the attachments up on its next sweep.
+    """
+    batchSize = settings.ATTACHMENT_PROCESSING_BATCH_SIZE
+    attachmentIds = list(attachmentIds)
+
+    with processAttachments.app.producer_or_acquire() as producer:
+        for start in range(0, len(attachmentIds), batchSize):
+            processAttachments.apply_async((attachmentIds[start:start + batchSize],), producer=producer, retry=False)
+
+
+@shared_task
+def processPendingAttachments():
+    """
+    Periodic sweeper: queues the attachments that are still unprocessed
+    ATTACHMENT_REQUEUE_AFTER_MINUTES after they were last queued (or were never queued, e.g.
+    because the publish failed), so attachments still waiting in the queue are not queued twice.
+    """
+    staleBefore = timezone.now() - timedelta(minutes=settings.ATTACHMENT_REQUEUE_AFTER_MINUTES)
+    pending = FileAttachment.objects.filter(processed_at__isnull=True) \
+        .filter(Q(queued_at__isnull=True) | Q(queued_at__lt=staleBefore))
+    lastId = 0
+    queued = 0
+
+    while True:
+        ids = list(
+            pending.filter(id__gt=lastId)
+            .order_by('id').values_list('id', flat=True)[:settings.ATTACHMENT_PROCESSING_BATCH_SIZE * 50]
+        )
+        if not ids:
+            break
+
+        FileAttachment.objects.filter(id__in=ids).update(queued_at=timezone.now())
+        queueAttachmentProcessing(ids)
+        queued += len(ids)
+        lastId = ids[-1]
 
+    return queued
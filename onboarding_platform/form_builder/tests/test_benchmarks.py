@@ -0,0 +1,44 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from form_builder.benchmarks.runner import compare_to_baseline, load_baseline, percentile, run_suite
+from form_builder.benchmarks.scenarios import SCALES
+
+
+class BenchmarkSuiteTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_percentile_uses_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_tiny_suite_runs_every_scenario(self):
+        report = run_suite('tiny', iterations=2)
+
+        self.assertEqual(report['scale'], 'tiny')
+        self.assertIn('admin_submission_list', report['results'])
+        self.assertEqual(len(report['results']), 12 + len(SCALES['tiny']['forms']))
+        for metrics in report['results'].values():
+            self.assertLessEqual(metrics['p50_ms'], metrics['max_ms'])
+            self.assertGreater(metrics['peak_kib'], 0)
+
+    def test_tiny_suite_query_counts_match_baseline(self):
+        report = run_suite('tiny', iterations=1)
+
+        # Latency on a test runner is not comparable, so only query counts are checked here
+        regressions = compare_to_baseline(report, load_baseline(), latencyTolerance=float('inf'), memoryTolerance=float('inf'))
+        self.assertEqual(regressions, [])
+
+    def test_compare_flags_extra_queries_and_slow_requests(self):
+        baseline = {'tiny': {'scenario': {'queries': 2, 'p95_ms': 10.0, 'peak_kib': 100.0}}}
+        report = {'scale': 'tiny', 'results': {'scenario': {'queries': 3, 'p95_ms': 16.0, 'peak_kib': 120.0}}}
+
+        regressions = compare_to_baseline(report, baseline, latencyTolerance=0.5, memoryTolerance=0.5)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('3 queries', regressions[0])
+        self.assertIn('p95', regressions[1])
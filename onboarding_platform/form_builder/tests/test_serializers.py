@@ -1,11 +1,30 @@
-from django.test import TestCase
-from form_builder.models import Form, FormField, FormSubmission, SubmissionData, FileAttachment
+from django.test import TestCase, TransactionTestCase
+from form_builder.models import Form, FormField, FormSubmission, SubmissionData, FileAttachment, NotificationOutbox
+from form_builder.blobs import blob_name
 from form_builder.serializers import FormSerializer
 from rest_framework.exceptions import ValidationError
-from form_builder.serializers import DynamicSubmissionSerializer
-from form_builder.tasks import sendAdminNotification
+from form_builder.serializers import DynamicSubmissionSerializer, AdminFileAttachmentSerializer
+from form_builder.tasks import sendAdminNotification, sendNotificationDigests, relayNotificationOutbox, \
+    processAttachments, processPendingAttachments, queueAttachmentProcessing, dispatchPendingNotifications, pruneTaskResults
+from form_builder.attachments import READ_BLOCK_SIZE, count_pdf_pages, sniff_mime_type
+from unittest import mock
 from django.core import mail
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.test import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.contrib.testing.app import TestApp, setup_default_app
+from celery.contrib.testing.worker import start_worker
+from django.conf import settings
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+from datetime import timedelta
+import io
+import shutil
+import tempfile
+import time
 
 
 
@@ -180,6 +199,66 @@ class FormSerializerNestedFieldsTest(TestCase):
         self.assertEqual(new_field.field_type, "file_upload")
 
 
+    # -------------------------------------------------------------
+    # TEST: QUERY COUNT DOES NOT GROW WITH THE NUMBER OF FIELDS
+    # -------------------------------------------------------------
+
+    def save_large_form(self, slug, fieldCount):
+        """Creates a form with fieldCount fields, then edits, adds and removes fields; returns (create, update) query counts."""
+        fields = [
+            {"field_name": f"field{i}", "field_type": "text", "label": f"Field {i}", "is_required": False, "order": i, "configuration": {}}
+            for i in range(fieldCount)
+        ]
+
+        with CaptureQueriesContext(connection) as created:
+            serializer = FormSerializer(data={"name": slug, "slug": slug, "fields": fields})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            form = serializer.save()
+
+        stored = list(form.fields.order_by('order').values('id', *fields[0].keys()))
+        for field in stored[:fieldCount // 2]:
+            field['label'] += ' (edited)'
+        updatedFields = stored[:-1] + [
+            {"field_name": f"new{i}", "field_type": "number", "label": f"New {i}", "order": fieldCount + i}
+            for i in range(fieldCount // 2)
+        ]
+
+        with CaptureQueriesContext(connection) as updated:
+            serializer = FormSerializer(instance=form, data={"name": slug, "slug": slug, "fields": updatedFields})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+
+        self.assertEqual(form.fields.count(), fieldCount - 1 + fieldCount // 2)
+        self.assertEqual(form.fields.filter(label__endswith='(edited)').count(), fieldCount // 2)
+        return len(created), len(updated)
+
+    def test_field_sync_query_count_is_independent_of_field_count(self):
+        small = self.save_large_form('small-form', 6)
+        large = self.save_large_form('large-form', 100)
+        self.assertEqual(small, large)
+
+        # Beyond SQLite's bound-parameter limit the batches split, but stay a handful of statements
+        huge = self.save_large_form('huge-form', 300)
+        self.assertLessEqual(huge[0] + huge[1], 20)
+
+    def test_update_bumps_schema_version_once(self):
+        self.form.refresh_from_db()
+        version = self.form.schema_version
+
+        fields = [
+            {"id": self.field_to_keep.id, "field_name": "clientName", "field_type": "text", "label": "Name", "order": 1},
+            {"id": self.field_to_update.id, "field_name": "oldField", "field_type": "number", "label": "Renamed", "order": 2},
+        ]
+        serializer = FormSerializer(instance=self.form, data={"name": self.form.name, "slug": self.form.slug, "fields": fields})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+
+        # The deleted field's name is free for the renamed one
+        self.assertEqual(set(self.form.fields.values_list('field_name', flat=True)), {'clientName', 'oldField'})
+        self.form.refresh_from_db()
+        self.assertEqual(self.form.schema_version, version + 1)
+
+
 class DynamicSubmissionSerializerTest(TestCase):
 
     def get_submission_context(self, files_data=None):
@@ -193,6 +272,11 @@ class DynamicSubmissionSerializerTest(TestCase):
         return {'request': MockRequest()}
 
 
+    def setUp(self):
+        # Compiled validation plans are cached across tests; start every test cold
+        cache.clear()
+
+
     @classmethod
     def setUpTestData(self):
 
@@ -308,6 +392,10 @@ class DynamicSubmissionSerializerTest(TestCase):
         self.assertEqual(submission.client_identifier, 'CUST-001')
         self.assertEqual(submission.data_entries.count(), 5)
 
+        # The same values are snapshotted on the submission row
+        self.assertEqual(submission.data_snapshot['loanAmount'], '250000')
+        self.assertEqual(len(submission.data_snapshot), 5)
+
 
 
     # -------------------------------------------------------------
@@ -428,14 +516,96 @@ class DynamicSubmissionSerializerTest(TestCase):
         # The failing assertion is now redundant, but we keep the field name check
         self.assertEqual(attachment.field_name, 'incomeFile')
 
-        # c) Check the file itself
-        self.assertIn('test_document', attachment.file.name)
+        # c) Check the file itself: stored under its content hash, with the client's name kept
+        self.assertEqual(attachment.filename, 'test_document.pdf')
+        self.assertEqual(attachment.file.name, blob_name(attachment.sha256))
 
         # 7. Clean up the created file (Good practice for tests that use storage)
         attachment = FileAttachment.objects.latest('id') # Get the newly created one
         attachment.file.delete()
 
 
+    # -------------------------------------------------------------
+    # TEST: CACHED VALIDATION PLAN
+    # -------------------------------------------------------------
+    def test_validation_uses_cached_plan(self):
+        """Once the form's plan is compiled, validating a submission issues no queries."""
+        data = {
+            'formSlug': 'test-validation',
+            'submissionData': {
+                'clientIdentifier': 'CUST-PLAN-001',
+                'clientName': 'Plan Tester',
+                'loanAmount': '5000',
+            }
+        }
+
+        # First validation compiles the plan (form + prefetched fields)
+        with self.assertNumQueries(2):
+            self.assertTrue(DynamicSubmissionSerializer(data=data, context=self.get_submission_context()).is_valid())
+
+        with self.assertNumQueries(0):
+            self.assertTrue(DynamicSubmissionSerializer(data=data, context=self.get_submission_context()).is_valid())
+
+
+    def test_form_update_invalidates_cached_plan(self):
+        """Editing a form through FormSerializer must be reflected by the next validation."""
+        data = {
+            'formSlug': 'test-validation',
+            'submissionData': {
+                'clientIdentifier': 'CUST-PLAN-002',
+                'clientName': 'Plan Tester',
+                'loanAmount': '5000',
+            }
+        }
+        self.assertTrue(DynamicSubmissionSerializer(data=data, context=self.get_submission_context()).is_valid())
+
+        # Make 'notes' required through the admin serializer
+        fields = FormSerializer(self.form).data['fields']
+        for field in fields:
+            if field['field_name'] == 'notes':
+                field['is_required'] = True
+
+        formSerializer = FormSerializer(instance=self.form, data={'name': self.form.name, 'slug': self.form.slug, 'fields': fields})
+        self.assertTrue(formSerializer.is_valid(), formSerializer.errors)
+        formSerializer.save()
+
+        serializer = DynamicSubmissionSerializer(data=data, context=self.get_submission_context())
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('notes', serializer.errors)
+
+
+    # -------------------------------------------------------------
+    # TEST: SUBMISSION WRITES USE A CONSTANT NUMBER OF QUERIES
+    # -------------------------------------------------------------
+    def test_create_query_count_is_independent_of_field_count(self):
+        """Saving a 60-field submission with a file must not issue one INSERT per key."""
+        wideForm = Form.objects.create(name = "Wide KYC Form", slug = "wide-kyc", is_active = True)
+        FormField.objects.bulk_create([
+            FormField(form = wideForm, field_name = f"field{i}", field_type = "text", label = f"Field {i}", order = i)
+            for i in range(60)
+        ] + [FormField(form = wideForm, field_name = "incomeFile", field_type = "file_upload", label = "Income File", order = 60)])
+
+        submissionData = {f"field{i}": f"value {i}" for i in range(60)}
+        submissionData['clientIdentifier'] = 'CUST-WIDE-001'
+        data = {'formSlug': 'wide-kyc', 'submissionData': submissionData}
+
+        test_file = SimpleUploadedFile("wide_document.pdf", b"wide form file", content_type="application/pdf")
+        context = self.get_submission_context(files_data={'incomeFile': test_file})
+
+        serializer = DynamicSubmissionSerializer(data = data, context = context)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        # Blob upsert, then SAVEPOINT, submission INSERT, SubmissionData batch, FileAttachment batch,
+        # blob reference UPDATE, outbox INSERT, RELEASE
+        with self.assertNumQueries(8):
+            submission = serializer.save()
+
+        self.assertEqual(submission.data_entries.count(), 60)
+        self.assertEqual(submission.attachments.count(), 1)
+
+        submission.attachments.first().file.delete()
+
+
     # -------------------------------------------------------------
     # NEW TEST: ADMIN DETAIL SERIALIZER OUTPUT
     # -------------------------------------------------------------
@@ -582,4 +752,397 @@ class CeleryTaskTest(TestCase):
 
         # 6. Assert recipient and sender are correct
         self.assertIn('admin@yourcompany.com', email.to)
-        self.assertEqual(email.from_email, 'no-reply@onboarding.com')
\ No newline at end of file
+        self.assertEqual(email.from_email, 'no-reply@onboarding.com')
+
+
+class NotificationDigestTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.digestForm = Form.objects.create(name = "High Volume Form", slug = "high-volume", notification_mode = "digest")
+        FormField.objects.create(form = self.digestForm, field_name = "clientName", field_type = "text", label = "Client Name")
+
+        self.immediateForm = Form.objects.create(name = "Low Volume Form", slug = "low-volume")
+
+        self.pending = [
+            FormSubmission.objects.create(form = self.digestForm, client_identifier = f'DIGEST-{i}', data_snapshot = {'clientName': f'Client {i}'})
+            for i in range(3)
+        ]
+        # Already notified, and a submission of a per-submission form: neither belongs in a digest
+        FormSubmission.objects.create(form = self.digestForm, client_identifier = 'DIGEST-OLD', is_notified = True)
+        FormSubmission.objects.create(form = self.immediateForm, client_identifier = 'IMMEDIATE-1')
+
+    def test_digest_sends_one_email_per_form_and_marks_batch(self):
+        sent = sendNotificationDigests()
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(len(mail.outbox), 1)
+
+        email = mail.outbox[0]
+        self.assertEqual(email.subject, "3 New Form Submissions: High Volume Form")
+        self.assertIn("Client Identifier: DIGEST-0", email.body)
+        self.assertIn("clientName: Client 2", email.body)
+        self.assertNotIn("DIGEST-OLD", email.body)
+
+        self.assertEqual(FormSubmission.objects.filter(form = self.digestForm, is_notified = False).count(), 0)
+        self.assertFalse(FormSubmission.objects.get(client_identifier = 'IMMEDIATE-1').is_notified)
+
+        # Nothing left for the next window
+        self.assertEqual(sendNotificationDigests(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_digest_respects_batch_size(self):
+        with self.settings(NOTIFICATION_DIGEST_MAX_SUBMISSIONS = 2):
+            self.assertEqual(sendNotificationDigests(), 2)
+            self.assertEqual(sendNotificationDigests(), 1)
+
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failed_digest_is_released_for_the_next_run(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect = ConnectionError('smtp down')):
+            self.assertEqual(sendNotificationDigests(), 0)
+
+        self.assertEqual(FormSubmission.objects.filter(form = self.digestForm, is_notified = False).count(), 3)
+        self.assertEqual(sendNotificationDigests(), 3)
+
+    def test_claimed_submissions_are_not_emailed_by_an_overlapping_run(self):
+        # Another run claimed DIGEST-0 while this one was starting
+        FormSubmission.objects.filter(client_identifier = 'DIGEST-0').update(notification_claimed_at = timezone.now())
+
+        self.assertEqual(sendNotificationDigests(), 2)
+        self.assertNotIn("DIGEST-0", mail.outbox[0].body)
+
+    def test_claims_of_a_killed_run_expire_and_are_sent_later(self):
+        # The run that claimed everything died before sending: nothing is marked notified
+        FormSubmission.objects.filter(form = self.digestForm, is_notified = False).update(notification_claimed_at = timezone.now())
+        self.assertEqual(sendNotificationDigests(), 0)
+
+        FormSubmission.objects.filter(form = self.digestForm).update(notification_claimed_at = timezone.now() - timedelta(hours = 1))
+        self.assertEqual(sendNotificationDigests(), 3)
+        self.assertEqual(FormSubmission.objects.filter(form = self.digestForm, is_notified = False).count(), 0)
+
+    def test_digest_reads_values_without_a_snapshot_in_one_query(self):
+        for i in range(3):
+            submission = FormSubmission.objects.create(form = self.digestForm, client_identifier = f'NO-SNAPSHOT-{i}')
+            SubmissionData.objects.create(submission = submission, field_name = 'clientName', value = f'Legacy {i}')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sendNotificationDigests(), 6)
+
+        self.assertEqual(len([query for query in queries if 'form_builder_submissiondata' in query['sql']]), 1)
+        self.assertIn("clientName: Legacy 2", mail.outbox[0].body)
+
+    def test_digest_form_submissions_are_not_sent_individually(self):
+        data = {'formSlug': 'high-volume', 'submissionData': {'clientIdentifier': 'DIGEST-NEW', 'clientName': 'New'}}
+
+        class MockRequest:
+            FILES = {}
+
+        serializer = DynamicSubmissionSerializer(data = data, context = {'request': MockRequest()})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with mock.patch.object(sendAdminNotification, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute = True):
+                submission = serializer.save()
+
+        apply_async.assert_not_called()
+        self.assertFalse(NotificationOutbox.objects.filter(submission = submission).exists())
+
+
+class NotificationOutboxTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.form = Form.objects.create(name = "Outbox Form", slug = "outbox-form")
+        FormField.objects.create(form = self.form, field_name = "clientName", field_type = "text", label = "Client Name")
+
+    def submit(self, clientIdentifier):
+        class MockRequest:
+            FILES = {}
+
+        data = {'formSlug': 'outbox-form', 'submissionData': {'clientIdentifier': clientIdentifier, 'clientName': 'Outbox'}}
+        serializer = DynamicSubmissionSerializer(data = data, context = {'request': MockRequest()})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer
+
+    def test_notification_is_published_once_after_commit(self):
+        serializer = self.submit('OUTBOX-1')
+
+        with mock.patch.object(sendAdminNotification, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute = False) as callbacks:
+                submission = serializer.save()
+
+            # Nothing is published while the submission transaction is open
+            apply_async.assert_not_called()
+            self.assertTrue(NotificationOutbox.objects.filter(submission = submission, dispatched_at__isnull = True).exists())
+
+            for callback in callbacks:
+                callback()
+
+            # A later sweep finds nothing left to publish
+            relayNotificationOutbox()
+
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.args[0], (submission.id,))
+        # A broker outage fails fast instead of holding the response; the sweep retries
+        self.assertIs(apply_async.call_args.kwargs['retry'], False)
+        self.assertIsNotNone(NotificationOutbox.objects.get(submission = submission).dispatched_at)
+
+    def test_sweeper_publishes_rows_missed_by_the_fast_path(self):
+        # Saved without running on-commit hooks, as if the process died right after commit
+        submissions = [self.submit(f'OUTBOX-{i}').save() for i in range(3)]
+
+        with mock.patch.object(sendAdminNotification, 'apply_async') as apply_async:
+            self.assertEqual(relayNotificationOutbox(), 3)
+            self.assertEqual(relayNotificationOutbox(), 0)
+
+        self.assertEqual(
+            sorted(call.args[0][0] for call in apply_async.call_args_list),
+            sorted(submission.id for submission in submissions)
+        )
+
+    def test_failed_publish_leaves_rows_pending(self):
+        submission = self.submit('OUTBOX-FAIL').save()
+
+        with mock.patch.object(sendAdminNotification, 'apply_async', side_effect = ConnectionError('broker down')):
+            with self.assertRaises(ConnectionError):
+                relayNotificationOutbox()
+
+        outbox = NotificationOutbox.objects.get(submission = submission)
+        self.assertIsNone(outbox.dispatched_at)
+        self.assertIsNone(outbox.claimed_at)
+
+    def test_rows_claimed_by_another_relay_are_skipped_until_the_claim_expires(self):
+        submission = self.submit('OUTBOX-CLAIMED').save()
+        NotificationOutbox.objects.filter(submission = submission).update(claimed_at = timezone.now())
+
+        with mock.patch.object(sendAdminNotification, 'apply_async') as apply_async:
+            self.assertEqual(relayNotificationOutbox(), 0)
+
+            # The relay holding the claim died before marking the row dispatched
+            NotificationOutbox.objects.filter(submission = submission).update(claimed_at = timezone.now() - timedelta(hours=1))
+            self.assertEqual(relayNotificationOutbox(), 1)
+
+        apply_async.assert_called_once()
+        self.assertIsNotNone(NotificationOutbox.objects.get(submission = submission).dispatched_at)
+
+    def test_redelivered_notification_sends_one_email(self):
+        submission = self.submit('OUTBOX-TWICE').save()
+
+        sendAdminNotification(submission.id)
+        sendAdminNotification(submission.id)
+
+        self.assertEqual(len(mail.outbox), 1)
+
+
+# Minimal three-page PDF: only the page objects matter to the page counter
+THREE_PAGE_PDF = (
+    b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+    b"2 0 obj << /Type /Pages /Kids [3 0 R 4 0 R 5 0 R] /Count 3 >> endobj\n"
+    b"3 0 obj << /Type /Page /Parent 2 0 R >> endobj\n"
+    b"4 0 obj << /Type/Page /Parent 2 0 R >> endobj\n"
+    b"5 0 obj << /Type /Page /Parent 2 0 R >> endobj\ntrailer << /Root 1 0 R >>\n%%EOF\n"
+)
+
+
+class TaskResultPruningTest(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        for i in range(5):
+            TaskResult.objects.create(task_id=f'old-{i}', status='SUCCESS')
+        TaskResult.objects.create(task_id='recent', status='SUCCESS')
+
+        # date_done is auto_now: age the rows with an UPDATE
+        TaskResult.objects.filter(task_id__startswith='old-').update(date_done=now - timedelta(hours=100))
+
+    def test_fire_and_forget_tasks_store_only_failures(self):
+        self.assertTrue(sendAdminNotification.ignore_result)
+        self.assertTrue(processAttachments.ignore_result)
+        self.assertFalse(sendNotificationDigests.ignore_result)
+        self.assertTrue(sendAdminNotification.store_errors_even_if_ignored)
+        self.assertTrue(processAttachments.store_errors_even_if_ignored)
+
+    @override_settings(TASK_RESULT_RETENTION_HOURS = 72, TASK_RESULT_PRUNE_BATCH_SIZE = 2, TASK_RESULT_PRUNE_MAX_BATCHES = 2)
+    def test_pruning_is_bounded_per_run(self):
+        # Two batches of two: one expired row is left for the next run
+        self.assertEqual(pruneTaskResults(), 4)
+        self.assertEqual(TaskResult.objects.filter(task_id__startswith='old-').count(), 1)
+
+        self.assertEqual(pruneTaskResults(), 1)
+        self.assertEqual(list(TaskResult.objects.values_list('task_id', flat=True)), ['recent'])
+
+
+class TaskQueueTest(TransactionTestCase):
+    """
+    Publishes to an in-memory broker with the project's queues and routes, and runs a real
+    worker (in a thread) the way the notifications profile does.
+    """
+
+    def setUp(self):
+        self.app = TestApp(config={
+            'task_queues': settings.CELERY_TASK_QUEUES,
+            'task_default_queue': settings.CELERY_TASK_DEFAULT_QUEUE,
+            'task_routes': settings.CELERY_TASK_ROUTES,
+            'task_annotations': settings.CELERY_TASK_ANNOTATIONS,
+        })
+        # Restores the project's app as the current one after the test
+        self.enterContext(setup_default_app(self.app))
+        self.app.set_current()
+        self.form = Form.objects.create(name="Queue Form", slug="queue-form")
+        FormField.objects.create(form=self.form, field_name="note", field_type="text", label="Note", order=1)
+
+    def tearDown(self):
+        # The memory transport's queues are process-wide
+        with self.app.connection_for_write() as connection:
+            for queue in settings.CELERY_TASK_QUEUES:
+                connection.default_channel.queue_purge(queue.name)
+
+    def queued(self, queueName):
+        with self.app.connection_for_write() as connection:
+            return connection.default_channel.queue_declare(queueName, passive=True).message_count
+
+    def test_tasks_are_routed_to_their_queues(self):
+        routes = {
+            name: self.app.amqp.router.route({}, name)
+            for name in ('form_builder.tasks.sendAdminNotification', 'form_builder.tasks.processAttachments',
+                         'form_builder.tasks.archiveSubmissions')
+        }
+
+        self.assertEqual(routes['form_builder.tasks.sendAdminNotification']['queue'].name, 'notifications')
+        self.assertEqual(routes['form_builder.tasks.sendAdminNotification']['priority'], 0)
+        self.assertEqual(routes['form_builder.tasks.processAttachments']['queue'].name, 'exports')
+        self.assertEqual(routes['form_builder.tasks.archiveSubmissions']['queue'].name, 'maintenance')
+        self.assertEqual(sendAdminNotification.soft_time_limit, 30)
+
+    def test_notifications_are_not_starved_by_an_attachment_backlog(self):
+        # 1. A large attachment-processing backlog is queued first...
+        queueAttachmentProcessing(range(1, 5001))
+        backlog = self.queued('exports')
+        self.assertEqual(backlog, 5000 // settings.ATTACHMENT_PROCESSING_BATCH_SIZE)
+
+        # 2. ...then a submission's notification
+        submission = FormSubmission.objects.create(form=self.form, client_identifier='QUEUE-1')
+        NotificationOutbox.objects.create(submission=submission)
+        self.assertEqual(dispatchPendingNotifications(), 1)
+
+        # 3. The notifications worker sends it straight away, without touching the backlog
+        with start_worker(self.app, perform_ping_check=False, queues=['notifications']):
+            for _ in range(100):
+                submission.refresh_from_db()
+                if submission.is_notified:
+                    break
+                time.sleep(0.05)
+
+        self.assertTrue(submission.is_notified)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self.queued('exports'), backlog)
+
+
+class AttachmentProcessingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        mediaRoot = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, mediaRoot)
+        settingsOverride = override_settings(MEDIA_ROOT=mediaRoot)
+        settingsOverride.enable()
+        self.addCleanup(settingsOverride.disable)
+
+        self.form = Form.objects.create(name = "Processing Form", slug = "processing-form", notification_mode = 'digest')
+        FormField.objects.create(form = self.form, field_name = "document", field_type = "file_upload", label = "Document")
+
+    def submit(self, clientIdentifier, name, content, contentType):
+        class MockRequest:
+            FILES = {'document': SimpleUploadedFile(name, content, content_type = contentType)}
+
+        data = {'formSlug': 'processing-form', 'submissionData': {'clientIdentifier': clientIdentifier}}
+        serializer = DynamicSubmissionSerializer(data = data, context = {'request': MockRequest()})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with mock.patch.object(processAttachments, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute = True):
+                submission = serializer.save()
+
+        # Queued after commit, with the new attachment's ID
+        attachment = submission.attachments.get()
+        self.assertEqual(apply_async.call_args.args[0], ([attachment.id],))
+        return attachment
+
+    def test_pdf_is_sniffed_and_paged(self):
+        # The client claims an image; the content decides
+        attachment = self.submit('PROC-1', 'scan.png', THREE_PAGE_PDF, 'image/png')
+        self.assertIsNone(attachment.processed_at)
+
+        self.assertEqual(processAttachments([attachment.id]), 1)
+
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.detected_type, 'application/pdf')
+        self.assertEqual(attachment.page_count, 3)
+        self.assertIsNotNone(attachment.processed_at)
+
+        data = AdminFileAttachmentSerializer(attachment).data
+        self.assertEqual(data['detected_type'], 'application/pdf')
+        self.assertEqual(data['page_count'], 3)
+
+    def test_processing_is_idempotent_and_reuses_results_for_identical_content(self):
+        first = self.submit('PROC-1', 'a.pdf', THREE_PAGE_PDF, 'application/pdf')
+        processAttachments([first.id])
+
+        # A second run over the same attachment does nothing
+        self.assertEqual(processAttachments([first.id]), 0)
+
+        # Identical content is not analyzed again; the earlier results are copied
+        second = self.submit('PROC-2', 'b.pdf', THREE_PAGE_PDF, 'application/pdf')
+        with mock.patch('form_builder.tasks.analyze_file') as analyze_file:
+            processAttachments([second.id])
+        analyze_file.assert_not_called()
+
+        second.refresh_from_db()
+        self.assertEqual(second.page_count, 3)
+
+    def test_soft_time_limit_keeps_the_attachments_already_processed(self):
+        first = self.submit('PROC-1', 'a.txt', b'first note', 'text/plain')
+        second = self.submit('PROC-2', 'b.txt', b'second note', 'text/plain')
+
+        results = {'detected_type': 'text/plain', 'page_count': None, 'thumbnail': None}
+        with mock.patch('form_builder.tasks.analyze_file', side_effect = [results, SoftTimeLimitExceeded()]):
+            self.assertEqual(processAttachments([first.id, second.id]), 1)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.detected_type, 'text/plain')
+        self.assertIsNone(second.processed_at)
+
+    def test_sweeper_queues_only_unprocessed_attachments_in_batches(self):
+        processed = self.submit('PROC-1', 'a.pdf', THREE_PAGE_PDF, 'application/pdf')
+        processAttachments([processed.id])
+        pending = [self.submit(f'PROC-{i}', f'{i}.txt', f'note {i}'.encode(), 'text/plain').id for i in range(2, 6)]
+
+        # Attachments queued recently are still waiting in the queue and are left alone
+        FileAttachment.objects.filter(id__in=pending[:3]).update(queued_at=timezone.now() - timedelta(hours=2))
+        with override_settings(ATTACHMENT_PROCESSING_BATCH_SIZE = 2):
+            with mock.patch.object(processAttachments, 'apply_async') as apply_async:
+                self.assertEqual(processPendingAttachments(), 3)
+
+        self.assertEqual([call.args[0] for call in apply_async.call_args_list], [(pending[:2],), (pending[2:3],)])
+
+        # Re-queued attachments are marked, so the next sweep skips them too
+        with mock.patch.object(processAttachments, 'apply_async') as apply_async:
+            self.assertEqual(processPendingAttachments(), 0)
+
+
+class MimeSniffingTest(TestCase):
+
+    def test_magic_numbers(self):
+        self.assertEqual(sniff_mime_type(b'\x89PNG\r\n\x1a\n' + b'\x00' * 8), 'image/png')
+        self.assertEqual(sniff_mime_type(b'\xff\xd8\xff\xe0rest'), 'image/jpeg')
+        self.assertEqual(sniff_mime_type(b'RIFF\x00\x00\x00\x00WEBPVP8 '), 'image/webp')
+        self.assertEqual(sniff_mime_type(b'plain notes'), 'text/plain')
+        self.assertEqual(sniff_mime_type(b'\x00\x01\x02binary'), 'application/octet-stream')
+
+    def test_page_markers_split_across_blocks_are_counted_once(self):
+        padding = b' ' * (READ_BLOCK_SIZE - 5)
+        self.assertEqual(count_pdf_pages(io.BytesIO(padding + b'/Type /Page >> /Type /Pages')), 1)
+
@@ -1,7 +1,38 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from form_builder.models import Form, FormField
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from unittest import mock
+from form_builder.models import Form, FormField, FormSubmission, SubmissionData, FileAttachment, StoredBlob, NotificationOutbox, \
+    SubmissionArchive, FileUpload
+from form_builder.stats import refresh_form_stats
+from form_builder.blobs import blob_name, collect_garbage, store_blob
+from form_builder.archive import archive_form_month, write_archive_file
+from form_builder.tasks import sendAdminNotification
+from form_builder.profiling import registry
+from form_builder.replicas import ReplicaRouter, ReplicaRoutingMiddleware
+from form_builder.serializers import DynamicSubmissionSerializer, FormSerializer
+from form_builder.views import BatchTooLarge, read_batch_items
+from form_builder.uploads import UploadOffsetMismatch, staging_path, write_chunk
+from django_celery_results.models import TaskResult
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
 
 User = get_user_model()
 
@@ -109,6 +140,10 @@ class ClientAPITest(APITestCase):
             is_active=False
         )
 
+    def setUp(self):
+        # Client schemas are cached across tests; start every test cold
+        cache.clear()
+
     def test_client_list_only_shows_active_forms(self):
         """
         Tests that the ClientFormListView (public list) only returns forms
@@ -154,4 +189,1400 @@ class ClientAPITest(APITestCase):
 
         # The view's queryset filters for is_active=True, so a non-matching
         # (inactive) form should result in a 404 Not Found.
-        self.assertEqual(response.status_code, 404)
\ No newline at end of file
+        self.assertEqual(response.status_code, 404)
+
+    def test_client_detail_returns_etag_and_honors_if_none_match(self):
+        """
+        Tests that the schema carries a strong ETag and that sending it back
+        in If-None-Match yields 304 Not Modified without touching the database.
+        """
+        url = CLIENT_DETAIL_URL(slug=self.active_form.slug)
+        response = self.client.get(url)
+
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+
+
+    def test_client_schema_etag_changes_when_a_field_changes(self):
+        """Tests that editing a FormField bumps the form's schema_version and its ETag."""
+        url = CLIENT_DETAIL_URL(slug=self.active_form.slug)
+        firstEtag = self.client.get(url)['ETag']
+        listEtag = self.client.get(CLIENT_LIST_URL)['ETag']
+
+        field = self.active_form.fields.get()
+        field.label = "Loan Amount (KES)"
+        field.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=firstEtag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], firstEtag)
+        self.assertEqual(response.data['fields'][0]['label'], "Loan Amount (KES)")
+        self.assertNotEqual(self.client.get(CLIENT_LIST_URL)['ETag'], listEtag)
+
+
+    def test_client_list_honors_if_none_match(self):
+        """Tests that the public form list supports conditional GETs."""
+        etag = self.client.get(CLIENT_LIST_URL)['ETag']
+
+        response = self.client.get(CLIENT_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_weak_if_none_match_is_honored(self):
+        """A validator a proxy weakened (W/"...") still matches."""
+        etag = self.client.get(CLIENT_LIST_URL)['ETag']
+
+        response = self.client.get(CLIENT_LIST_URL, HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(CLIENT_LIST_URL, HTTP_IF_NONE_MATCH='W/"other"').status_code, 200)
+
+
+EXPORT_URL = lambda slug: reverse('form-admin-export', kwargs={'slug': slug})
+
+
+class AdminSubmissionExportTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            username='exporter',
+            password='adminpassword',
+            email='exporter@example.com'
+        )
+
+        cls.form = Form.objects.create(name="Export Form", slug="export-form", is_active=True)
+        FormField.objects.create(form=cls.form, field_name="clientName", field_type="text", label="Client Name", order=1)
+        FormField.objects.create(form=cls.form, field_name="loanAmount", field_type="number", label="Loan", order=2)
+        FormField.objects.create(form=cls.form, field_name="idScan", field_type="file_upload", label="ID Scan", order=3)
+
+        cls.first = FormSubmission.objects.create(form=cls.form, client_identifier='CUST-1')
+        SubmissionData.objects.create(submission=cls.first, field_name='clientName', value='Alice')
+        SubmissionData.objects.create(submission=cls.first, field_name='loanAmount', value='1000')
+        FileAttachment.objects.create(submission=cls.first, field_name='idScan', file='form_uploads/alice.pdf')
+
+        # Second submission leaves loanAmount empty
+        cls.second = FormSubmission.objects.create(form=cls.form, client_identifier='CUST-2')
+        SubmissionData.objects.create(submission=cls.second, field_name='clientName', value='Bob')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.superuser)
+
+    def test_csv_export_pivots_one_row_per_submission(self):
+        response = self.client.get(EXPORT_URL(self.form.slug))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['clientName'], 'Alice')
+        self.assertEqual(rows[0]['loanAmount'], '1000')
+        self.assertEqual(rows[0]['idScan'], 'form_uploads/alice.pdf')
+        self.assertEqual(rows[1]['client_identifier'], 'CUST-2')
+        self.assertEqual(rows[1]['loanAmount'], '')
+
+    def test_csv_export_escapes_formulas(self):
+        formulas = ['=HYPERLINK("http://evil.example")', '+1+1', '-2+3', '@SUM(A1)', '\tcmd', '\rcmd']
+        for i, formula in enumerate(formulas):
+            submission = FormSubmission.objects.create(form=self.form, client_identifier=f'EVIL-{i}')
+            SubmissionData.objects.create(submission=submission, field_name='clientName', value=formula)
+
+        response = self.client.get(EXPORT_URL(self.form.slug))
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode(), newline='')))
+
+        self.assertEqual([row['clientName'] for row in rows[2:]], ["'" + formula for formula in formulas])
+        self.assertEqual(rows[0]['clientName'], 'Alice')
+
+        # NDJSON is not opened in spreadsheets and keeps the submitted value
+        ndjson = self.client.get(EXPORT_URL(self.form.slug), {'exportFormat': 'ndjson'})
+        records = [json.loads(line) for line in b''.join(ndjson.streaming_content).decode().splitlines()]
+        self.assertEqual(records[2]['clientName'], formulas[0])
+
+    def test_ndjson_export(self):
+        response = self.client.get(EXPORT_URL(self.form.slug), {'exportFormat': 'ndjson'})
+
+        self.assertEqual(response.status_code, 200)
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual([record['submission_id'] for record in records], [self.first.id, self.second.id])
+        self.assertIsNone(records[1]['loanAmount'])
+
+    def test_unknown_export_format_is_rejected(self):
+        response = self.client.get(EXPORT_URL(self.form.slug), {'exportFormat': 'xlsx'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+SUBMISSION_LIST_URL = reverse('submission-admin-list')
+
+
+class AdminSubmissionKeysetPaginationTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            username='pager',
+            password='adminpassword',
+            email='pager@example.com'
+        )
+        cls.form = Form.objects.create(name="Paged Form", slug="paged-form", is_active=True)
+
+        # Some submissions share a client identifier and some have none, to exercise tie-breaking
+        FormSubmission.objects.bulk_create([
+            FormSubmission(form=cls.form, client_identifier=None if i % 5 == 0 else f'CUST-{i % 4}')
+            for i in range(23)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.superuser)
+
+    def walk_pages(self, params):
+        """Follows nextCursor until the last page and returns the pages in order."""
+        pages = []
+        response = self.client.get(SUBMISSION_LIST_URL, {**params, 'paginationMode': 'keyset'})
+
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            if not response.data['nextCursor']:
+                return pages
+            response = self.client.get(SUBMISSION_LIST_URL, {**params, 'cursor': response.data['nextCursor']})
+
+    def test_keyset_pages_cover_every_row_once_in_order(self):
+        pages = self.walk_pages({'pageSize': 5})
+
+        ids = [row['id'] for page in pages for row in page['rows']]
+        expected = list(FormSubmission.objects.order_by('-submission_date', '-id').values_list('id', flat=True))
+
+        self.assertEqual(ids, expected)
+        self.assertEqual([page['pageIndex'] for page in pages], [1, 2, 3, 4, 5])
+        self.assertEqual(pages[0]['totalRows'], 23)
+        self.assertEqual(pages[0]['totalPages'], 5)
+
+    def test_keyset_supports_ordering_fields_with_nulls_and_ties(self):
+        pages = self.walk_pages({'pageSize': 4, 'ordering': 'client_identifier'})
+
+        ids = [row['id'] for page in pages for row in page['rows']]
+        self.assertEqual(len(ids), 23)
+        self.assertEqual(len(set(ids)), 23)
+
+        identifiers = [row['client_identifier'] or '' for page in pages for row in page['rows']]
+        self.assertEqual(identifiers, sorted(identifiers))
+
+        # NULLs sort first, and walking back from the last page returns every row too
+        self.assertIsNone(pages[0]['rows'][0]['client_identifier'])
+        backIds = [row['id'] for row in pages[-1]['rows']]
+        response = self.client.get(SUBMISSION_LIST_URL, {'pageSize': 4, 'ordering': 'client_identifier', 'cursor': pages[-1]['previousCursor']})
+        while True:
+            backIds = [row['id'] for row in response.data['rows']] + backIds
+            if not response.data['previousCursor']:
+                break
+            response = self.client.get(SUBMISSION_LIST_URL, {'pageSize': 4, 'ordering': 'client_identifier', 'cursor': response.data['previousCursor']})
+        self.assertEqual(backIds, ids)
+
+    def test_descending_keyset_pages_put_nulls_last(self):
+        pages = self.walk_pages({'pageSize': 4, 'ordering': '-client_identifier'})
+
+        identifiers = [row['client_identifier'] for page in pages for row in page['rows']]
+        self.assertEqual(len(identifiers), 23)
+        self.assertEqual(identifiers, sorted(identifiers, key=lambda value: value or '', reverse=True))
+        self.assertIsNone(identifiers[-1])
+
+    def test_keyset_filters_the_raw_sort_column(self):
+        first = self.client.get(SUBMISSION_LIST_URL, {'pageSize': 4, 'ordering': 'client_identifier', 'paginationMode': 'keyset'}).data
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(SUBMISSION_LIST_URL, {'pageSize': 4, 'ordering': 'client_identifier', 'cursor': first['nextCursor']})
+
+        rowsQuery = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'])
+        self.assertNotIn('COALESCE', rowsQuery)
+
+    def test_keyset_predicate_compares_the_sort_column_then_the_id(self):
+        first = self.client.get(SUBMISSION_LIST_URL, {'pageSize': 4, 'ordering': '-client_identifier', 'paginationMode': 'keyset'}).data
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(SUBMISSION_LIST_URL, {'pageSize': 4, 'ordering': '-client_identifier', 'cursor': first['nextCursor']})
+
+        rowsQuery = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'])
+        self.assertIn('"form_builder_formsubmission"."client_identifier" <', rowsQuery)
+        self.assertIn('"form_builder_formsubmission"."id" <', rowsQuery)
+
+    def test_previous_cursor_returns_the_previous_page(self):
+        first = self.client.get(SUBMISSION_LIST_URL, {'pageSize': 5, 'paginationMode': 'keyset'}).data
+        second = self.client.get(SUBMISSION_LIST_URL, {'pageSize': 5, 'cursor': first['nextCursor']}).data
+        back = self.client.get(SUBMISSION_LIST_URL, {'pageSize': 5, 'cursor': second['previousCursor']}).data
+
+        self.assertEqual(back['pageIndex'], 1)
+        self.assertEqual([row['id'] for row in back['rows']], [row['id'] for row in first['rows']])
+        self.assertIsNone(back['previousCursor'])
+
+    def test_total_count_can_be_skipped(self):
+        response = self.client.get(SUBMISSION_LIST_URL, {'paginationMode': 'keyset', 'includeTotal': 'false'})
+
+        self.assertIsNone(response.data['totalRows'])
+        self.assertEqual(len(response.data['rows']), 12)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(SUBMISSION_LIST_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+SUBMISSION_DETAIL_URL = lambda pk: reverse('submission-admin-detail', kwargs={'pk': pk})
+
+
+class AdminSubmissionQueryBudgetTest(APITestCase):
+    """
+    Pins the number of queries each admin submission endpoint may issue. Every budget is
+    checked at two data sizes so that per-row (N+1) queries fail the test.
+    """
+
+    # Page-number list: COUNT(*) + one page of rows (joined with form)
+    LIST_BUDGET = 2
+    # Detail: submission + form, attachments (values come from data_snapshot)
+    DETAIL_BUDGET = 2
+    # Detail of an older submission without a snapshot also reads its data entries
+    LEGACY_DETAIL_BUDGET = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            username='budget',
+            password='adminpassword',
+            email='budget@example.com'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.superuser)
+
+    def create_submissions(self, formCount, perForm, entries, snapshot=False):
+        """Creates formCount forms with perForm submissions, each with `entries` data rows and one attachment."""
+        submissions = []
+        for f in range(formCount):
+            form = Form.objects.create(name=f"Budget Form {perForm}-{entries}-{f}-{snapshot}", slug=f"budget-{perForm}-{entries}-{f}-{snapshot:d}")
+            for i in range(perForm):
+                submission = FormSubmission.objects.create(
+                    form=form,
+                    client_identifier=f'BUDGET-{f}-{i}',
+                    data_snapshot={f'field{e}': str(e) for e in range(entries)} if snapshot else None
+                )
+                SubmissionData.objects.bulk_create([
+                    SubmissionData(submission=submission, field_name=f'field{e}', value=str(e)) for e in range(entries)
+                ])
+                FileAttachment.objects.create(submission=submission, field_name='idScan', file='form_uploads/id.pdf')
+                submissions.append(submission)
+        return submissions
+
+    def assertQueryBudget(self, budget, url, params=None):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_search_and_sort_budgets_do_not_grow_with_rows(self):
+        for formCount, perForm in ((1, 2), (4, 5)):
+            self.create_submissions(formCount, perForm, entries=3)
+
+            response = self.assertQueryBudget(self.LIST_BUDGET, SUBMISSION_LIST_URL, {'pageSize': 50})
+            self.assertTrue(all(row['form_name'] for row in response.data['rows']))
+
+            self.assertQueryBudget(self.LIST_BUDGET, SUBMISSION_LIST_URL, {'search': 'Budget'})
+            self.assertQueryBudget(self.LIST_BUDGET, SUBMISSION_LIST_URL, {'ordering': '-form_name'})
+            self.assertQueryBudget(self.LIST_BUDGET, SUBMISSION_LIST_URL, {'ordering': 'client_identifier', 'search': 'BUDGET-0'})
+
+    def test_keyset_list_budget(self):
+        self.create_submissions(2, 5, entries=1)
+        params = {'paginationMode': 'keyset', 'pageSize': 4}
+
+        # Rows + total count, then rows only once the count is cached
+        first = self.assertQueryBudget(2, SUBMISSION_LIST_URL, params)
+        self.assertQueryBudget(1, SUBMISSION_LIST_URL, {'pageSize': 4, 'cursor': first.data['nextCursor']})
+
+    def test_detail_budget_does_not_grow_with_entries(self):
+        for entries in (2, 40):
+            submission = self.create_submissions(1, 1, entries=entries, snapshot=True)[0]
+
+            response = self.assertQueryBudget(self.DETAIL_BUDGET, SUBMISSION_DETAIL_URL(submission.id))
+            self.assertEqual(len(response.data['submission_data']), entries)
+            self.assertEqual(len(response.data['attachments']), 1)
+
+    def test_detail_without_snapshot_falls_back_to_data_entries(self):
+        for entries in (2, 40):
+            submission = self.create_submissions(1, 1, entries=entries)[0]
+
+            response = self.assertQueryBudget(self.LEGACY_DETAIL_BUDGET, SUBMISSION_DETAIL_URL(submission.id))
+            self.assertEqual(response.data['submission_data'], {f'field{e}': str(e) for e in range(entries)})
+
+
+CLIENT_SUBMISSION_URL = reverse('client-submission')
+
+
+class AdminSubmissionFullTextSearchTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            username='searcher',
+            password='adminpassword',
+            email='searcher@example.com'
+        )
+        cls.form = Form.objects.create(name="Search Form", slug="search-form", is_active=True)
+        FormField.objects.create(form=cls.form, field_name="nationalId", field_type="text", label="National ID", order=1)
+        FormField.objects.create(form=cls.form, field_name="email", field_type="text", label="Email", order=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, clientIdentifier, nationalId, email):
+        payload = {
+            'formSlug': 'search-form',
+            'submissionData': json.dumps({'clientIdentifier': clientIdentifier, 'nationalId': nationalId, 'email': email}),
+        }
+        # The search document is written once the submission transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(CLIENT_SUBMISSION_URL, payload)
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['submissionId']
+
+    def search(self, query):
+        self.client.force_authenticate(user=self.superuser)
+        response = self.client.get(SUBMISSION_LIST_URL, {'q': query})
+        self.client.force_authenticate(user=None)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['rows']]
+
+    def test_search_matches_submitted_values(self):
+        alice = self.submit('CUST-A', '29384756', 'alice.w@example.com')
+        bob = self.submit('CUST-B', '11223344', 'bob@example.org')
+
+        self.assertEqual(self.search('29384756'), [alice])
+        self.assertEqual(self.search('bob@example.org'), [bob])
+        self.assertEqual(self.search('CUST-A'), [alice])
+        self.assertEqual(self.search('99999999'), [])
+
+    def test_search_input_is_not_parsed_as_query_syntax(self):
+        self.submit('CUST-C', '55667788', 'carol@example.com')
+
+        self.assertEqual(self.search('"55667788 OR NEAR('), [])
+
+
+METRICS_URL = reverse('admin-metrics')
+
+
+@override_settings(MIDDLEWARE=['form_builder.profiling.RequestProfilingMiddleware'] + settings.MIDDLEWARE)
+class RequestProfilingTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            username='profiler',
+            password='adminpassword',
+            email='profiler@example.com'
+        )
+        form = Form.objects.create(name="Profiled Form", slug="profiled-form", is_active=True)
+        for i in range(3):
+            FormSubmission.objects.create(form=form, client_identifier=f'PROF-{i}')
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.client.force_authenticate(user=self.superuser)
+
+    def test_server_timing_header_reports_queries_and_durations(self):
+        response = self.client.get(SUBMISSION_LIST_URL)
+
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;desc="\d+ queries";dur=[\d.]+')
+        self.assertRegex(timing, r'serializer;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+
+    def test_metrics_are_labelled_by_view_and_action(self):
+        self.client.get(SUBMISSION_LIST_URL)
+        self.client.get(SUBMISSION_LIST_URL)
+        self.client.get(CLIENT_LIST_URL)
+
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+        body = response.content.decode()
+        self.assertIn('# TYPE form_builder_request_duration_seconds histogram', body)
+        self.assertIn('form_builder_request_duration_seconds_count{view="AdminSubmissionViewSet.list"} 2', body)
+        self.assertIn('form_builder_request_queries_count{view="ClientFormListView"} 1', body)
+        self.assertIn('form_builder_request_serializer_duration_seconds_bucket{view="AdminSubmissionViewSet.list",le="+Inf"} 2', body)
+
+    def test_metrics_report_the_task_result_table(self):
+        TaskResult.objects.create(task_id='done-1', status='SUCCESS')
+        TaskResult.objects.create(task_id='done-2', status='SUCCESS')
+        TaskResult.objects.create(task_id='failed-1', status='FAILURE')
+
+        body = self.client.get(METRICS_URL).content.decode()
+        self.assertIn('# TYPE form_builder_task_results gauge', body)
+        self.assertIn('form_builder_task_results{status="SUCCESS"} 2', body)
+        self.assertIn('form_builder_task_results{status="FAILURE"} 1', body)
+        self.assertIn('form_builder_task_results_oldest_age_seconds', body)
+
+    def test_metrics_require_admin(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 401)
+
+
+UPLOAD_URL = reverse('client-upload')
+UPLOAD_DETAIL_URL = lambda uploadId: reverse('client-upload-detail', kwargs={'uploadId': uploadId})
+
+
+class ChunkedUploadTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = Form.objects.create(name="Upload Form", slug="upload-form", is_active=True, notification_mode='digest')
+        FormField.objects.create(
+            form=cls.form, field_name="idScan", field_type="file_upload", label="ID Scan", order=1,
+            configuration={'max_size': 1000, 'allowed_types': ['application/pdf', 'image/*']}
+        )
+        FormField.objects.create(form=cls.form, field_name="fullName", field_type="text", label="Full Name", order=2)
+
+    def setUp(self):
+        cache.clear()
+        mediaRoot = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, mediaRoot)
+        settingsOverride = override_settings(MEDIA_ROOT=mediaRoot, UPLOAD_STAGING_DIR=os.path.join(mediaRoot, 'staging'))
+        settingsOverride.enable()
+        self.addCleanup(settingsOverride.disable)
+
+    def start(self, size, filename='scan.pdf', contentType='application/pdf'):
+        return self.client.post(UPLOAD_URL, {
+            'formSlug': 'upload-form', 'fieldName': 'idScan', 'filename': filename, 'contentType': contentType, 'size': size,
+        }, format='json')
+
+    def send(self, uploadId, offset, chunk):
+        return self.client.generic(
+            'PATCH', UPLOAD_DETAIL_URL(uploadId), chunk,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def upload(self, content):
+        uploadId = self.start(len(content)).data['uploadId']
+        for offset in range(0, len(content), 300):
+            response = self.send(uploadId, offset, content[offset:offset + 300])
+            self.assertEqual(response.status_code, 200, response.data)
+        return uploadId, response
+
+    def submit(self, uploadId, clientIdentifier='UP-1'):
+        return self.client.post(CLIENT_SUBMISSION_URL, {
+            'formSlug': 'upload-form',
+            'submissionData': json.dumps({'clientIdentifier': clientIdentifier, 'fullName': 'Jane', 'idScan': uploadId}),
+        })
+
+    def test_chunks_are_assembled_hashed_and_attached_by_id(self):
+        content = bytes(range(256)) * 3
+        uploadId, response = self.upload(content)
+
+        self.assertTrue(response.data['complete'])
+        self.assertEqual(response.data['offset'], len(content))
+        self.assertEqual(response.data['sha256'], hashlib.sha256(content).hexdigest())
+
+        submitResponse = self.submit(uploadId)
+        self.assertEqual(submitResponse.status_code, 201, submitResponse.data)
+
+        attachment = FileAttachment.objects.get(submission_id=submitResponse.data['submissionId'])
+        self.assertEqual(attachment.field_name, 'idScan')
+        self.assertEqual(attachment.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(attachment.size, len(content))
+        self.assertEqual(str(attachment.upload_id), uploadId)
+        with attachment.file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+
+        # The upload reference is not stored as a submitted value
+        self.assertFalse(SubmissionData.objects.filter(field_name='idScan').exists())
+
+    def test_progress_can_be_resumed_from_the_reported_offset(self):
+        uploadId = self.start(600).data['uploadId']
+        self.send(uploadId, 0, b'a' * 250)
+
+        progress = self.client.get(UPLOAD_DETAIL_URL(uploadId))
+        self.assertEqual(progress.data['offset'], 250)
+        self.assertFalse(progress.data['complete'])
+
+        # A chunk that does not start at the current offset is rejected with the offset to resume from
+        conflict = self.send(uploadId, 100, b'b' * 100)
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.data['offset'], 250)
+
+        self.assertEqual(self.send(uploadId, 250, b'c' * 350).data['complete'], True)
+
+    def test_field_limits_are_enforced(self):
+        self.assertEqual(self.start(1001).status_code, 400)
+        self.assertEqual(self.start(10, filename='script.sh', contentType='text/x-shellscript').status_code, 400)
+        self.assertEqual(self.start(10, filename='photo.png', contentType='image/png').status_code, 201)
+
+        # The declared size also caps what the chunks may add up to
+        uploadId = self.start(100).data['uploadId']
+        self.assertEqual(self.send(uploadId, 0, b'x' * 101).status_code, 413)
+        self.assertEqual(self.client.get(UPLOAD_DETAIL_URL(uploadId)).data['offset'], 0)
+
+    def test_upload_can_only_be_attached_once_when_complete(self):
+        unfinished = self.start(500).data['uploadId']
+        self.assertEqual(self.submit(unfinished).status_code, 400)
+
+        uploadId, _ = self.upload(b'z' * 400)
+        self.assertEqual(self.submit(uploadId, 'UP-1').status_code, 201)
+        self.assertEqual(self.submit(uploadId, 'UP-2').status_code, 400)
+
+    def test_a_chunk_that_loses_the_offset_race_writes_nothing(self):
+        uploadId = self.start(200).data['uploadId']
+        stale = FileUpload.objects.get(id=uploadId)
+
+        self.send(uploadId, 0, b'a' * 100)
+
+        # The stale copy still says offset 0, like a request that raced the first one
+        with self.assertRaises(UploadOffsetMismatch):
+            write_chunk(stale, 0, io.BytesIO(b'b' * 100))
+
+        with open(staging_path(stale), 'rb') as part:
+            self.assertEqual(part.read(), b'a' * 100)
+
+    def test_upload_attached_concurrently_is_rejected_with_400(self):
+        uploadId, _ = self.upload(b'z' * 400)
+        upload = FileUpload.objects.get(id=uploadId)
+        self.assertEqual(self.submit(uploadId, 'UP-1').status_code, 201)
+
+        # Validation already passed when the other request attached the upload
+        def resolve_uploads(serializer, nestedData):
+            return {'idScan': upload} if nestedData.get('idScan') else {}
+
+        with mock.patch.object(DynamicSubmissionSerializer, 'resolve_uploads', resolve_uploads):
+            response = self.submit(uploadId, 'UP-2')
+            batch = self.client.post(BATCH_URL, [
+                {'formSlug': 'upload-form', 'submissionData': {'clientIdentifier': 'UP-3', 'idScan': uploadId}},
+                {'formSlug': 'upload-form', 'submissionData': {'clientIdentifier': 'UP-4', 'fullName': 'Jane'}},
+            ], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('idScan', response.data)
+
+        self.assertEqual([result['status'] for result in batch.data['results']], [400, 201])
+        self.assertEqual(
+            sorted(FormSubmission.objects.values_list('client_identifier', flat=True)), ['UP-1', 'UP-4']
+        )
+
+    def test_files_under_non_file_fields_are_rejected(self):
+        for fieldName in ('fullName', 'notAField'):
+            response = self.client.post(CLIENT_SUBMISSION_URL, {
+                'formSlug': 'upload-form',
+                'submissionData': json.dumps({'clientIdentifier': 'UP-5', 'fullName': 'Jane'}),
+                fieldName: SimpleUploadedFile('big.bin', b'x' * 2000, content_type='application/octet-stream'),
+            })
+
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(fieldName, response.data)
+
+        self.assertFalse(FormSubmission.objects.filter(client_identifier='UP-5').exists())
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_multipart_files_respect_field_limits(self):
+        oversized = SimpleUploadedFile('scan.pdf', b'x' * 1001, content_type='application/pdf')
+        response = self.client.post(CLIENT_SUBMISSION_URL, {
+            'formSlug': 'upload-form',
+            'submissionData': json.dumps({'clientIdentifier': 'UP-3', 'fullName': 'Jane'}),
+            'idScan': oversized,
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('idScan', response.data)
+
+
+class ContentAddressedStorageTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = Form.objects.create(name="Blob Form", slug="blob-form", is_active=True, notification_mode='digest')
+        FormField.objects.create(form=cls.form, field_name="payslip", field_type="file_upload", label="Payslip", order=1)
+
+    def setUp(self):
+        cache.clear()
+        self.mediaRoot = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.mediaRoot)
+        settingsOverride = override_settings(MEDIA_ROOT=self.mediaRoot, UPLOAD_STAGING_DIR=os.path.join(self.mediaRoot, 'staging'))
+        settingsOverride.enable()
+        self.addCleanup(settingsOverride.disable)
+
+    def submit(self, clientIdentifier, content):
+        response = self.client.post(CLIENT_SUBMISSION_URL, {
+            'formSlug': 'blob-form',
+            'submissionData': json.dumps({'clientIdentifier': clientIdentifier}),
+            'payslip': SimpleUploadedFile(f'{clientIdentifier}.pdf', content, content_type='application/pdf'),
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        return FormSubmission.objects.get(id=response.data['submissionId'])
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(os.path.join(self.mediaRoot, 'form_uploads')) for name in names]
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.submit('BLOB-1', b'same payslip')
+        second = self.submit('BLOB-2', b'same payslip')
+        self.submit('BLOB-3', b'another payslip')
+
+        firstAttachment = first.attachments.get()
+        self.assertEqual(firstAttachment.file.name, second.attachments.get().file.name)
+        self.assertEqual(StoredBlob.objects.get(sha256=hashlib.sha256(b'same payslip').hexdigest()).ref_count, 2)
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_chunked_upload_of_stored_content_is_not_written_again(self):
+        self.submit('BLOB-1', b'scan bytes')
+
+        started = self.client.post(UPLOAD_URL, {
+            'formSlug': 'blob-form', 'fieldName': 'payslip', 'filename': 'scan.pdf', 'contentType': 'application/pdf', 'size': 10,
+        }, format='json')
+        response = self.client.generic(
+            'PATCH', UPLOAD_DETAIL_URL(started.data['uploadId']), b'scan bytes',
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0'
+        )
+
+        self.assertTrue(response.data['complete'])
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_collect_blobs_removes_only_unreferenced_content(self):
+        kept = self.submit('BLOB-1', b'kept')
+        dropped = self.submit('BLOB-2', b'dropped')
+        droppedName = dropped.attachments.get().file.name
+
+        # A cascading delete skips FileAttachment.delete(); the collector recounts references itself
+        dropped.delete()
+        call_command('collect_blobs', '--grace-hours=0', stdout=io.StringIO())
+
+        self.assertFalse(StoredBlob.objects.filter(sha256=hashlib.sha256(b'dropped').hexdigest()).exists())
+        self.assertFalse(os.path.exists(os.path.join(self.mediaRoot, droppedName)))
+        self.assertEqual(StoredBlob.objects.get(sha256=hashlib.sha256(b'kept').hexdigest()).ref_count, 1)
+        with kept.attachments.get().file.open('rb') as stored:
+            self.assertEqual(stored.read(), b'kept')
+
+    def test_recently_stored_blobs_survive_collection(self):
+        self.submit('BLOB-1', b'fresh').delete()
+
+        call_command('collect_blobs', stdout=io.StringIO())
+
+        self.assertEqual(StoredBlob.objects.get(sha256=hashlib.sha256(b'fresh').hexdigest()).ref_count, 0)
+
+    def test_content_written_concurrently_is_stored_once_under_its_hash(self):
+        first = self.submit('BLOB-1', b'racing payslip')
+        StoredBlob.objects.all().delete()
+
+        # Another request stored the same content between this request's existence check and its write
+        realExists = default_storage.exists
+        checks = []
+
+        def exists(name):
+            checks.append(name)
+            return False if len(checks) == 1 else realExists(name)
+
+        with mock.patch.object(default_storage, 'exists', side_effect=exists):
+            second = self.submit('BLOB-2', b'racing payslip')
+
+        self.assertEqual(second.attachments.get().file.name, first.attachments.get().file.name)
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(StoredBlob.objects.get().file.name, first.attachments.get().file.name)
+
+    def test_storing_known_content_keeps_it_from_collection(self):
+        sha256 = hashlib.sha256(b'old payslip').hexdigest()
+        self.submit('BLOB-1', b'old payslip').delete()
+        StoredBlob.objects.filter(sha256=sha256).update(last_seen_at=timezone.now() - datetime.timedelta(days=2))
+
+        # Touched before the existence check, so a collection starting now leaves it alone
+        self.assertEqual(store_blob(io.BytesIO(b'old payslip'), sha256, 11), blob_name(sha256))
+        self.assertEqual(collect_garbage(graceHours=1), (0, 0))
+        self.assertEqual(len(self.stored_files()), 1)
+
+
+BATCH_URL = reverse('client-submission-batch')
+
+
+class ClientSubmissionBatchTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kycForm = Form.objects.create(name="Batch KYC", slug="batch-kyc", is_active=True, notification_mode='digest')
+        FormField.objects.create(form=cls.kycForm, field_name="fullName", field_type="text", label="Full Name", is_required=True, order=1)
+        FormField.objects.create(form=cls.kycForm, field_name="income", field_type="number", label="Income", order=2)
+
+        cls.loanForm = Form.objects.create(name="Batch Loan", slug="batch-loan", is_active=True)
+        FormField.objects.create(form=cls.loanForm, field_name="amount", field_type="number", label="Amount", is_required=True, order=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def item(self, slug, clientIdentifier, **values):
+        return {'formSlug': slug, 'submissionData': {'clientIdentifier': clientIdentifier, **values}}
+
+    def test_json_array_for_several_forms_returns_per_item_results(self):
+        items = [
+            self.item('batch-kyc', 'B-1', fullName='Ann', income='5000'),
+            self.item('batch-kyc', 'B-2', income='abc'),
+            self.item('batch-loan', 'B-3', amount='120000'),
+            self.item('missing-form', 'B-4'),
+        ]
+
+        with mock.patch.object(sendAdminNotification, 'apply_async'):
+            response = self.client.post(BATCH_URL, items, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 400, 201, 400])
+        self.assertIn('fullName', results[1]['errors'])
+        self.assertIn('formSlug', results[3]['errors'])
+
+        first = FormSubmission.objects.get(id=results[0]['submissionId'])
+        self.assertEqual(first.form, self.kycForm)
+        self.assertEqual(first.get_submission_data(), {'fullName': 'Ann', 'income': '5000'})
+        self.assertEqual(FormSubmission.objects.get(id=results[2]['submissionId']).data_entries.get().value, '120000')
+
+        # Only the immediate-mode form queues a notification
+        self.assertEqual(NotificationOutbox.objects.filter(submission_id=results[2]['submissionId']).count(), 1)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_ndjson_stream_reports_unparseable_lines(self):
+        body = '\n'.join([
+            json.dumps(self.item('batch-kyc', 'N-1', fullName='Ann')),
+            '{not json',
+            '',
+            json.dumps(self.item('batch-kyc', 'N-2', fullName='Bob')),
+        ]) + '\n'
+
+        response = self.client.generic('POST', BATCH_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 400, 201])
+        self.assertEqual(
+            set(FormSubmission.objects.values_list('client_identifier', flat=True)),
+            {'N-1', 'N-2'}
+        )
+
+    def test_batch_writes_use_grouped_inserts(self):
+        def batch(prefix, size):
+            return [self.item('batch-kyc', f'{prefix}-{i}', fullName=f'Client {i}', income=str(i)) for i in range(size)]
+
+        # Warm the compiled schema, then compare a small and a large batch
+        self.client.post(BATCH_URL, batch('W', 1), format='json')
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(BATCH_URL, batch('S', 2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(BATCH_URL, batch('L', 50), format='json')
+
+        self.assertEqual(response.data['created'], 50)
+        self.assertEqual(len(small), len(large))
+
+    def test_oversized_and_malformed_bodies_are_rejected(self):
+        self.assertEqual(self.client.post(BATCH_URL, {'formSlug': 'batch-kyc'}, format='json').status_code, 400)
+
+        with override_settings(SUBMISSION_BATCH_MAX_ITEMS=2):
+            items = [self.item('batch-kyc', f'X-{i}', fullName='X') for i in range(3)]
+            self.assertEqual(self.client.post(BATCH_URL, items, format='json').status_code, 400)
+
+        # Byte limits apply before parsing: the whole body, and each NDJSON line
+        items = [self.item('batch-kyc', f'B-{i}', fullName='B' * 100) for i in range(5)]
+        with override_settings(SUBMISSION_BATCH_MAX_BYTES=200):
+            self.assertEqual(self.client.post(BATCH_URL, items, format='json').status_code, 413)
+
+        body = '\n'.join(json.dumps(item) for item in items) + '\n'
+        with override_settings(SUBMISSION_BATCH_MAX_LINE_BYTES=100):
+            response = self.client.generic('POST', BATCH_URL, body, content_type='application/x-ndjson')
+            self.assertEqual(response.status_code, 413)
+
+        self.assertFalse(FormSubmission.objects.exists())
+
+    def test_bodies_without_a_content_length_are_bounded_while_read(self):
+        items = [self.item('batch-kyc', f'C-{i}', fullName='C' * 100) for i in range(5)]
+        bodies = {
+            'application/json': json.dumps(items).encode(),
+            'application/x-ndjson': ('\n'.join(json.dumps(item) for item in items) + '\n').encode(),
+        }
+
+        for contentType, body in bodies.items():
+            # A chunked request: no Content-Length, the stream simply runs on
+            request = SimpleNamespace(META={}, stream=io.BytesIO(body), content_type=contentType)
+            with override_settings(SUBMISSION_BATCH_MAX_BYTES=200):
+                with self.assertRaises(BatchTooLarge):
+                    read_batch_items(request, 10)
+
+            request = SimpleNamespace(META={}, stream=io.BytesIO(body), content_type=contentType)
+            self.assertEqual(len(read_batch_items(request, 10)), 5)
+
+
+ASYNC_LIST_URL = reverse('client-async-form-list')
+ASYNC_DETAIL_URL = lambda slug: reverse('client-async-form-detail', kwargs={'slug': slug})
+ASYNC_SUBMISSION_URL = reverse('client-async-submission')
+
+
+class AsyncClientViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = Form.objects.create(name="Async KYC", slug="async-kyc", is_active=True, notification_mode='digest')
+        FormField.objects.create(form=cls.form, field_name="fullName", field_type="text", label="Full Name", is_required=True, order=1)
+        FormField.objects.create(form=cls.form, field_name="income", field_type="number", label="Income", order=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+
+    async def test_form_list_and_detail_match_sync_views_and_honour_etags(self):
+        response = await self.client.get(ASYNC_LIST_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([form['slug'] for form in response.json()], ['async-kyc'])
+
+        syncResponse = await self.client.get(CLIENT_LIST_URL)
+        self.assertEqual(response['ETag'], syncResponse['ETag'])
+
+        notModified = await self.client.get(ASYNC_LIST_URL, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(notModified.status_code, 304)
+
+        detail = await self.client.get(ASYNC_DETAIL_URL('async-kyc'))
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual([field['field_name'] for field in detail.json()['fields']], ['fullName', 'income'])
+
+        notModified = await self.client.get(ASYNC_DETAIL_URL('async-kyc'), headers={'If-None-Match': detail['ETag']})
+        self.assertEqual(notModified.status_code, 304)
+
+        self.assertEqual((await self.client.get(ASYNC_DETAIL_URL('missing-form'))).status_code, 404)
+
+    async def test_valid_submission_is_saved(self):
+        payload = {'formSlug': 'async-kyc', 'submissionData': {'clientIdentifier': 'A-1', 'fullName': 'Ann', 'income': '5000'}}
+
+        response = await self.client.post(ASYNC_SUBMISSION_URL, payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        submission = await FormSubmission.objects.select_related('form').aget(id=response.json()['submissionId'])
+        self.assertEqual(submission.form_id, self.form.id)
+        self.assertEqual(submission.client_identifier, 'A-1')
+
+    async def test_multipart_submission_is_saved(self):
+        payload = {'formSlug': 'async-kyc', 'submissionData': json.dumps({'clientIdentifier': 'A-MP', 'fullName': 'Ann'})}
+
+        response = await self.client.post(ASYNC_SUBMISSION_URL, payload)
+
+        self.assertEqual(response.status_code, 201, response.json())
+        self.assertTrue(await FormSubmission.objects.filter(client_identifier='A-MP').aexists())
+
+    async def test_invalid_submission_returns_errors(self):
+        payload = {'formSlug': 'async-kyc', 'submissionData': {'clientIdentifier': 'A-2', 'income': 'abc'}}
+
+        response = await self.client.post(ASYNC_SUBMISSION_URL, payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fullName', response.json())
+        self.assertFalse(await FormSubmission.objects.aexists())
+
+    async def test_retry_with_idempotency_key_is_replayed(self):
+        payload = {'formSlug': 'async-kyc', 'submissionData': {'clientIdentifier': 'A-3', 'fullName': 'Ann'}}
+        headers = {'Idempotency-Key': 'async-retry-1'}
+
+        first = await self.client.post(ASYNC_SUBMISSION_URL, payload, content_type='application/json', headers=headers)
+        retry = await self.client.post(ASYNC_SUBMISSION_URL, payload, content_type='application/json', headers=headers)
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(await FormSubmission.objects.acount(), 1)
+
+
+class ClientSubmissionIdempotencyTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = Form.objects.create(name="Idempotent Loan", slug="idempotent-loan", is_active=True)
+        FormField.objects.create(form=cls.form, field_name="amount", field_type="number", label="Amount", is_required=True, order=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, key, clientIdentifier='I-1', amount='1000'):
+        payload = {'formSlug': 'idempotent-loan', 'submissionData': {'clientIdentifier': clientIdentifier, 'amount': amount}}
+        with mock.patch.object(sendAdminNotification, 'apply_async'):
+            return self.client.post(CLIENT_SUBMISSION_URL, payload, format='json', headers={'Idempotency-Key': key})
+
+    def test_retry_replays_the_stored_response_without_writing(self):
+        first = self.submit('retry-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.submit('retry-1')
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(queries), 0)
+
+        self.assertEqual(FormSubmission.objects.count(), 1)
+        self.assertEqual(SubmissionData.objects.count(), 1)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+        # A new key is a new submission
+        self.assertNotEqual(self.submit('retry-2').data['submissionId'], first.data['submissionId'])
+
+    def test_replay_falls_back_to_the_database_when_the_cache_is_cold(self):
+        first = self.submit('cold-1')
+        cache.clear()
+
+        retry = self.submit('cold-1')
+
+        self.assertEqual(retry.data['submissionId'], first.data['submissionId'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+    def test_reused_key_with_a_different_payload_is_rejected(self):
+        self.submit('reused-1')
+
+        response = self.submit('reused-1', amount='2000')
+        self.assertEqual(response.status_code, 422)
+
+        cache.clear()
+        self.assertEqual(self.submit('reused-1', amount='2000').status_code, 422)
+        self.assertEqual(FormSubmission.objects.get().get_submission_data(), {'amount': '1000'})
+
+    def test_keys_are_scoped_to_the_form(self):
+        otherForm = Form.objects.create(name="Other Loan", slug="other-loan", is_active=True)
+        FormField.objects.create(form=otherForm, field_name="amount", field_type="number", label="Amount", order=1)
+
+        first = self.submit('shared-1')
+        payload = {'formSlug': 'other-loan', 'submissionData': {'clientIdentifier': 'I-1', 'amount': '1000'}}
+        with mock.patch.object(sendAdminNotification, 'apply_async'):
+            other = self.client.post(CLIENT_SUBMISSION_URL, payload, format='json', headers={'Idempotency-Key': 'shared-1'})
+
+        self.assertEqual(other.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', other)
+        self.assertNotEqual(other.data['submissionId'], first.data['submissionId'])
+
+    def test_concurrent_duplicate_is_answered_with_the_winning_submission(self):
+        winner = FormSubmission.objects.create(form=self.form, client_identifier='I-1', idempotency_key='race-1')
+
+        # The duplicate passes the replay check before the winner commits, then hits the unique constraint
+        with mock.patch('form_builder.views.find_replay', return_value=None):
+            response = self.submit('race-1')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['submissionId'], winner.id)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+        self.assertFalse(SubmissionData.objects.exists())
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_invalid_key_and_failed_validation_are_not_stored(self):
+        self.assertEqual(self.submit('x' * 256).status_code, 400)
+
+        self.assertEqual(self.submit('invalid-1', amount='abc').status_code, 400)
+        fixed = self.submit('invalid-1')
+
+        self.assertEqual(fixed.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', fixed)
+
+
+STATS_URL = lambda slug: reverse('form-admin-stats', kwargs={'slug': slug})
+
+
+@override_settings(FORM_STATS_SETTLE_SECONDS=0)
+class FormStatsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(username='statsadmin', password='adminpassword', email='stats@example.com')
+
+        cls.form = Form.objects.create(name="Stats Loan", slug="stats-loan", is_active=True)
+        FormField.objects.create(form=cls.form, field_name="product", field_type="dropdown", label="Product", order=1)
+        FormField.objects.create(form=cls.form, field_name="amount", field_type="number", label="Amount", order=2)
+
+        cls.otherForm = Form.objects.create(name="Stats Other", slug="stats-other", is_active=True)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.superuser)
+
+    def submit(self, form, product=None, amount='100', is_notified=False):
+        submission = FormSubmission.objects.create(form=form, client_identifier='S', is_notified=is_notified)
+        SubmissionData.objects.create(submission=submission, field_name='amount', value=amount)
+        if product:
+            SubmissionData.objects.create(submission=submission, field_name='product', value=product)
+        return submission
+
+    def test_stats_are_counted_incrementally(self):
+        self.submit(self.form, 'mortgage')
+        self.submit(self.form, 'mortgage', is_notified=True)
+        old = self.submit(self.form, 'auto', is_notified=True)
+        FormSubmission.objects.filter(id=old.id).update(submission_date=timezone.now() - datetime.timedelta(days=40))
+        self.submit(self.otherForm)
+
+        self.assertEqual(refresh_form_stats(), 4)
+
+        response = self.client.get(STATS_URL('stats-loan'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_submissions'], 3)
+        self.assertEqual(response.data['pending_notifications'], 1)
+        self.assertEqual(response.data['daily_submissions'], [{'day': timezone.localdate(), 'submissions': 2}])
+        self.assertEqual(response.data['value_distributions'], {'product': {'mortgage': 2, 'auto': 1}})
+
+        self.assertEqual(len(self.client.get(STATS_URL('stats-loan'), {'days': 60}).data['daily_submissions']), 2)
+
+        # Only the new submission is counted by the next run
+        self.submit(self.form, 'auto')
+        self.assertEqual(refresh_form_stats(), 1)
+        self.assertEqual(refresh_form_stats(), 0)
+
+        response = self.client.get(STATS_URL('stats-loan'))
+        self.assertEqual(response.data['total_submissions'], 4)
+        self.assertEqual(response.data['pending_notifications'], 2)
+        self.assertEqual(response.data['value_distributions'], {'product': {'auto': 2, 'mortgage': 2}})
+
+    def test_endpoint_reads_only_the_rollups(self):
+        for _ in range(5):
+            self.submit(self.form, 'mortgage')
+        refresh_form_stats()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(STATS_URL('stats-loan'))
+
+        self.assertEqual(response.data['total_submissions'], 5)
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('form_builder_submissiondata', tables)
+        self.assertNotIn('form_builder_formsubmission', tables)
+
+    def test_rebuild_drops_deleted_submissions(self):
+        first = self.submit(self.form, 'mortgage')
+        self.submit(self.form, 'auto')
+        refresh_form_stats()
+
+        first.delete()
+        call_command('rebuild_form_stats', stdout=io.StringIO())
+
+        response = self.client.get(STATS_URL('stats-loan'))
+        self.assertEqual(response.data['total_submissions'], 1)
+        self.assertEqual(response.data['value_distributions'], {'product': {'auto': 1}})
+
+    def test_days_is_validated_and_admin_only(self):
+        self.assertEqual(self.client.get(STATS_URL('stats-loan'), {'days': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(STATS_URL('stats-loan'), {'days': 0}).status_code, 400)
+
+        # Never refreshed: zeros instead of an error
+        response = self.client.get(STATS_URL('stats-other'))
+        self.assertEqual((response.data['total_submissions'], response.data['refreshed_at']), (0, None))
+
+        self.client.force_authenticate(user=None)
+        self.assertIn(self.client.get(STATS_URL('stats-loan')).status_code, (401, 403))
+
+
+class AdminSubmissionFieldValueFilterTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(username='valuefilter', password='adminpassword', email='values@example.com')
+
+        cls.form = Form.objects.create(name="Typed Loan", slug="typed-loan", is_active=True, notification_mode='digest')
+        FormField.objects.create(form=cls.form, field_name="loanAmount", field_type="number", label="Loan Amount", order=1)
+        FormField.objects.create(form=cls.form, field_name="startDate", field_type="date", label="Start Date", order=2)
+        FormField.objects.create(form=cls.form, field_name="agreed", field_type="checkbox", label="Agreed", order=3)
+        FormField.objects.create(form=cls.form, field_name="product", field_type="dropdown", label="Product", order=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, clientIdentifier, **values):
+        payload = {'formSlug': 'typed-loan', 'submissionData': {'clientIdentifier': clientIdentifier, **values}}
+        response = self.client.post(CLIENT_SUBMISSION_URL, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['submissionId']
+
+    def filter(self, **params):
+        self.client.force_authenticate(user=self.superuser)
+        response = self.client.get(SUBMISSION_LIST_URL, {f'field.{key}': value for key, value in params.items()})
+        self.client.force_authenticate(user=None)
+        return response
+
+    def ids(self, **params):
+        response = self.filter(**params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(row['id'] for row in response.data['rows'])
+
+    def test_typed_columns_are_written_with_the_submission(self):
+        submissionId = self.submit('T-1', loanAmount='250000', startDate='2026-03-01', agreed='true', product='mortgage')
+
+        rows = {row.field_name: row for row in SubmissionData.objects.filter(submission_id=submissionId)}
+        self.assertEqual(rows['loanAmount'].value_num, 250000)
+        self.assertEqual(rows['startDate'].value_date, datetime.date(2026, 3, 1))
+        self.assertIs(rows['agreed'].value_bool, True)
+        self.assertEqual((rows['product'].value_num, rows['product'].value_date, rows['product'].value_bool), (None, None, None))
+
+    def test_filters_compare_typed_values(self):
+        small = self.submit('T-1', loanAmount='90000', startDate='2026-01-15', agreed='false', product='auto')
+        large = self.submit('T-2', loanAmount='250000', startDate='2026-03-01', agreed='true', product='mortgage')
+        # Numerically larger, though smaller as text
+        huge = self.submit('T-3', loanAmount='1000000', startDate='2026-02-10', agreed='true', product='mortgage')
+
+        self.assertEqual(self.ids(loanAmount__gt='100000'), sorted([large, huge]))
+        self.assertEqual(self.ids(loanAmount__lte='250000'), sorted([small, large]))
+        self.assertEqual(self.ids(loanAmount='90000'), [small])
+        self.assertEqual(self.ids(startDate__gte='2026-02-01', startDate__lt='2026-03-01'), [huge])
+        self.assertEqual(self.ids(agreed='true', product='mortgage'), sorted([large, huge]))
+
+    def test_changing_a_field_type_retypes_its_stored_values(self):
+        submissionId = self.submit('T-1', loanAmount='90000', product='2026-05-01')
+
+        fields = [
+            {'id': field.id, 'field_name': field.field_name, 'field_type': field.field_type, 'label': field.label, 'order': field.order}
+            for field in self.form.fields.all()
+        ]
+        newTypes = {'loanAmount': 'text', 'product': 'date'}
+        for field in fields:
+            field['field_type'] = newTypes.get(field['field_name'], field['field_type'])
+
+        serializer = FormSerializer(self.form, data={'name': self.form.name, 'slug': self.form.slug, 'fields': fields})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+
+        rows = {row.field_name: row for row in SubmissionData.objects.filter(submission_id=submissionId)}
+        self.assertIsNone(rows['loanAmount'].value_num)
+        self.assertEqual(rows['product'].value_date, datetime.date(2026, 5, 1))
+        self.assertEqual(self.ids(product__gte='2026-01-01'), [submissionId])
+
+    def test_filter_uses_the_typed_column(self):
+        self.submit('T-1', loanAmount='90000')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.filter(loanAmount__gt='100000')
+
+        self.assertTrue(any('value_num' in query['sql'] for query in queries))
+
+    def test_invalid_filters_are_rejected(self):
+        self.assertEqual(self.filter(loanAmount__gt='lots').status_code, 400)
+        self.assertEqual(self.filter(loanAmount__contains='1').status_code, 400)
+        self.assertEqual(self.filter(product__gt='a').status_code, 400)
+        self.assertEqual(self.filter(unknownField='1').status_code, 400)
+
+
+ARCHIVE_LIST_URL = reverse('archive-admin-list')
+ARCHIVE_REHYDRATE_URL = lambda pk: reverse('archive-admin-rehydrate', kwargs={'pk': pk})
+
+
+class SubmissionArchivalTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(username='archivist', password='adminpassword', email='archive@example.com')
+
+        cls.form = Form.objects.create(name="Archived Loan", slug="archived-loan", is_active=True, notification_mode='digest', archive_after_days=30)
+        FormField.objects.create(form=cls.form, field_name="amount", field_type="number", label="Amount", order=1)
+        FormField.objects.create(form=cls.form, field_name="payslip", field_type="file_upload", label="Payslip", order=2)
+
+        cls.keptForm = Form.objects.create(name="Kept Loan", slug="kept-loan", is_active=True, notification_mode='digest')
+        FormField.objects.create(form=cls.keptForm, field_name="amount", field_type="number", label="Amount", order=1)
+
+    def setUp(self):
+        cache.clear()
+        self.mediaRoot = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.mediaRoot)
+        settingsOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        settingsOverride.enable()
+        self.addCleanup(settingsOverride.disable)
+
+    def submit(self, slug, clientIdentifier, daysAgo, payslip=None):
+        payload = {'formSlug': slug, 'submissionData': json.dumps({'clientIdentifier': clientIdentifier, 'amount': '5000'})}
+        if payslip is not None:
+            payload['payslip'] = SimpleUploadedFile('payslip.pdf', payslip, content_type='application/pdf')
+
+        response = self.client.post(CLIENT_SUBMISSION_URL, payload)
+        self.assertEqual(response.status_code, 201, response.data)
+
+        submissionDate = timezone.now() - datetime.timedelta(days=daysAgo)
+        FormSubmission.objects.filter(id=response.data['submissionId']).update(submission_date=submissionDate)
+        return response.data['submissionId'], submissionDate
+
+    def test_rehydrate_drops_idempotency_keys_reused_since_archival(self):
+        def submit(clientIdentifier, key):
+            payload = {'formSlug': 'archived-loan', 'submissionData': {'clientIdentifier': clientIdentifier, 'amount': '5000'}}
+            response = self.client.post(CLIENT_SUBMISSION_URL, payload, format='json', headers={'Idempotency-Key': key})
+            self.assertEqual(response.status_code, 201, response.data)
+            return response.data['submissionId']
+
+        oldId = submit('OLD-KEY', 'reused-key')
+        keptKeyId = submit('OLD-OWN-KEY', 'own-key')
+        FormSubmission.objects.filter(id__in=[oldId, keptKeyId]).update(submission_date=timezone.now() - datetime.timedelta(days=90))
+        call_command('archive_submissions', stdout=io.StringIO())
+
+        cache.clear()
+        newId = submit('NEW-KEY', 'reused-key')
+
+        Form.objects.filter(id=self.form.id).update(archive_after_days=200)
+        self.client.force_authenticate(user=self.superuser)
+        response = self.client.post(ARCHIVE_REHYDRATE_URL(SubmissionArchive.objects.get().id))
+        self.assertEqual(response.status_code, 200, response.data)
+
+        self.assertIsNone(FormSubmission.objects.get(id=oldId).idempotency_key)
+        self.assertEqual(FormSubmission.objects.get(id=keptKeyId).idempotency_key, 'own-key')
+        self.assertEqual(FormSubmission.objects.get(id=newId).idempotency_key, 'reused-key')
+
+    def test_old_months_are_archived_and_rehydrated(self):
+        oldId, oldDate = self.submit('archived-loan', 'OLD-1', 90, payslip=b'%PDF-1.4 old payslip')
+        self.submit('archived-loan', 'OLD-2', 90)
+        recentId, _ = self.submit('archived-loan', 'NEW-1', 0)
+        keptId, _ = self.submit('kept-loan', 'KEPT-1', 400)
+
+        call_command('archive_submissions', stdout=io.StringIO())
+
+        # Only the old months of the form with a retention window left the live tables
+        self.assertEqual(set(FormSubmission.objects.values_list('id', flat=True)), {recentId, keptId})
+        self.assertFalse(FileAttachment.objects.exists())
+
+        archive = SubmissionArchive.objects.get()
+        self.assertEqual(archive.submission_count, 2)
+        self.assertIn(archive.compression, ('zstd', 'gzip'))
+        self.assertTrue(os.path.exists(os.path.join(self.mediaRoot, archive.file.name)))
+
+        # The archived attachment still references its blob
+        blob = StoredBlob.objects.get()
+        self.assertEqual(collect_garbage(graceHours=0), (0, 0))
+
+        self.client.force_authenticate(user=self.superuser)
+        listing = self.client.get(ARCHIVE_LIST_URL, {'form': 'archived-loan'})
+        self.assertEqual([row['id'] for row in listing.data['rows']], [archive.id])
+
+        # Rehydrated submissions would be archived again by the next run: the window must be extended first
+        self.assertEqual(self.client.post(ARCHIVE_REHYDRATE_URL(archive.id)).status_code, 400)
+        Form.objects.filter(id=self.form.id).update(archive_after_days=200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(ARCHIVE_REHYDRATE_URL(archive.id))
+
+        self.assertEqual(response.data, {'rehydrated': 2})
+        call_command('archive_submissions', stdout=io.StringIO())
+        self.assertFalse(SubmissionArchive.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.mediaRoot, archive.file.name)))
+
+        restored = FormSubmission.objects.get(id=oldId)
+        self.assertEqual(restored.submission_date, oldDate)
+        self.assertEqual(restored.get_submission_data(), {'amount': '5000'})
+        self.assertEqual(restored.data_entries.get().value_num, 5000)
+        self.assertEqual(restored.attachments.get().sha256, blob.sha256)
+        self.assertEqual(self.client.get(SUBMISSION_LIST_URL, {'q': 'OLD-1'}).data['rows'][0]['id'], oldId)
+
+    def test_overlapping_runs_archive_a_month_once(self):
+        self.submit('archived-loan', 'OLD-1', 90)
+        submissionDate = FormSubmission.objects.get().submission_date
+        month = timezone.localtime(submissionDate).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        # The other run deletes the rows between this run's read and its delete
+        def write_then_race(lines, name):
+            written = write_archive_file(lines, name)
+            FormSubmission.objects.all().delete()
+            return written
+
+        with mock.patch('form_builder.archive.write_archive_file', write_then_race):
+            self.assertIsNone(archive_form_month(self.form, month))
+
+        self.assertFalse(SubmissionArchive.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.mediaRoot, 'form_archives', 'archived-loan')), [])
+
+    def test_dry_run_changes_nothing(self):
+        self.submit('archived-loan', 'OLD-1', 90)
+
+        output = io.StringIO()
+        call_command('archive_submissions', '--dry-run', stdout=output)
+
+        self.assertIn('Would archive 1 submissions', output.getvalue())
+        self.assertEqual(FormSubmission.objects.count(), 1)
+        self.assertFalse(SubmissionArchive.objects.exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReadReplicaRoutingTest(APITestCase):
+    # 'replica' is a second, independent SQLite database: rows created only there prove a read used it
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(username='replicaadmin', password='adminpassword', email='replica@example.com')
+
+        cls.primaryForm = Form.objects.create(name="Primary Form", slug="primary-form", is_active=True, notification_mode='digest')
+        FormField.objects.create(form=cls.primaryForm, field_name="amount", field_type="number", label="Amount", order=1)
+
+        cls.replicaForm = Form.objects.using('replica').create(name="Replica Form", slug="replica-form", is_active=True)
+        FormSubmission.objects.using('replica').create(form=cls.replicaForm, client_identifier='ON-REPLICA')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.superuser)
+
+    def admin_identifiers(self):
+        response = self.client.get(SUBMISSION_LIST_URL)
+        return [row['client_identifier'] for row in response.data['rows']]
+
+    def test_marked_views_read_from_the_replica(self):
+        self.assertEqual([form['slug'] for form in self.client.get(CLIENT_LIST_URL).data], ['replica-form'])
+        self.assertEqual(self.client.get(CLIENT_DETAIL_URL('replica-form')).status_code, 200)
+        self.assertEqual(self.admin_identifiers(), ['ON-REPLICA'])
+
+        with override_settings(DATABASE_REPLICAS=[]):
+            cache.clear()
+            self.assertEqual([form['slug'] for form in self.client.get(CLIENT_LIST_URL).data], ['primary-form'])
+
+    def test_reads_after_a_write_go_to_the_primary(self):
+        payload = {'formSlug': 'primary-form', 'submissionData': {'clientIdentifier': 'ON-PRIMARY', 'amount': '10'}}
+        response = self.client.post(CLIENT_SUBMISSION_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('db_primary_pin', response.cookies)
+        self.assertFalse(FormSubmission.objects.using('replica').filter(client_identifier='ON-PRIMARY').exists())
+
+        # The pinned client sees its own write
+        self.assertEqual(self.admin_identifiers(), ['ON-PRIMARY'])
+
+        self.client.cookies.pop('db_primary_pin')
+        self.assertEqual(self.admin_identifiers(), ['ON-REPLICA'])
+
+    def test_one_replica_is_picked_per_request(self):
+        with mock.patch('form_builder.replicas.random.choice', return_value='replica') as choice:
+            with CaptureQueriesContext(connections['replica']) as queries:
+                self.admin_identifiers()
+
+        self.assertGreater(len(queries), 1)
+        choice.assert_called_once_with(['replica'])
+
+    def test_asking_for_the_write_database_does_not_change_routing(self):
+        router = ReplicaRouter()
+        view = SimpleNamespace(cls=SimpleNamespace(use_read_replica=True))
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            self.assertEqual(router.db_for_write(Form), None)
+            self.assertEqual(router.db_for_read(Form), 'replica')
+
+            # An actual write pins the rest of the request to the primary
+            Form.objects.create(name="Written", slug="written-mid-request")
+            self.assertIsNone(router.db_for_read(Form))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        middleware(RequestFactory().get('/'))
+
+    def test_replicas_are_never_migrated(self):
+        router = ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica', 'form_builder'))
+        self.assertIsNone(router.allow_migrate('default', 'form_builder'))
+
+    def test_schema_cache_entries_built_from_a_replica_expire_early(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cacheSet:
+            self.client.get(CLIENT_LIST_URL)
+
+        self.assertIn(settings.DATABASE_REPLICA_CACHE_TIMEOUT, [call.args[2] for call in cacheSet.call_args_list])
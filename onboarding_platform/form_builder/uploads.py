@@ -0,0 +1,139 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .blobs import store_blob
+from .models import FileUpload
+
+
+# Bytes read from the request body / staging file at a time
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class UploadOffsetMismatch(Exception):
+    """The chunk does not start where the upload currently ends (the client must resume from there)."""
+
+    def __init__(self, expected):
+        super().__init__(f'Upload is at offset {expected}')
+        self.expected = expected
+
+
+class UploadTooLarge(Exception):
+    """The chunk would take the upload past its declared size."""
+
+
+class UploadAlreadyAttached(Exception):
+    """A concurrent submission attached one of the submitted uploads first."""
+
+
+def hash_file(file_object):
+    """SHA-256 hex digest of an uploaded file, read in chunks (the file is left rewound)."""
+    digest = hashlib.sha256()
+    for chunk in file_object.chunks(STREAM_BLOCK_SIZE):
+        digest.update(chunk)
+    file_object.seek(0)
+    return digest.hexdigest()
+
+
+def attached_upload_fields(uploads):
+    """The field names of {field_name: FileUpload} whose upload is attached to a submission by now."""
+    attached = set(
+        FileUpload.objects.filter(id__in=[upload.id for upload in uploads.values()], attachment__isnull=False)
+        .values_list('id', flat=True)
+    )
+    return [field_name for field_name, upload in uploads.items() if upload.id in attached]
+
+
+def staging_path(upload):
+    return Path(settings.UPLOAD_STAGING_DIR) / f'{upload.id}.part'
+
+
+def write_chunk(upload, offset, stream):
+    """
+    Appends the bytes of `stream` (the raw request body) to the upload's staging file,
+    STREAM_BLOCK_SIZE at a time, and finalizes the upload when it is complete.
+
+    The chunk is first streamed to a temporary file of its own. The offset is then claimed
+    with a conditional UPDATE, and only the request that claimed it appends its bytes to the
+    staging file, inside the claiming transaction (which holds the row lock until then). Of
+    two clients racing to send the same chunk only one writes; the other gets an
+    UploadOffsetMismatch.
+    """
+    if upload.is_complete or offset != upload.received_bytes:
+        raise UploadOffsetMismatch(upload.received_bytes)
+
+    remaining = upload.size - offset
+    path = staging_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryFile(dir=path.parent) as chunk:
+        written = 0
+        while True:
+            block = stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+
+            written += len(block)
+            if written > remaining:
+                raise UploadTooLarge()
+
+            chunk.write(block)
+
+        with transaction.atomic():
+            claimed = FileUpload.objects.filter(pk=upload.pk, received_bytes=offset, completed_at__isnull=True) \
+                .update(received_bytes=offset + written)
+            if not claimed:
+                upload.refresh_from_db(fields=['received_bytes', 'completed_at'])
+                raise UploadOffsetMismatch(upload.received_bytes)
+
+            # A failed write rolls the claim back, so the client can resend the chunk
+            chunk.seek(0)
+            with open(path, 'r+b' if path.exists() else 'wb') as part:
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part, STREAM_BLOCK_SIZE)
+                part.truncate()
+
+    upload.received_bytes = offset + written
+    if upload.received_bytes == upload.size:
+        finalize_upload(upload)
+
+    return upload
+
+
+def finalize_upload(upload):
+    """
+    Hashes the staged file and moves it into content-addressed storage (no write at all when
+    the same content is already stored), then marks the upload complete.
+    """
+    path = staging_path(upload)
+
+    with open(path, 'rb') as part:
+        content = File(part, name=upload.filename)
+        upload.sha256 = hash_file(content)
+        upload.file.name = store_blob(content, upload.sha256, upload.size)
+
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['file', 'sha256', 'completed_at'])
+
+    os.remove(path)
+    return upload
+
+
+def discard_upload(upload):
+    """
+    Deletes an upload with its staged bytes. Its stored content is a shared blob and is left
+    for collect_blobs, which removes it once nothing references it.
+    """
+    try:
+        os.remove(staging_path(upload))
+    except FileNotFoundError:
+        pass
+
+    upload.delete()
@@ -6,14 +6,21 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     FormAdminViewSet,
     ClientSubmissionAPIView,
+    ClientSubmissionBatchView,
     ClientFormListView,
     ClientFormDetailView,
+    ClientUploadView,
+    ClientUploadDetailView,
     AdminSubmissionViewSet,
+    AdminSubmissionArchiveViewSet,
+    MetricsView,
 )
+from .async_views import AsyncClientFormListView, AsyncClientFormDetailView, AsyncClientSubmissionView
 
 router = DefaultRouter()
 router.register(r'forms', FormAdminViewSet, basename='form-admin')
 router.register(r'submissions', AdminSubmissionViewSet, basename='submission-admin')
+router.register(r'archives', AdminSubmissionArchiveViewSet, basename='archive-admin')
 
 
 urlpatterns = [
@@ -22,12 +29,21 @@ urlpatterns = [
     # ADMIN API ENDPOINTS (Includes forms and submissions routes)
     # =====================================================================
     path('admin/', include(router.urls)), # Forms and Submissions are now under /api/admin/
+    path('admin/metrics/', MetricsView.as_view(), name='admin-metrics'),
 
 
     # =====================================================================
     # CLIENT API ENDPOINTS
     # =====================================================================
     path('client/submissions/', ClientSubmissionAPIView.as_view(), name='client-submission'),
+    path('client/submissions/batch/', ClientSubmissionBatchView.as_view(), name='client-submission-batch'),
+    path('client/uploads/', ClientUploadView.as_view(), name='client-upload'),
+    path('client/uploads/<uuid:uploadId>/', ClientUploadDetailView.as_view(), name='client-upload-detail'),
     path('client/forms/', ClientFormListView.as_view(), name='client-form-list'),
     path('client/forms/<str:slug>/', ClientFormDetailView.as_view(), name='client-form-detail'),
+
+    # Async variants for ASGI deployments (same payloads as the views above)
+    path('client/async/submissions/', AsyncClientSubmissionView.as_view(), name='client-async-submission'),
+    path('client/async/forms/', AsyncClientFormListView.as_view(), name='client-async-form-list'),
+    path('client/async/forms/<str:slug>/', AsyncClientFormDetailView.as_view(), name='client-async-form-detail'),
 ]
\ No newline at end of file
@@ -0,0 +1,179 @@
+import operator
+import os
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .field_values import TYPED_COLUMNS
+
+
+# Comparison operators supported by a field's configuration['dependency']['condition']
+DEPENDENCY_OPERATORS = {
+    '>': operator.gt,
+    '<': operator.lt,
+}
+
+
+class ValidationPlan:
+    """
+    Compiled, database-free version of a Form's validation rules.
+
+    Built once per form version by compile_validation_plan() and cached by schema_cache,
+    so DynamicSubmissionSerializer.validate() can check a submission without querying
+    Form/FormField or re-parsing every field's configuration.
+    """
+    __slots__ = ('form_id', 'form_name', 'notification_mode', 'rules', 'file_rules', 'field_types')
+
+    def __init__(self, form_id, form_name, notification_mode, rules, file_rules=None, field_types=None):
+        self.form_id = form_id
+        self.form_name = form_name
+        self.notification_mode = notification_mode
+
+        # One tuple per field, in display order:
+        # (field_name, label, check_required, check_number, dependency)
+        # where dependency is None or (target_field, compare, threshold)
+        self.rules = rules
+
+        # Upload limits of the file_upload fields: {field_name: (label, max_size, allowed_types)}
+        self.file_rules = file_rules or {}
+
+        # Types of the fields stored in a typed SubmissionData column: {field_name: field_type}
+        self.field_types = field_types or {}
+
+    def validate(self, flattenedData):
+        """Raises a ValidationError for the first field that breaks its rules."""
+        for field_name, label, check_required, check_number, dependency in self.rules:
+            value = flattenedData.get(field_name)
+
+            # Check 1: Required Fields
+            if check_required and not value:
+                raise serializers.ValidationError({field_name: f"{label} is required"})
+
+            # Check 2: Conditional Validation (Dependency Check)
+            if dependency is not None and not value:
+                target_field_name, compare, threshold = dependency
+                target_value = flattenedData.get(target_field_name)
+
+                try:
+                    target_num = float(target_value) if target_value is not None and target_value != '' else 0.0
+                except (TypeError, ValueError):
+                    target_num = None
+
+                if target_num is not None and compare(target_num, threshold):
+                    raise serializers.ValidationError({field_name: f"{label} is required because '{target_field_name}' condition was met."})
+
+            # Check 3: Basic Type Validation
+            if check_number and value and not str(value).isdigit():
+                raise serializers.ValidationError({field_name: "Must be a valid number"})
+
+        # Check 4: Size and type of files uploaded with the request (uploads referenced by ID
+        # were checked when they were started). Files are only accepted for file_upload fields.
+        for field_name, value in flattenedData.items():
+            if not hasattr(value, 'size'):
+                continue
+            if field_name not in self.file_rules:
+                raise serializers.ValidationError({field_name: "Files can only be uploaded to file upload fields"})
+            self.check_file(field_name, value.name, getattr(value, 'content_type', ''), value.size)
+
+    def check_file(self, field_name, filename, content_type, size):
+        """Raises a ValidationError if a file is too large or of a type the field does not accept."""
+        label, max_size, allowed_types = self.file_rules[field_name]
+
+        if size > max_size:
+            raise serializers.ValidationError({field_name: f"{label} must be at most {max_size} bytes"})
+
+        if not file_type_allowed(allowed_types, filename, content_type):
+            raise serializers.ValidationError({field_name: f"{label} must be one of: {', '.join(allowed_types)}"})
+
+
+def file_type_allowed(allowed_types, filename, content_type):
+    """
+    Matches a file against a field's configuration['allowed_types'], whose entries are MIME
+    types ('application/pdf'), MIME wildcards ('image/*') or extensions ('.pdf').
+    An empty list accepts everything.
+    """
+    if not allowed_types:
+        return True
+
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    extension = os.path.splitext(filename or '')[1].lower()
+
+    for allowed in allowed_types:
+        allowed = allowed.lower()
+        if allowed.startswith('.'):
+            if extension == allowed:
+                return True
+        elif allowed.endswith('/*'):
+            if content_type.startswith(allowed[:-1]):
+                return True
+        elif content_type == allowed:
+            return True
+
+    return False
+
+
+def compile_file_rule(field):
+    """(label, max_size, allowed_types) for a file_upload field's configuration."""
+    configuration = field.configuration or {}
+
+    try:
+        max_size = int(configuration.get('max_size') or settings.UPLOAD_MAX_SIZE)
+    except (TypeError, ValueError):
+        max_size = settings.UPLOAD_MAX_SIZE
+
+    return (field.label, max_size, tuple(configuration.get('allowed_types') or ()))
+
+
+def compile_dependency(configuration):
+    """
+    Turns a field's configuration['dependency'] dict into a (target_field, compare, threshold)
+    tuple, or None when the dependency can never be met (unknown condition, non-numeric value).
+    """
+    dependency = (configuration or {}).get('dependency')
+
+    if not dependency or not dependency.get('target_field') or dependency.get('action') != 'is_required':
+        return None
+
+    compare = DEPENDENCY_OPERATORS.get(dependency.get('condition'))
+    if compare is None:
+        return None
+
+    try:
+        threshold = float(dependency.get('value'))
+    except (TypeError, ValueError):
+        return None
+
+    return (dependency['target_field'], compare, threshold)
+
+
+def compile_validation_plan(form):
+    """
+    Builds a ValidationPlan from a Form. Use prefetch_related('fields') on the form
+    to keep this to the queries already spent loading it.
+    """
+    fields = form.fields.all()
+
+    rules = tuple(
+        (
+            field.field_name,
+            field.label,
+            field.is_required and field.field_type != 'file_upload',
+            field.field_type == 'number',
+            compile_dependency(field.configuration),
+        )
+        for field in fields
+    )
+
+    file_rules = {
+        field.field_name: compile_file_rule(field)
+        for field in fields
+        if field.field_type == 'file_upload'
+    }
+
+    field_types = {
+        field.field_name: field.field_type
+        for field in fields
+        if field.field_type in TYPED_COLUMNS
+    }
+
+    return ValidationPlan(form.id, form.name, form.notification_mode, rules, file_rules, field_types)
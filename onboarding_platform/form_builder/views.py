@@ -1,5 +1,13 @@
+import io
+import json
+
+from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
+from django.db.models import F, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 from rest_framework import generics
+from rest_framework.decorators import action
 from rest_framework import viewsets, status, permissions
 from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import AllowAny
@@ -7,11 +15,24 @@ from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.exceptions import NotFound
 
-from .models import Form, FormSubmission
-from .pagination import CustomPageNumberPagination
+from .archive import StillPastRetention, rehydrate_archive
+from .exports import EXPORT_FORMATS
+from .field_values import SubmissionFieldValueFilter
+from .idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER, IdempotencyKeyReused, InvalidIdempotencyKey, \
+    find_replay, get_idempotency_key, save_submission
+from .models import Form, FormSubmission, FileAttachment, FileUpload, SubmissionArchive
+from .pagination import CustomPageNumberPagination, KeysetPagination
+from .profiling import registry
+from .schema_cache import get_client_form_schema, get_client_form_list
+from .search import SubmissionFullTextFilter
+from .stats import get_form_stats
+from .task_results import render_task_result_metrics
 from .serializers import FormSerializer, DynamicSubmissionSerializer, ClientFormSummarySerializer, \
-    AdminSubmissionListSerializer, AdminSubmissionDetailSerializer, ClientFormDetailSerializer
+    AdminSubmissionListSerializer, AdminSubmissionDetailSerializer, ClientFormDetailSerializer, FileUploadSerializer, \
+    BatchItemError, save_submission_batch, AdminSubmissionArchiveSerializer
+from .uploads import UploadAlreadyAttached, UploadOffsetMismatch, UploadTooLarge, attached_upload_fields, write_chunk
 
 # =========================================================
 # 1. Admin API ViewSet (For Form Configuration)
@@ -30,6 +51,47 @@ class FormAdminViewSet(viewsets.ModelViewSet):
 
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
 
+    @action(detail=True, methods=['get'], url_path='export')
+    def export(self, request, slug=None):
+        """
+        Streams every submission of the form, one row per submission and one column
+        per FormField. Use ?exportFormat=csv (default) or ?exportFormat=ndjson.
+        """
+        form = self.get_object()
+
+        exportFormat = request.query_params.get('exportFormat', 'csv')
+        if exportFormat not in EXPORT_FORMATS:
+            return Response(
+                {'exportFormat': f"Unsupported export format. Choose one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        contentType, stream = EXPORT_FORMATS[exportFormat]
+        response = StreamingHttpResponse(stream(form), content_type=contentType)
+        response['Content-Disposition'] = f'attachment; filename="{form.slug}-submissions.{exportFormat}"'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='stats')
+    def stats(self, request, slug=None):
+        """
+        Dashboard numbers of the form from the precomputed rollups (tasks.refreshFormStats):
+        totals, notification backlog, daily counts for the last ?days= days and dropdown
+        value distributions. Never scans the submission tables.
+        """
+        form = self.get_object()
+
+        try:
+            days = int(request.query_params.get('days', settings.FORM_STATS_DEFAULT_DAYS))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= settings.FORM_STATS_MAX_DAYS:
+            return Response(
+                {'days': f'Must be a number of days between 1 and {settings.FORM_STATS_MAX_DAYS}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(get_form_stats(form, days))
+
 
 # =========================================================
 # 2. Client API Views (Placeholder)
@@ -45,48 +107,273 @@ class ClientSubmissionAPIView(APIView):
 
     def post(self, request, format=None):
 
-        serializer = DynamicSubmissionSerializer(data=request.data, context={'request': request})
+        try:
+            idempotencyKey = get_idempotency_key(request)
+        except InvalidIdempotencyKey as error:
+            return Response({IDEMPOTENCY_HEADER: str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = DynamicSubmissionSerializer(
+            data=request.data, context={'request': request, 'idempotency_key': idempotencyKey}
+        )
+
+        # A retry of a request that already succeeded gets its 201 again, without re-validating or writing
+        if idempotencyKey:
+            try:
+                replayed = find_replay(serializer, idempotencyKey)
+            except IdempotencyKeyReused as error:
+                return Response({IDEMPOTENCY_HEADER: str(error)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if replayed is not None:
+                return Response(replayed, status=status.HTTP_201_CREATED, headers={REPLAYED_HEADER: 'true'})
 
         if serializer.is_valid():
 
-            submission = serializer.save()
+            try:
+                data, wasReplayed = save_submission(serializer, idempotencyKey)
+            except IdempotencyKeyReused as error:
+                return Response({IDEMPOTENCY_HEADER: str(error)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            except UploadAlreadyAttached:
+                # A concurrent submission attached the upload between validation and the write
+                uploads = serializer.validated_data['uploads']
+                return Response(
+                    {fieldName: ['Must be the ID of a completed upload'] for fieldName in attached_upload_fields(uploads) or uploads},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
             return Response(
-                {
-                    'submissionId': submission.id,
-                    'status': 'Submission successful. Notification Processing'
-                },
-                status=status.HTTP_201_CREATED
+                data,
+                status=status.HTTP_201_CREATED,
+                headers={REPLAYED_HEADER: 'true'} if wasReplayed else None
             )
 
         # Return validation errors from the serializer
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+class BatchTooLarge(ValueError):
+    """The batch body (or one of its NDJSON lines) is over the configured byte limit."""
+
+
+def read_batch_items(request, maxItems):
+    """
+    Parses a batch body: a JSON array, or NDJSON (one submission object per line) read line
+    by line from the request stream. Unparseable NDJSON lines become BatchItemError items so
+    they get their own result. Raises ValueError for an unusable body.
+
+    The body is read from the stream directly (bypassing DATA_UPLOAD_MAX_MEMORY_SIZE), so it
+    is checked against SUBMISSION_BATCH_MAX_BYTES: its Content-Length before anything is parsed,
+    and the bytes actually read, for bodies without a truthful one (chunked transfer encoding).
+    Each NDJSON line is also checked against SUBMISSION_BATCH_MAX_LINE_BYTES (BatchTooLarge).
+    """
+    maxBytes = settings.SUBMISSION_BATCH_MAX_BYTES
+    tooLarge = f'A batch body may be at most {maxBytes} bytes.'
+    try:
+        contentLength = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        raise ValueError('Invalid Content-Length.')
+    if contentLength > maxBytes:
+        raise BatchTooLarge(tooLarge)
+
+    stream = request.stream or io.BytesIO()
+
+    if request.content_type.split(';')[0].strip() in NDJSON_CONTENT_TYPES:
+        maxLineBytes = settings.SUBMISSION_BATCH_MAX_LINE_BYTES
+        bytesRead = 0
+        items = []
+        while True:
+            line = stream.readline(maxLineBytes + 1)
+            if not line:
+                break
+            if len(line) > maxLineBytes:
+                raise BatchTooLarge(f'An NDJSON line may be at most {maxLineBytes} bytes.')
+            bytesRead += len(line)
+            if bytesRead > maxBytes:
+                raise BatchTooLarge(tooLarge)
+            if not line.strip():
+                continue
+            if len(items) == maxItems:
+                raise ValueError(f'A batch may contain at most {maxItems} submissions.')
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(BatchItemError('Invalid JSON line.'))
+        return items
+
+    body = stream.read(maxBytes + 1)
+    if len(body) > maxBytes:
+        raise BatchTooLarge(tooLarge)
+
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise ValueError('Body must be a JSON array or NDJSON.')
+
+    if not isinstance(items, list):
+        raise ValueError('Body must be a JSON array or NDJSON.')
+    if len(items) > maxItems:
+        raise ValueError(f'A batch may contain at most {maxItems} submissions.')
+    return items
+
+
+class ClientSubmissionBatchView(APIView):
+    """
+    Accepts many submissions in one request, for one or more forms: a JSON array of
+    {formSlug, submissionData} objects, or the same objects as NDJSON
+    (Content-Type: application/x-ndjson). Every item is validated like a single submission.
+    The valid ones are written together in batched INSERTs, and the response holds one
+    result per item, in request order.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request, format=None):
+        try:
+            items = read_batch_items(request, settings.SUBMISSION_BATCH_MAX_ITEMS)
+        except BatchTooLarge as error:
+            return Response({'detail': str(error)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = save_submission_batch(items, request)
+        created = sum(1 for result in results if result['status'] == status.HTTP_201_CREATED)
+
+        return Response(
+            {'created': created, 'failed': len(results) - created, 'results': results},
+            status=status.HTTP_200_OK
+        )
+
+
+class ClientUploadView(generics.CreateAPIView):
+    """
+    Starts a resumable chunked upload for a file_upload field:
+    POST {formSlug, fieldName, filename, contentType, size} -> {uploadId, offset, ...}.
+    """
+    queryset = FileUpload.objects.all()
+    serializer_class = FileUploadSerializer
+    permission_classes = [AllowAny]
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data['chunkSize'] = settings.UPLOAD_CHUNK_SIZE
+        return response
+
+
+class ClientUploadDetailView(APIView):
+    """
+    GET returns an upload's progress (resume from `offset`).
+    PATCH appends one chunk: the raw bytes as the body, starting at the Upload-Offset header.
+    The body is streamed to the staging file, never loaded into memory as a whole; the
+    upload completes (stored and hashed) with its last chunk.
+    """
+    permission_classes = [AllowAny]
+
+    def get_object(self, uploadId):
+        upload = FileUpload.objects.filter(id=uploadId).first()
+        if upload is None:
+            raise NotFound()
+        return upload
+
+    def get(self, request, uploadId, format=None):
+        upload = self.get_object(uploadId)
+        return Response(FileUploadSerializer(upload).data, headers={'Upload-Offset': str(upload.received_bytes)})
+
+    def patch(self, request, uploadId, format=None):
+        upload = self.get_object(uploadId)
+
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({'Upload-Offset': 'This header is required and must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            write_chunk(upload, offset, request.stream or io.BytesIO())
+        except UploadOffsetMismatch as mismatch:
+            return Response(
+                {'offset': mismatch.expected, 'detail': 'Resume the upload from the returned offset.'},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Upload-Offset': str(mismatch.expected)}
+            )
+        except UploadTooLarge:
+            return Response({'detail': 'Chunk exceeds the declared upload size.'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        return Response(FileUploadSerializer(upload).data, headers={'Upload-Offset': str(upload.received_bytes)})
+
+
+def etag_matches(request, etag):
+    """
+    Whether the request's If-None-Match lists etag, by weak comparison: a W/ prefix added by
+    the client or a proxy (e.g. after compressing the response) is ignored on both sides.
+    """
+    clientEtags = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in clientEtags:
+        return True
+
+    target = etag.removeprefix('W/')
+    return any(clientEtag.removeprefix('W/') == target for clientEtag in clientEtags)
+
+
+def conditional_response(request, etag, data):
+    """
+    Returns 304 Not Modified when the client already holds the representation
+    identified by etag (If-None-Match), otherwise the data tagged with that ETag.
+    """
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    return Response(data, headers={'ETag': etag})
+
+
 # --- Public View for Client Form List ---
 class ClientFormListView(generics.ListAPIView):
     """
     Publicly accessible endpoint to list all active Form summaries.
+    Served from the versioned schema cache with ETag/If-None-Match support.
     """
     queryset = Form.objects.filter(is_active=True).order_by('name')
     serializer_class = ClientFormSummarySerializer
     permission_classes = [AllowAny]
+    use_read_replica = True # See replicas.ReplicaRoutingMiddleware
+
+    def list(self, request, *args, **kwargs):
+        etag, data = get_client_form_list()
+        return conditional_response(request, etag, data)
 
 # --- Public View for Client Form Detail (Next Step) ---
 class ClientFormDetailView(generics.RetrieveAPIView):
     """
     Publicly accessible endpoint to retrieve the full schema for one active form by slug.
+    Served from the versioned schema cache with ETag/If-None-Match support.
     """
     queryset = Form.objects.filter(is_active=True)
     serializer_class = ClientFormDetailSerializer  # Will need to be updated to FormSchemaSerializer later
     lookup_field = 'slug'
     permission_classes = [AllowAny]
+    use_read_replica = True
+
+    def retrieve(self, request, *args, **kwargs):
+        schema = get_client_form_schema(kwargs[self.lookup_field])
+        if schema is None:
+            raise NotFound()
+
+        etag, data = schema
+        return conditional_response(request, etag, data)
 
 
 # ======================================================================
 # NEW ADMIN SUBMISSION VIEWSET
 # ======================================================================
 
+# Columns read by AdminSubmissionListSerializer
+LIST_COLUMNS = ('id', 'form', 'form__name', 'submission_date', 'client_identifier', 'is_notified')
+
+# Columns read by AdminFileAttachmentSerializer
+ATTACHMENT_COLUMNS = (
+    'submission_id', 'field_name', 'file', 'filename', 'uploaded_at', 'size', 'content_type', 'sha256',
+    'detected_type', 'page_count', 'thumbnail', 'processed_at',
+)
+
+
 class AdminSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Admin-only endpoint for viewing all submitted forms.
@@ -95,8 +382,10 @@ class AdminSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
     # Use FormSubmission and order by submission_date
     queryset = FormSubmission.objects.all()
 
-    filter_backends = [OrderingFilter, SearchFilter]
+    filter_backends = [OrderingFilter, SearchFilter, SubmissionFullTextFilter, SubmissionFieldValueFilter]
 
+    # ?search= matches identifiers and form names; ?q= is the indexed search over submitted values;
+    # ?field.<name>__gt= etc. compare one field's values (see field_values.py)
     search_fields = ['client_identifier', 'form__name']
 
     ordering_fields = ['id', 'submission_date', 'client_identifier', 'form_name', 'is_notified']
@@ -105,9 +394,96 @@ class AdminSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = CustomPageNumberPagination
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
 
+    # Browsing and searching reads from a replica when one is configured
+    use_read_replica = True
+
+    # Used instead of pagination_class when the request sends ?cursor= or ?paginationMode=keyset
+    keyset_pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        """
+        Per-action querysets: the list reads only the columns the summary serializer needs
+        (joining form for form_name), the detail view prefetches its attachments. Detail data
+        comes from data_snapshot; only older submissions without one load their EAV rows.
+        """
+        queryset = super().get_queryset().select_related('form')
+
+        if self.action == 'list':
+            queryset = queryset.only(*LIST_COLUMNS)
+        else:
+            queryset = queryset.prefetch_related(
+                Prefetch('attachments', queryset=FileAttachment.objects.only(*ATTACHMENT_COLUMNS)),
+            )
+
+        # form_name is an ordering field, so it has to exist as a column on the queryset
+        return queryset.annotate(form_name=F('form__name'))
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params if self.request is not None else {}
+            usesKeyset = (
+                self.keyset_pagination_class.cursor_query_param in params
+                or params.get('paginationMode') == 'keyset'
+            )
+            self._paginator = (self.keyset_pagination_class if usesKeyset else self.pagination_class)()
+        return self._paginator
+
 
     def get_serializer_class(self):
         """Dynamically choose the serializer based on the action."""
         if self.action == 'list':
             return AdminSubmissionListSerializer
-        return AdminSubmissionDetailSerializer
\ No newline at end of file
+        return AdminSubmissionDetailSerializer
+
+
+class AdminSubmissionArchiveViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Admin endpoint listing the submission archives (?form=<slug> for one form) and
+    rehydrating one back into the live tables.
+    """
+    queryset = SubmissionArchive.objects.select_related('form').order_by('-month', 'id')
+    serializer_class = AdminSubmissionArchiveSerializer
+    pagination_class = CustomPageNumberPagination
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        formSlug = self.request.query_params.get('form')
+        if formSlug:
+            queryset = queryset.filter(form__slug=formSlug)
+        return queryset
+
+    @action(detail=True, methods=['post'], url_path='rehydrate')
+    def rehydrate(self, request, pk=None):
+        """Moves the archived submissions back into the live tables and deletes the archive."""
+        archive = self.get_object()
+
+        try:
+            rehydrated = rehydrate_archive(archive)
+        except StillPastRetention:
+            return Response(
+                {'detail': "This month is still past the form's archive_after_days and would be archived again. Extend it first."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'rehydrated': rehydrated})
+
+
+# ======================================================================
+# REQUEST METRICS
+# ======================================================================
+
+class MetricsView(APIView):
+    """
+    Per-view request histograms (wall time, SQL time and query count, serializer time) in the
+    Prometheus text format. Populated by RequestProfilingMiddleware when settings.REQUEST_PROFILING
+    is on; each worker process reports its own requests. Also reports the size of the Celery
+    task result table.
+    """
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+
+    def get(self, request, format=None):
+        return HttpResponse(
+            registry.render() + render_task_result_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
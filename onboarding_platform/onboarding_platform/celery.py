@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import celeryd_init
 
 
 # Then, your usual Celery configuration code follows...
@@ -10,4 +11,20 @@ app = Celery('onboarding_platform')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django app configs.
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@celeryd_init.connect
+def applyWorkerProfile(sender=None, conf=None, **kwargs):
+    """
+    Configures a worker from CELERY_WORKER_PROFILES when its node name starts with a
+    profile name (e.g. -n exports@%h): it consumes that profile's queues with its
+    concurrency and prefetch. Options given on the command line still win.
+    """
+    profile = conf.worker_profiles.get(sender.split('@')[0]) if sender else None
+    if profile is None:
+        return
+
+    app.amqp.queues.select(profile['queues'])
+    conf.worker_concurrency = profile['concurrency']
+    conf.worker_prefetch_multiplier = profile['prefetch_multiplier']
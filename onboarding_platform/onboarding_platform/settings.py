@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+from kombu import Exchange, Queue
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,8 +57,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'form_builder.replicas.ReplicaRoutingMiddleware',
 ]
 
+# Opt-in request profiling: adds a Server-Timing header (queries, SQL, serializer and total
+# time) to every response and aggregates per-view histograms at /api/admin/metrics/
+REQUEST_PROFILING = False
+
+if REQUEST_PROFILING:
+    MIDDLEWARE.insert(0, 'form_builder.profiling.RequestProfilingMiddleware')
+
 ROOT_URLCONF = 'onboarding_platform.urls'
 
 # ======================================================================
@@ -89,6 +100,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
 ]
 
+# Request headers used by the client API (idempotent submissions, chunked uploads)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'upload-offset')
+
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
@@ -123,6 +137,57 @@ DATABASES = {
     }
 }
 
+# Read replicas (form_builder/replicas.py): GET requests to views marked use_read_replica
+# read from one of these aliases, each of which also needs a DATABASES entry. A client that
+# just wrote reads from the primary for DATABASE_REPLICA_PIN_SECONDS, and schema cache entries
+# built from a replica are kept at most DATABASE_REPLICA_CACHE_TIMEOUT seconds so replication
+# lag cannot pin stale data.
+DATABASE_ROUTERS = ['form_builder.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_PIN_SECONDS = 10
+DATABASE_REPLICA_CACHE_TIMEOUT = 30
+
+# Adds the stand-in 'replica' database used by the routing tests
+TEST_RUNNER = 'onboarding_platform.test_runner.ProjectTestRunner'
+
+
+# Cache
+# Compiled form schemas and validation plans are cached here. Use a cache shared by all
+# web workers (e.g. Redis) in production so that form edits invalidate every process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'onboarding-platform',
+    }
+}
+
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://localhost:6379/1',
+#     }
+# }
+
+# Seconds a compiled form schema stays in the shared cache (edits invalidate it sooner)
+FORM_SCHEMA_CACHE_TIMEOUT = 60 * 60
+
+# Store a JSON copy of each submission's values on FormSubmission.data_snapshot so detail
+# views, exports and notifications read one row instead of joining SubmissionData
+SUBMISSION_DATA_SNAPSHOT = True
+
+# Most submissions accepted by one /api/client/submissions/batch/ request
+SUBMISSION_BATCH_MAX_ITEMS = 1000
+# Largest batch body in bytes (checked against Content-Length before parsing) and longest NDJSON line
+SUBMISSION_BATCH_MAX_BYTES = 10 * 1024 * 1024
+SUBMISSION_BATCH_MAX_LINE_BYTES = 1024 * 1024
+
+# Seconds a submission's Idempotency-Key is answered from the cache; older keys are still
+# replayed from the database (FormSubmission.idempotency_key is unique)
+IDEMPOTENCY_KEY_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Seconds the admin submission list caches its total row count when using keyset pagination
+SUBMISSION_COUNT_CACHE_TIMEOUT = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -181,13 +246,158 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # EMAIL_HOST_USER = 'user'
 # EMAIL_HOST_PASSWORD = 'password'
 
+# Seconds before a stalled SMTP connection fails the send. The notification tasks' time limits
+# (CELERY_TASK_ANNOTATIONS) are only enforced by the prefork pool; this bounds them on any pool.
+EMAIL_TIMEOUT = 20
+
 
 # CELERY CONFIGURATION (Should already be here from Phase 1)
 CELERY_BROKER_URL = 'redis://localhost:6379/0' # The URL for your message broker (Redis/RabbitMQ)
 CELERY_RESULT_BACKEND = 'django-db' # Stores task results in the Django database
+# Results are pruned in bounded batches by pruneTaskResults; None turns off Celery's own
+# daily celery.backend_cleanup, which deletes every expired row in one statement
+CELERY_RESULT_EXPIRES = None
+# Tasks with ignore_result still record their failures, so errors stay visible in the result table
+CELERY_TASK_STORE_ERRORS_EVEN_IF_IGNORED = True
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Task queues: per-submission notifications never wait behind attachment processing or
+# periodic maintenance, because each queue is consumed by its own worker (see CELERY_WORKER_PROFILES)
+CELERY_TASK_QUEUES = (
+    Queue('notifications', Exchange('notifications'), routing_key='notifications', queue_arguments={'x-max-priority': 10}),
+    Queue('exports', Exchange('exports'), routing_key='exports', queue_arguments={'x-max-priority': 10}),
+    Queue('maintenance', Exchange('maintenance'), routing_key='maintenance', queue_arguments={'x-max-priority': 10}),
+)
+CELERY_TASK_DEFAULT_QUEUE = 'maintenance'
+CELERY_TASK_ROUTES = {
+    'form_builder.tasks.sendAdminNotification': {'queue': 'notifications', 'priority': 0},
+    'form_builder.tasks.relayNotificationOutbox': {'queue': 'notifications', 'priority': 3},
+    'form_builder.tasks.sendNotificationDigests': {'queue': 'notifications', 'priority': 6},
+    # Bulk file work: attachment sniffing, page counting and thumbnails
+    'form_builder.tasks.processAttachments': {'queue': 'exports'},
+    # Everything else (beat sweeps, archival, stats) goes to CELERY_TASK_DEFAULT_QUEUE
+}
+
+# Priorities: with Redis, 0 is served first (RabbitMQ reads the same values as 0 = lowest)
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+
+# Time limits in seconds: the soft limit raises SoftTimeLimitExceeded in the task, the hard one kills it
+CELERY_TASK_SOFT_TIME_LIMIT = 300
+CELERY_TASK_TIME_LIMIT = 360
+CELERY_TASK_ANNOTATIONS = {
+    'form_builder.tasks.sendAdminNotification': {'soft_time_limit': 30, 'time_limit': 60},
+    'form_builder.tasks.relayNotificationOutbox': {'soft_time_limit': 50, 'time_limit': 60},
+    'form_builder.tasks.sendNotificationDigests': {'soft_time_limit': 120, 'time_limit': 150},
+    'form_builder.tasks.processAttachments': {'soft_time_limit': 120, 'time_limit': 180},
+    'form_builder.tasks.archiveSubmissions': {'soft_time_limit': 3300, 'time_limit': 3600},
+}
+
+# Worker settings per queue, applied to workers named after the profile
+# (celery -A onboarding_platform worker -n notifications@%h): the queues consumed, how many
+# tasks run at once and how many messages each process reserves ahead. Long tasks reserve
+# one message at a time so a busy process never sits on work another could start. Run them on
+# the default prefork pool: eventlet/gevent/threads pools do not enforce task time limits.
+CELERY_WORKER_PROFILES = {
+    'notifications': {'queues': ['notifications'], 'concurrency': 8, 'prefetch_multiplier': 4},
+    'exports': {'queues': ['exports'], 'concurrency': 4, 'prefetch_multiplier': 1},
+    'maintenance': {'queues': ['maintenance'], 'concurrency': 2, 'prefetch_multiplier': 1},
+}
+
+# Periodic tasks (run with: celery -A onboarding_platform beat)
+CELERY_BEAT_SCHEDULE = {
+    'send-notification-digests': {
+        'task': 'form_builder.tasks.sendNotificationDigests',
+        'schedule': 300.0, # Digest window in seconds
+    },
+    'relay-notification-outbox': {
+        'task': 'form_builder.tasks.relayNotificationOutbox',
+        'schedule': 60.0,
+    },
+    'process-pending-attachments': {
+        'task': 'form_builder.tasks.processPendingAttachments',
+        'schedule': 300.0,
+    },
+    'purge-expired-uploads': {
+        'task': 'form_builder.tasks.purgeExpiredUploads',
+        'schedule': 3600.0,
+    },
+    'refresh-form-stats': {
+        'task': 'form_builder.tasks.refreshFormStats',
+        'schedule': 60.0,
+    },
+    'archive-submissions': {
+        'task': 'form_builder.tasks.archiveSubmissions',
+        'schedule': 24 * 3600.0,
+    },
+    'prune-task-results': {
+        'task': 'form_builder.tasks.pruneTaskResults',
+        'schedule': 3600.0,
+    },
+}
+
+# Stored task results (notifications, attachment processing and the every-minute sweeps
+# store only their failures): hours they are kept, and rows deleted per batch / batches per prune run
+TASK_RESULT_RETENTION_HOURS = 72
+TASK_RESULT_PRUNE_BATCH_SIZE = 1000
+TASK_RESULT_PRUNE_MAX_BATCHES = 50
+
+# Form stats rollups (/api/admin/forms/{slug}/stats/): submissions younger than this many
+# seconds are counted by a later refresh, once every transaction that could precede them committed
+FORM_STATS_SETTLE_SECONDS = 30
+FORM_STATS_DEFAULT_DAYS = 30
+FORM_STATS_MAX_DAYS = 366
+
+# Submission archival (archive.py): whole months of submissions older than a form's
+# archive_after_days, or this default (None: keep forever), are moved to one compressed
+# NDJSON file per form and month under SUBMISSION_ARCHIVE_PREFIX. Zstandard is used when
+# the zstandard package is installed, gzip otherwise.
+SUBMISSION_ARCHIVE_AFTER_DAYS = None
+SUBMISSION_ARCHIVE_PREFIX = 'form_archives/'
+SUBMISSION_ARCHIVE_BATCH_SIZE = 1000
+SUBMISSION_ARCHIVE_ZSTD_LEVEL = 10
+
+# Notification outbox: rows published per relay batch, days dispatched rows are kept, and
+# seconds after which a claim that was never marked dispatched (a killed relay) expires
+NOTIFICATION_OUTBOX_BATCH_SIZE = 500
+NOTIFICATION_OUTBOX_RETENTION_DAYS = 7
+NOTIFICATION_OUTBOX_CLAIM_TIMEOUT_SECONDS = 300
+
+# Digest notifications (forms with notification_mode='digest'):
+# at most this many submissions per digest email, and digest emails per run
+NOTIFICATION_DIGEST_MAX_SUBMISSIONS = 200
+NOTIFICATION_DIGEST_MAX_EMAILS = 50
+# Seconds after which the claim of a digest that was never sent (e.g. a killed worker) expires;
+# longer than the digest task's hard time limit
+NOTIFICATION_DIGEST_CLAIM_TIMEOUT_SECONDS = 300
+
+
+# File uploads: default limit for file_upload fields without configuration['max_size'] (bytes),
+# the chunk size suggested to chunked-upload clients, where partial uploads are staged and
+# how long an unfinished or unused upload is kept
+UPLOAD_MAX_SIZE = 25 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+UPLOAD_STAGING_DIR = BASE_DIR / 'upload_staging'
+UPLOAD_EXPIRY_HOURS = 24
+
+# Attachments are stored once per distinct content, under BLOB_STORAGE_PREFIX/<sha256 fan-out>.
+# collect_blobs only deletes unreferenced blobs last stored more than BLOB_GC_GRACE_HOURS ago
+BLOB_STORAGE_PREFIX = 'form_uploads/blobs/'
+BLOB_GC_GRACE_HOURS = 24
+
+# Attachment post-processing (MIME sniffing, page counts, thumbnails): attachments per task,
+# and the bounding box and storage prefix of generated thumbnails (thumbnails need Pillow)
+ATTACHMENT_PROCESSING_BATCH_SIZE = 20
+# Minutes an unprocessed attachment stays queued before processPendingAttachments queues it again
+ATTACHMENT_REQUEUE_AFTER_MINUTES = 60
+ATTACHMENT_THUMBNAIL_SIZE = (256, 256)
+ATTACHMENT_THUMBNAIL_PREFIX = 'form_uploads/thumbnails/'
+
 
 # Define where Django should store user-uploaded files (relative to BASE_DIR)
 MEDIA_ROOT = BASE_DIR
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+
+class ProjectTestRunner(DiscoverRunner):
+    """
+    Test runner of the project (TEST_RUNNER): adds a stand-in read replica for the routing
+    tests before the test databases are created. It is a second, independent local database,
+    so rows created only there prove a read used it; the tests list it in DATABASE_REPLICAS
+    themselves.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+
+        settings.DATABASES.setdefault('replica', {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': settings.BASE_DIR / 'db_replica.sqlite3',
+        })
+        # Fills in the defaults of the new alias (connections share the DATABASES dict)
+        connections.configure_settings(settings.DATABASES)